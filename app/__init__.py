@@ -45,8 +45,9 @@ def create_app(config_name='development'):
     # --------------------------
     # 启用 CORS
     # --------------------------
-    # 允许所有来源的跨域请求
-    CORS(app, supports_credentials=True)
+    # 允许所有来源的跨域请求；分页游标、桩状态版本号等自定义响应头需显式暴露给前端
+    CORS(app, supports_credentials=True,
+         expose_headers=['X-Next-Cursor', 'X-Pile-Status-Version', 'Content-Disposition'])
 
     # --------------------------
     # 初始化扩展
@@ -85,6 +86,7 @@ def create_app(config_name='development'):
     from app.models.location import CampusLocation
     from app.models.parking import ParkingLot, ParkingSpace, ParkingRecord
     from app.models.charging import ChargingPile, ChargingSession,ChargingSessionStatus, ChargingPileStatus
+    from app.models.charging import ChargingUsageHourly, ChargingUsageDaily
     from app.models.camera import Camera, Violation
     from app.models import score
     from app.models.score import ScoreLog, ReportedEvent,ScoreRule,Appeal,Violation
@@ -110,6 +112,14 @@ def create_app(config_name='development'):
     # --------------------------
     register_blueprints(app)
 
+    # --------------------------
+    # 后台任务
+    # --------------------------
+    from .tasks.reservations import init_reservation_sweeper
+    init_reservation_sweeper(app)
+    from .tasks.rollups import init_charging_rollups
+    init_charging_rollups(app)
+
     return app
 
 
@@ -71,6 +71,13 @@ class Config:
     OSS_BUCKET_NAME = os.getenv("OSS_BUCKET_NAME")
     OSS_IMAGE_FOLDER = os.getenv("OSS_IMAGE_FOLDER", "electric-vehicles/")
 
+    # --------------------------
+    # 后台任务
+    # --------------------------
+
+    # 应用内过期预约清理间隔（秒），0 表示不启动线程，改由 `flask sweep-reservations --loop` 单独运行
+    RESERVATION_SWEEP_INTERVAL = int(os.getenv('RESERVATION_SWEEP_INTERVAL', '60'))
+
 
 
 import sqlalchemy
@@ -7,9 +7,15 @@ class Camera(db.Model):
     location_id = db.Column(db.Integer, db.ForeignKey('campus_locations.id'), nullable=False)
     name        = db.Column(db.String(100), nullable=False)
     rtsp_url    = db.Column(db.String(255), nullable=True)
+    # 标定：[{pixel: [x, y], geo: [lng, lat]}, …] 参考点及由其求得的 3×3 像素→经纬度单应矩阵
+    calibration_points = db.Column(db.JSON, nullable=True)
+    homography         = db.Column(db.JSON, nullable=True)
 
 class Violation(db.Model):
     __tablename__ = 'violation'
+    __table_args__ = (
+        db.UniqueConstraint('event_id', name='uq_violation_event_id'),
+    )
     id           = db.Column(db.Integer, primary_key=True)
     camera_id    = db.Column(db.Integer, db.ForeignKey('camera.id'), nullable=False)
     zone_id      = db.Column(db.Integer, nullable=False)
@@ -17,3 +23,4 @@ class Violation(db.Model):
     image_path   = db.Column(db.String(255))
     occurred_at  = db.Column(db.DateTime, nullable=False)
     created_at   = db.Column(db.DateTime, default=datetime.utcnow)
+    event_id     = db.Column(db.String(64), nullable=True)  # 检测端生成的幂等键
@@ -49,6 +49,10 @@ class ChargingPile(db.Model):
         onupdate=datetime.utcnow,
         nullable=False
     )
+    # 乐观锁版本号：ORM 更新带 WHERE version = 旧值，并发修改时抛 StaleDataError
+    version     = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
     # 关系
     location    = db.relationship('CampusLocation', backref=db.backref('charging_piles', cascade='all, delete-orphan'))
@@ -67,9 +71,14 @@ class ChargingPile(db.Model):
 class ChargingSession(db.Model):
     __tablename__ = 'charging_sessions'
     __table_args__ = (
-        db.UniqueConstraint('pile_id', 'slot_time', name='uix_pile_slot'),
         db.Index('ix_session_user', 'user_id'),
         db.Index('ix_session_status', 'status'),
+        # 冲突检查 / 时段查询：按桩 + 绝对开始时间做范围探测
+        db.Index('ix_session_pile_span', 'pile_id', 'start_ts', 'end_ts'),
+        # 充电记录按 id 倒序的游标分页（可带用户 / 桩 / 充电开始时间筛选）
+        db.Index('ix_session_user_id', 'user_id', 'id'),
+        db.Index('ix_session_pile_id', 'pile_id', 'id'),
+        db.Index('ix_session_start_time', 'start_time', 'id'),
     )
 
     id          = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -119,6 +128,15 @@ class ChargingSession(db.Model):
     reserved_start_time = db.Column(db.Time, nullable=True)
     reserved_end_time   = db.Column(db.Time, nullable=True)
 
+    # 预约区间的绝对起止时间（跨午夜时 end_ts 在次日），用于冲突检查
+    start_ts    = db.Column(db.DateTime, nullable=True)
+    end_ts      = db.Column(db.DateTime, nullable=True)
+
+    # 乐观锁版本号，见 ChargingPile.version
+    version     = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
+
 
     # 关系
     pile        = db.relationship('ChargingPile', back_populates='sessions')
@@ -130,3 +148,42 @@ class ChargingSession(db.Model):
             f"<ChargingSession id={self.id}, user={self.user_id}, "
             f"pile={self.pile_id}, slot={self.slot_time.isoformat()}, status={self.status.value}>"
         )
+
+# ---------------------
+# 充电用量汇总（按桩 × 小时 / 桩 × 天）
+# 会话结束时增量累加，flask rollup-charging 可按时间段重建
+# ---------------------
+class ChargingUsageHourly(db.Model):
+    __tablename__ = 'charging_usage_hourly'
+
+    pile_id          = db.Column(
+        db.Integer,
+        db.ForeignKey('charging_piles.id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    hour             = db.Column(db.DateTime, primary_key=True)   # UTC 整点
+    sessions         = db.Column(db.Integer, nullable=False, default=0)   # 在该小时开始的会话数
+    energy_kwh       = db.Column(db.Float, nullable=False, default=0)
+    fee_amount       = db.Column(db.Float, nullable=False, default=0)
+    occupied_minutes = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ChargingUsageHourly pile={self.pile_id}, hour={self.hour.isoformat()}>"
+
+
+class ChargingUsageDaily(db.Model):
+    __tablename__ = 'charging_usage_daily'
+
+    pile_id          = db.Column(
+        db.Integer,
+        db.ForeignKey('charging_piles.id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    day              = db.Column(db.Date, primary_key=True)       # UTC 日期
+    sessions         = db.Column(db.Integer, nullable=False, default=0)
+    energy_kwh       = db.Column(db.Float, nullable=False, default=0)
+    fee_amount       = db.Column(db.Float, nullable=False, default=0)
+    occupied_minutes = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ChargingUsageDaily pile={self.pile_id}, day={self.day.isoformat()}>"
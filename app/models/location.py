@@ -3,6 +3,10 @@ from datetime import datetime
 
 class CampusLocation(db.Model):
     __tablename__ = 'campus_locations'
+    __table_args__ = (
+        # 禁停区版本戳查询（count / max(updated_at)）可直接走索引
+        db.Index('ix_location_type_updated', 'location_type', 'updated_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)  # 地点名称（如“犀浦校区图书馆”）
     latitude = db.Column(db.Float, nullable=False)  # 纬度坐标（GCJ-02坐标系）
@@ -15,6 +19,7 @@ class CampusLocation(db.Model):
     )
     description = db.Column(db.String(200), nullable=True)  # 地点描述
     created_at = db.Column(db.DateTime, default=datetime.utcnow)  # 创建时间
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # 最后修改时间
     
     # 新增字段：存储区域的路径数据（多边形的顶点坐标）
     path = db.Column(db.JSON, nullable=False, comment="区域路径（多边形顶点坐标）")
@@ -23,6 +23,10 @@ class ParkingLot(db.Model):
 
 class ParkingSpace(db.Model):
     __tablename__ = 'parking_spaces'
+    __table_args__ = (
+        # 入场分配空闲车位：按 停车场 + 状态 取一个（FOR UPDATE SKIP LOCKED）
+        db.Index('ix_space_lot_status', 'parking_lot_id', 'status'),
+    )
 
     # 主键
     id = db.Column(db.Integer, primary_key=True, comment="停车位ID")
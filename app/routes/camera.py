@@ -1,38 +1,67 @@
 # backend/camera.py
 
-from flask import Blueprint, request, jsonify
+import hashlib
+from flask import Blueprint, request, jsonify, make_response
 from flask_socketio import SocketIO
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from app import db, socketio
 from app.models.camera import  Camera, Violation
 from app.models.location import CampusLocation
+from app.utils.homography import fit_homography, reprojection_error
 from datetime import datetime
 
 camera_bp = Blueprint('camera_bp', __name__)
 
+
+def _zones_etag():
+    """
+    禁停区版本戳：一次聚合查询 (count, max(id), max(updated_at))，
+    新增、删除、修改任一禁停区都会改变结果，无需取出 path 再序列化。
+    """
+    count, max_id, max_updated = db.session.query(
+        func.count(CampusLocation.id),
+        func.max(CampusLocation.id),
+        func.max(CampusLocation.updated_at)
+    ).filter(CampusLocation.location_type == 'no-parking').one()
+    stamp = f"{count}-{max_id}-{max_updated.isoformat() if max_updated else ''}"
+    return hashlib.md5(stamp.encode()).hexdigest()
+
+
 @camera_bp.route('/api/zones', methods=['GET'])
 def get_zones():
     """
     返回所有类型为 'no-parking'（禁停区）的 CampusLocation，
     payload: [{ id, name, path: [...多边形顶点...] }, …]
+    支持 ETag / If-None-Match：禁停区未变化时直接返回 304。
     """
+    etag = _zones_etag()
+    if etag in request.if_none_match:
+        resp = make_response('', 304)
+        resp.set_etag(etag)
+        return resp
+
     rows = CampusLocation.query.filter_by(location_type='no-parking').all()
     zones = [
         {"id": r.id, "name": r.name, "path": r.path}
         for r in rows
     ]
-    return jsonify(zones), 200
+    resp = jsonify(zones)
+    resp.set_etag(etag)
+    return resp, 200
 
 @camera_bp.route('/api/cameras', methods=['GET', 'POST'])
 def manage_cameras():
     """
     可选：列出或新增摄像头配置
-    GET  返回 [{ id, location_id, name, rtsp_url }, …]
+    GET  返回 [{ id, location_id, name, rtsp_url, homography }, …]
     POST 新增 { location_id, name, rtsp_url }
     """
     if request.method == 'GET':
         cams = Camera.query.all()
         data = [
-            {"id": c.id, "location_id": c.location_id, "name": c.name, "rtsp_url": c.rtsp_url}
+            {"id": c.id, "location_id": c.location_id, "name": c.name, "rtsp_url": c.rtsp_url,
+             "homography": c.homography}
             for c in cams
         ]
         return jsonify(data), 200
@@ -48,22 +77,117 @@ def manage_cameras():
     db.session.commit()
     return jsonify({"id": cam.id}), 201
 
+@camera_bp.route('/api/cameras/<int:camera_id>/calibration', methods=['PUT'])
+def calibrate_camera(camera_id):
+    """
+    设置摄像头标定
+    请求 JSON: { points: [{ pixel: [x, y], geo: [lng, lat] }, …] }，至少 4 个不共线的参考点
+    返回求得的 homography（像素 → 经纬度）及参考点的最大重投影误差（度）
+    """
+    cam = Camera.query.get_or_404(camera_id)
+    points = (request.get_json() or {}).get('points') or []
+    try:
+        pixel = [p['pixel'] for p in points]
+        geo   = [p['geo'] for p in points]
+        H = fit_homography(pixel, geo)
+    except (KeyError, TypeError, IndexError, ValueError) as e:
+        return jsonify({"error": f"invalid calibration points: {e}"}), 400
+
+    cam.calibration_points = points
+    cam.homography = H
+    db.session.commit()
+    return jsonify({"id": cam.id, "homography": H,
+                    "max_error": reprojection_error(H, pixel, geo)}), 200
+
+def _violation_payload(v):
+    return {
+        "camera_id":    v['camera_id'],
+        "zone_id":      v['zone_id'],
+        "plate_number": v['plate_number'],
+        "image_path":   v['image_path'],
+        "occurred_at":  v['occurred_at'].isoformat()
+    }
+
+
+def _parse_violation(data):
+    """校验并转换单条上报，返回可直接插入的行字典；字段缺失或格式错误抛 ValueError。"""
+    if not isinstance(data, dict):
+        raise ValueError('item must be an object')
+    missing = [k for k in ('camera_id', 'zone_id', 'plate_number', 'occurred_at') if not data.get(k)]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    return {
+        'camera_id':    data['camera_id'],
+        'zone_id':      data['zone_id'],
+        'plate_number': data['plate_number'],
+        'image_path':   data.get('image_path'),
+        'occurred_at':  datetime.fromisoformat(data['occurred_at']),
+        'event_id':     data.get('event_id'),
+        'created_at':   datetime.utcnow(),
+    }
+
+
+def insert_ignore_stmt(model, dialect: str):
+    """多行 INSERT，唯一键（event_id）冲突的行跳过而不是让整条语句失败。"""
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        return insert(model.__table__).prefix_with('IGNORE')
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model.__table__).on_conflict_do_nothing()
+
+
+def _insert_new_violations(rows):
+    """
+    插入 rows，返回与 rows 一一对应的「是否真正插入」；event_id 已被并发请求写入的行被跳过。
+    支持 RETURNING 的数据库由返回的 event_id 判断；MySQL 先整批 INSERT IGNORE，
+    影响行数不足（极少见的并发重复）时回滚到保存点逐行插入，按每行的影响行数判断。
+    """
+    dialect = db.session.get_bind().dialect
+    stmt = insert_ignore_stmt(Violation, dialect.name)
+    if dialect.insert_executemany_returning:
+        inserted = set(db.session.execute(stmt.returning(Violation.event_id), rows).scalars())
+        return [r['event_id'] is None or r['event_id'] in inserted for r in rows]
+
+    savepoint = db.session.begin_nested()
+    if db.session.execute(stmt, rows).rowcount == len(rows):
+        savepoint.commit()
+        return [True] * len(rows)
+    savepoint.rollback()
+    return [db.session.execute(stmt, r).rowcount == 1 for r in rows]
+
+
 @camera_bp.route('/api/violations', methods=['POST'])
 def receive_violation():
     """
     接收检测服务上报的违停信息，存库并广播给所有 WebSocket 客户端
-    请求 JSON: { camera_id, zone_id, plate_number, image_path, occurred_at }
+    请求 JSON: { camera_id, zone_id, plate_number, image_path, occurred_at, event_id? }
+    带 event_id 且已入库时视为重复上报，直接返回 200
     """
     data = request.get_json()
+    event_id = data.get('event_id')
+    if event_id and Violation.query.filter_by(event_id=event_id).first():
+        return jsonify(status='duplicate'), 200
+
     v = Violation(
         camera_id    = data['camera_id'],
         zone_id      = data['zone_id'],
         plate_number = data['plate_number'],
-        image_path   = data['image_path'],
-        occurred_at  = datetime.fromisoformat(data['occurred_at'])
+        image_path   = data.get('image_path'),
+        occurred_at  = datetime.fromisoformat(data['occurred_at']),
+        event_id     = event_id
     )
     db.session.add(v)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 同一 event_id 的重试与首次上报并发到达，唯一约束兜底
+        db.session.rollback()
+        if event_id:
+            return jsonify(status='duplicate'), 200
+        raise
 
     # 通过 SocketIO 广播
     payload = {
@@ -75,3 +199,63 @@ def receive_violation():
     }
     socketio.emit('violation:new', payload)
     return jsonify(status='ok'), 201
+
+
+@camera_bp.route('/api/violations/batch', methods=['POST'])
+def receive_violation_batch():
+    """
+    批量接收违停上报：一个事务、一条多行 INSERT 入库，整批只广播一次
+    请求 JSON: [{ camera_id, zone_id, plate_number, image_path, occurred_at, event_id? }, …]
+    返回: { created, duplicate, invalid, results: [{ index, event_id, status, error? }, …] }
+      status 取值 created / duplicate（event_id 已入库或批内重复）/ invalid
+    """
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        return jsonify({'error': '请求体必须是数组'}), 400
+
+    results = [None] * len(items)
+    rows, row_index = [], []
+    for i, data in enumerate(items):
+        event_id = data.get('event_id') if isinstance(data, dict) else None
+        try:
+            row = _parse_violation(data)
+        except (ValueError, TypeError) as e:
+            results[i] = {'index': i, 'event_id': event_id, 'status': 'invalid', 'error': str(e)}
+            continue
+        rows.append(row)
+        row_index.append(i)
+
+    # 幂等：一次查询找出已入库的 event_id，批内重复的也只保留第一条；
+    # 并发批次在查询之后写入的同一 event_id 由插入时跳过冲突行兜底，同样记为 duplicate
+    event_ids = {r['event_id'] for r in rows if r['event_id']}
+    existing = set()
+    if event_ids:
+        existing = {e for (e,) in db.session.query(Violation.event_id)
+                                            .filter(Violation.event_id.in_(event_ids))}
+    candidates, seen = [], set()
+    for row, i in zip(rows, row_index):
+        eid = row['event_id']
+        if eid and (eid in existing or eid in seen):
+            results[i] = {'index': i, 'event_id': eid, 'status': 'duplicate'}
+            continue
+        if eid:
+            seen.add(eid)
+        candidates.append((row, i))
+
+    created = _insert_new_violations([row for row, _ in candidates]) if candidates else []
+    db.session.commit()
+    to_insert = []
+    for (row, i), ok in zip(candidates, created):
+        results[i] = {'index': i, 'event_id': row['event_id'], 'status': 'created' if ok else 'duplicate'}
+        if ok:
+            to_insert.append(row)
+
+    if to_insert:
+        socketio.emit('violation:batch', {
+            'count': len(to_insert),
+            'items': [_violation_payload(r) for r in to_insert]
+        })
+
+    summary = {s: sum(1 for r in results if r['status'] == s)
+               for s in ('created', 'duplicate', 'invalid')}
+    return jsonify({**summary, 'results': results}), 200
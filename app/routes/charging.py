@@ -1,32 +1,68 @@
-from flask import Blueprint, request, jsonify
+import csv
+import io
+import json
+import logging
+
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from datetime import datetime, timedelta, date, time
+from redis.exceptions import RedisError
+from sqlalchemy import and_, func
+from sqlalchemy.orm.exc import StaleDataError
 from app import db
+from app.extensions import redis_client
 from app.models.charging import (
     ChargingPile,
     ChargingSession,
     ChargingPileStatus,
-    ChargingSessionStatus
+    ChargingSessionStatus,
+    ChargingUsageDaily,
+    ChargingUsageHourly
 )
 from app.models.location import CampusLocation
+from app.models.users import User
 from app.models.vehicles import ElectricVehicle
+from app.tasks.rollups import demand_forecast
+from app.utils.availability import AvailabilityEngine, MAX_SESSION_SPAN
+from app.utils.charging_state import (
+    TransitionError,
+    cancel_session,
+    delete_pile,
+    reserve_session,
+    run_transition,
+    start_session,
+    stop_session,
+    update_pile
+)
+from app.utils.pile_status import cached_piles, invalidate_location, publish_piles
+from app.utils.recommend import first_fit, haversine_m, rank
+from app.utils.session_filters import live_session_filter, overlap_filter
+
+logger = logging.getLogger(__name__)
 
 charging_bp = Blueprint('charging_api', __name__, url_prefix='/api')
 
+AVAILABILITY_CACHE_TTL = 60     # 全校可用性按分钟缓存
+DEMAND_CACHE_TTL       = 3600   # 繁忙度预测按 (充电区, 小时) 缓存
+RECOMMEND_HORIZON      = timedelta(hours=12)
+RECOMMEND_LIMIT        = 5
+
+
+def _session_rows():
+    """可用性计算只需要的列，免去构造完整 ORM 对象。"""
+    return db.session.query(
+        ChargingSession.id,
+        ChargingSession.pile_id,
+        ChargingSession.user_id,
+        ChargingSession.status,
+        ChargingSession.reserved_date,
+        ChargingSession.reserved_start_time,
+        ChargingSession.reserved_end_time
+    )
 
-def _cleanup_expired_reservations():
-    """把超过10分钟未开始的“reserved”会话，标记为 cancelled, 并释放桩"""
-    cutoff = datetime.utcnow() - timedelta(minutes=10)
-    expired = ChargingSession.query.filter(
-        ChargingSession.status == ChargingSessionStatus.reserved,
-        ChargingSession.created_at < cutoff
-    ).all()
-    for sess in expired:
-        sess.status = ChargingSessionStatus.cancelled
-        pile = ChargingPile.query.get(sess.pile_id)
-        if pile:
-            pile.status = ChargingPileStatus.available
-    if expired:
-        db.session.commit()
+
+def _overlapping(query, pile_id, start, end, now=None):
+    return query.filter(ChargingSession.pile_id == pile_id,
+                        overlap_filter(start, end, now))
 
 
 @charging_bp.route('/charging_area/get_charging_areas', methods=['GET'])
@@ -40,26 +76,245 @@ def get_charging_areas():
     } for area in areas]), 200
 
 
+def _parse_window(date_str, from_str, to_str):
+    """date + HH:MM 起止，to 为 24:00 或不晚于 from 时视为到次日。"""
+    day_start = datetime.strptime(date_str, '%Y-%m-%d')
+    t_from = datetime.strptime(from_str, '%H:%M').time()
+    start = datetime.combine(day_start.date(), t_from)
+    if to_str == '24:00':
+        return start, day_start + timedelta(days=1)
+    t_to = datetime.strptime(to_str, '%H:%M').time()
+    end_day = day_start.date() + timedelta(days=1) if t_to <= t_from else day_start.date()
+    return start, datetime.combine(end_day, t_to)
+
+
+def _availability_rows(start, end, now, location_id=None):
+    """
+    一条 JOIN 查询取出充电区、桩及与窗口相交的有效会话（没有会话的桩由 OUTER JOIN 带出，
+    此时会话列为 None），按充电区、桩排序。
+    """
+    query = db.session.query(
+        CampusLocation.id.label('location_id'),
+        CampusLocation.name.label('location_name'),
+        CampusLocation.latitude,
+        CampusLocation.longitude,
+        ChargingPile.id.label('pile_id'),
+        ChargingPile.name.label('pile_name'),
+        ChargingPile.connector,
+        ChargingPile.power_kw,
+        ChargingPile.fee_rate,
+        ChargingPile.status.label('pile_status'),
+        ChargingSession.id,
+        ChargingSession.user_id,
+        ChargingSession.status,
+        ChargingSession.start_ts,
+        ChargingSession.end_ts
+    ).select_from(CampusLocation).join(
+        ChargingPile, ChargingPile.location_id == CampusLocation.id
+    ).outerjoin(
+        ChargingSession,
+        and_(ChargingSession.pile_id == ChargingPile.id, overlap_filter(start, end, now))
+    ).filter(
+        CampusLocation.location_type == 'charging'
+    )
+    if location_id is not None:
+        query = query.filter(CampusLocation.id == location_id)
+    return query.order_by(CampusLocation.id, ChargingPile.id).all()
+
+
+def _build_availability(start, end, now):
+    """所有充电区、桩及其空闲区间；会话交给 AvailabilityEngine 按桩计算。"""
+    rows = _availability_rows(start, end, now)
+    engine = AvailabilityEngine(r for r in rows if r.id is not None)
+    areas, piles_seen = {}, set()
+    for r in rows:
+        if r.pile_id in piles_seen:
+            continue
+        piles_seen.add(r.pile_id)
+        area = areas.setdefault(r.location_id, {
+            'id':        r.location_id,
+            'name':      r.location_name,
+            'latitude':  r.latitude,
+            'longitude': r.longitude,
+            'piles':     []
+        })
+        windows = engine.schedule(r.pile_id).free_windows(max(start, now), end)
+        area['piles'].append({
+            'id':           r.pile_id,
+            'name':         r.pile_name,
+            'connector':    r.connector,
+            'power_kw':     r.power_kw,
+            'fee_rate':     r.fee_rate,
+            'status':       r.pile_status.value,
+            'free_windows': [{'start': s.isoformat(), 'end': e.isoformat()} for s, e in windows],
+            'free_minutes': int(sum((e - s).total_seconds() for s, e in windows) // 60)
+        })
+    return list(areas.values())
+
+
+@charging_bp.route('/charging/availability', methods=['GET'])
+def get_charging_availability():
+    """
+    全校充电可用性：所有充电区、桩及其在 [date from, date to) 内的空闲区间，
+    取代「充电区列表 → 每区桩列表 → 每桩时段」的逐级请求。
+    参数 date 默认今天，from 默认 00:00，to 默认 24:00（不晚于 from 时视为到次日）。
+    结果按（参数，当前分钟）缓存在 Redis，Redis 不可用时直接计算。
+    """
+    now_utc  = datetime.utcnow()
+    date_str = request.args.get('date') or now_utc.strftime('%Y-%m-%d')
+    from_str = request.args.get('from') or '00:00'
+    to_str   = request.args.get('to') or '24:00'
+    try:
+        start, end = _parse_window(date_str, from_str, to_str)
+    except ValueError:
+        return jsonify({'error': 'date 格式应为 YYYY-MM-DD，from/to 格式应为 HH:MM'}), 400
+
+    cache_key = (f"charging:availability:{start:%Y%m%d%H%M}:{end:%Y%m%d%H%M}:"
+                 f"{now_utc:%Y%m%d%H%M}")
+    try:
+        cached = redis_client.get(cache_key)
+    except RedisError as e:
+        logger.warning(f"Availability cache unavailable: {e}")
+        cached = None
+    if cached:
+        return current_app.response_class(cached, mimetype='application/json'), 200
+
+    payload = json.dumps({
+        'from':         start.isoformat(),
+        'to':           end.isoformat(),
+        'generated_at': now_utc.isoformat(),
+        'areas':        _build_availability(start, end, now_utc)
+    }, ensure_ascii=False)
+    try:
+        redis_client.setex(cache_key, AVAILABILITY_CACHE_TTL, payload)
+    except RedisError:
+        pass
+    return current_app.response_class(payload, mimetype='application/json'), 200
+
+
+def _cached_forecast(location_id, pile_ids, hour):
+    """某充电区各桩在 hour 的繁忙度预测，按 (充电区, 小时) 缓存。"""
+    key = f"charging:demand:{location_id}:{hour:%Y%m%d%H}"
+    try:
+        cached = redis_client.get(key)
+        if cached:
+            return {int(pid): busy for pid, busy in json.loads(cached).items()}
+    except RedisError as e:
+        logger.warning(f"Demand cache unavailable: {e}")
+    busy = demand_forecast(pile_ids, hour)
+    try:
+        redis_client.setex(key, DEMAND_CACHE_TTL, json.dumps(busy))
+    except RedisError:
+        pass
+    return busy
+
+
+@charging_bp.route('/charging/recommendations', methods=['GET'])
+def recommend_charging_slots():
+    """
+    推荐桩与时段：
+      ?duration=分钟（必填）&lat=&lng=（用户位置，可选）&location_id=（限定充电区，可选）
+       &date=YYYY-MM-DD&after=HH:MM（最早开始，默认现在）&limit=5
+    在 [after, after + 12h) 内为每个桩找最早能放下 duration 的空闲时段，
+    按等待时间、步行距离与历史繁忙度排序（见 app/utils/recommend.py）。
+    返回的 date/start_time/end_time 可直接用于 /charging-sessions/reserve。
+
+    只有繁忙度预测按 (充电区, 小时) 缓存，排序结果不缓存：
+      - 空闲时段每次预约 / 取消都会变，缓存的推荐会把刚被订走的时段发给下一个用户，预约必然 400
+      - 排序里的等待时间取决于请求时刻，步行距离取决于用户位置，按 (充电区, 小时, 时长) 缓存也无法复用
+      - 剩下的计算是一次带索引的联表查询 + 每桩一遍扫描线，与 /charging/availability 的单次计算相同；
+        按历史算繁忙度才是唯一与数据量相关的部分，已由预测缓存覆盖
+    """
+    now_utc = datetime.utcnow()
+    try:
+        duration = timedelta(minutes=int(request.args['duration']))
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        location_id = request.args.get('location_id', type=int)
+        limit = min(int(request.args.get('limit', RECOMMEND_LIMIT)), 50)
+        if request.args.get('date') or request.args.get('after'):
+            day = request.args.get('date') or now_utc.strftime('%Y-%m-%d')
+            after = datetime.strptime(f"{day} {request.args.get('after') or '00:00'}", '%Y-%m-%d %H:%M')
+        else:
+            after = now_utc
+    except KeyError:
+        return jsonify({'error': 'duration 参数必填（分钟）'}), 400
+    except ValueError:
+        return jsonify({'error': '参数格式错误'}), 400
+    if not timedelta(0) < duration <= MAX_SESSION_SPAN:
+        return jsonify({'error': 'duration 需在 1 ~ 1440 分钟之间'}), 400
+
+    not_before = max(after, now_utc)
+    horizon = not_before + RECOMMEND_HORIZON
+    rows = _availability_rows(not_before, horizon + duration, now_utc, location_id)
+    engine = AvailabilityEngine(r for r in rows if r.id is not None)
+
+    candidates, piles_seen, area_piles = [], set(), {}
+    for r in rows:
+        if r.pile_id in piles_seen:
+            continue
+        piles_seen.add(r.pile_id)
+        area_piles.setdefault(r.location_id, []).append(r.pile_id)
+        if r.pile_status == ChargingPileStatus.offline:
+            continue
+        windows = engine.schedule(r.pile_id).free_windows(not_before, horizon + duration)
+        start = first_fit(windows, duration, not_before)
+        if start is None or start >= horizon:
+            continue
+        end = start + duration
+        candidates.append({
+            'pile_id':       r.pile_id,
+            'pile_name':     r.pile_name,
+            'location_id':   r.location_id,
+            'location_name': r.location_name,
+            'connector':     r.connector,
+            'power_kw':      r.power_kw,
+            'fee_rate':      r.fee_rate,
+            'start':         start,
+            'end':           end,
+            'wait_minutes':  round((start - not_before).total_seconds() / 60, 1),
+            'distance_m':    (round(haversine_m(lat, lng, r.latitude, r.longitude))
+                              if lat is not None and lng is not None else None),
+        })
+
+    forecasts = {}
+    for c in candidates:
+        hour = c['start'].replace(minute=0, second=0, microsecond=0)
+        key = (c['location_id'], hour)
+        if key not in forecasts:
+            forecasts[key] = _cached_forecast(c['location_id'], area_piles[c['location_id']], hour)
+        c['predicted_busy'] = forecasts[key].get(c['pile_id'], 0.0)
+
+    result = []
+    for c in rank(candidates, limit):
+        start, end = c.pop('start'), c.pop('end')
+        result.append({**c,
+                       'date':       start.date().isoformat(),
+                       'start_time': start.strftime('%H:%M'),
+                       'end_time':   end.strftime('%H:%M'),
+                       'start':      start.isoformat(),
+                       'end':        end.isoformat()})
+    return jsonify({'after': not_before.isoformat(),
+                    'duration_minutes': int(duration.total_seconds() // 60),
+                    'recommendations': result}), 200
+
+
 @charging_bp.route('/charging-piles', methods=['GET'])
 def get_charging_piles():
     location_id = request.args.get('location_id', type=int)
     if not location_id:
         return jsonify({'error': 'location_id is required'}), 400
-    piles = ChargingPile.query.filter_by(location_id=location_id).all()
-    return jsonify([{
-        'id': pile.id,
-        'name': pile.name,
-        'connector': pile.connector,
-        'power_kw': pile.power_kw,
-        'fee_rate': pile.fee_rate,
-        'status': pile.status.value,
-        'updated_at': pile.updated_at.isoformat()
-    } for pile in piles]), 200
+    # 从 Redis 实时状态缓存读取；版本号放在响应头里，与 socketio 'pile:status' 增量对齐
+    records, version = cached_piles(location_id)
+    for r in records:
+        r.pop('location_id', None)
+    resp = jsonify(records)
+    resp.headers['X-Pile-Status-Version'] = str(version)
+    return resp, 200
 
 
 @charging_bp.route('/charging-sessions/reserve', methods=['POST'])
 def reserve_charging_session():
-    _cleanup_expired_reservations()
     data = request.get_json() or {}
     user_id    = data.get('user_id')
     pile_id    = data.get('pile_id')
@@ -92,81 +347,48 @@ def reserve_charging_session():
     if dt_start <= now_utc or dt_end <= dt_start:
         return jsonify({'error': '无效的时间区间'}), 400
 
-    # 用户与桩校验
-    ev   = ElectricVehicle.query.filter_by(id=vehicle_id, owner_id=user_id).first()
-    pile = ChargingPile.query.get(pile_id)
-    if not ev or not pile:
+    ev = ElectricVehicle.query.filter_by(id=vehicle_id, owner_id=user_id).first()
+    if not ev:
         return jsonify({'error': '车辆或充电桩不存在'}), 400
 
-    # 冲突检查：是否有预约区间重叠
-    conflict = ChargingSession.query.filter(
-        ChargingSession.pile_id == pile_id,
-        ChargingSession.status != ChargingSessionStatus.cancelled,
-        # 已存的 start/end 与新范围有交集
-        ChargingSession.reserved_start_time < t_end,
-        ChargingSession.reserved_end_time   > t_start
-    ).first()
-    if conflict:
-        return jsonify({'error': '该时段区间已被占用'}), 400
-
-    # 创建完整区间预约
-    session = ChargingSession(
-        user_id               = user_id,
-        pile_id               = pile_id,
-        vehicle_id            = vehicle_id,
-        slot_time             = dt_start,
-        reserved_date         = res_date,
-        reserved_start_time   = t_start,
-        reserved_end_time     = t_end,
-        status                = ChargingSessionStatus.reserved
-    )
-    db.session.add(session)
-    pile.status = ChargingPileStatus.reserved
-    db.session.commit()
+    # 锁桩 → 冲突检查 → 创建预约 → 推导桩状态，在一个事务内完成，冲突时自动重试
+    try:
+        session, pile = run_transition(reserve_session, user_id, vehicle_id, pile_id,
+                                       dt_start, dt_end, now_utc)
+    except TransitionError as e:
+        return jsonify({'error': str(e)}), 400
+    publish_piles([pile])
 
     return jsonify({'message': '预约成功', 'session_id': session.id}), 201
 
 
 @charging_bp.route('/charging-sessions/<int:session_id>/cancel', methods=['POST'])
 def cancel_charging_session(session_id):
-    _cleanup_expired_reservations()
-    session = ChargingSession.query.get(session_id)
-    if not session or session.status != ChargingSessionStatus.reserved:
-        return jsonify({'error': '无效的会话，无法取消'}), 400
-    session.status = ChargingSessionStatus.cancelled
-    pile = ChargingPile.query.get(session.pile_id)
-    if pile:
-        pile.status = ChargingPileStatus.available
-    db.session.commit()
+    try:
+        _, pile = run_transition(cancel_session, session_id)
+    except TransitionError as e:
+        return jsonify({'error': f'无效的会话，无法取消：{e}'}), 400
+    publish_piles([pile])
     return jsonify({'message': '取消成功'}), 200
 
 
 @charging_bp.route('/charging-sessions/<int:session_id>/start', methods=['POST'])
 def start_charging(session_id):
-    session = ChargingSession.query.get(session_id)
-    if not session or session.status != ChargingSessionStatus.reserved:
-        return jsonify({'error': 'invalid session'}), 400
-    session.start_time = datetime.utcnow()
-    session.status     = ChargingSessionStatus.ongoing
-    pile = ChargingPile.query.get(session.pile_id)
-    pile.status = ChargingPileStatus.charging
-    db.session.commit()
+    try:
+        _, pile = run_transition(start_session, session_id)
+    except TransitionError as e:
+        return jsonify({'error': f'invalid session: {e}'}), 400
+    publish_piles([pile])
     return jsonify({'message': '充电已开始'}), 200
 
 
 @charging_bp.route('/charging-sessions/<int:session_id>/stop', methods=['POST'])
 def stop_charging(session_id):
-    session = ChargingSession.query.get(session_id)
-    if not session or session.status != ChargingSessionStatus.ongoing:
-        return jsonify({'error': 'invalid session'}), 400
-    session.end_time = datetime.utcnow()
-    session.status   = ChargingSessionStatus.completed
-    duration_h = (session.end_time - session.start_time).total_seconds() / 3600.0
-    pile      = ChargingPile.query.get(session.pile_id)
-    session.energy_kwh = round(duration_h * pile.power_kw, 3)
-    session.fee_amount = round(session.energy_kwh * pile.fee_rate, 2)
-    pile.status = ChargingPileStatus.available
-    db.session.commit()
+    try:
+        session, pile = run_transition(stop_session, session_id)
+    except TransitionError as e:
+        return jsonify({'error': f'invalid session: {e}'}), 400
+    publish_piles([pile])
     return jsonify({'message': '充电已结束', 'energy_kwh': session.energy_kwh, 'fee_amount': session.fee_amount}), 200
 
 
@@ -210,6 +432,7 @@ def delete_charging_area(id):
 
     db.session.delete(area)
     db.session.commit()
+    invalidate_location(id)
     return jsonify({'message': '已删除'}), 200
 
 
@@ -235,79 +458,259 @@ def create_charging_pile():
     )
     db.session.add(pile)
     db.session.commit()
+    publish_piles([pile])
     return jsonify({'message': '充电桩创建成功', 'id': pile.id}), 201
 
 
 @charging_bp.route('/charging-piles/<int:id>', methods=['PUT'])
 def update_charging_pile(id):
-    pile = ChargingPile.query.get(id)
-    if not pile:
-        return jsonify({'error': '未找到充电桩'}), 404
-
-    data = request.get_json() or {}
-    pile.name = data.get('name', pile.name)
-    pile.connector = data.get('connector', pile.connector)
-    pile.power_kw = data.get('power_kw', pile.power_kw)
-    pile.fee_rate = data.get('fee_rate', pile.fee_rate)
-    db.session.commit()
+    # 与预约 / 开始 / 结束充电同样走 run_transition：版本号冲突时重试，重试用尽返回 409
+    try:
+        pile = run_transition(update_pile, id, request.get_json() or {})
+    except TransitionError as e:
+        return jsonify({'error': str(e)}), 404
+    except StaleDataError:
+        return jsonify({'error': '充电桩正被其他操作修改，请稍后重试'}), 409
+    publish_piles([pile])
     return jsonify({'message': '更新成功'}), 200
 
 
 @charging_bp.route('/charging-piles/<int:id>', methods=['DELETE'])
 def delete_charging_pile(id):
-    pile = ChargingPile.query.get(id)
-    if not pile:
-        return jsonify({'error': '充电桩不存在'}), 404
-
-    db.session.delete(pile)
-    db.session.commit()
+    try:
+        deleted = run_transition(delete_pile, id)
+    except TransitionError as e:
+        return jsonify({'error': str(e)}), 404
+    except StaleDataError:
+        return jsonify({'error': '充电桩正被其他操作修改，请稍后重试'}), 409
+    publish_piles(deleted=[deleted])
     return jsonify({'message': '删除成功'}), 200
 
 
-from flask import jsonify
-from sqlalchemy.orm import joinedload
+LOG_PAGE_SIZE     = 100
+LOG_PAGE_SIZE_MAX = 1000
+EXPORT_BATCH      = 1000
+LOG_FIELDS = ('id', 'user_id', 'user_name', 'vehicle_id', 'pile_id', 'pile_name',
+              'location_id', 'charging_zone', 'status', 'start_time', 'end_time',
+              'energy_kwh', 'fee_amount')
+
+
+def _parse_log_filters(args):
+    """
+    充电记录筛选条件：user_id / pile_id / location_id / from / to（按充电开始时间，ISO 格式）。
+    参数非法时抛 ValueError。
+    """
+    conds = []
+    for name, col in (('user_id', ChargingSession.user_id), ('pile_id', ChargingSession.pile_id)):
+        if args.get(name):
+            conds.append(col == int(args[name]))
+    if args.get('location_id'):
+        # 先取该区的桩 id，再走 (pile_id, id) 索引，而不是按 location 连表后排序
+        conds.append(ChargingSession.pile_id.in_(
+            db.session.query(ChargingPile.id)
+                      .filter(ChargingPile.location_id == int(args['location_id']))
+        ))
+    if args.get('from'):
+        conds.append(ChargingSession.start_time >= datetime.fromisoformat(args['from']))
+    if args.get('to'):
+        conds.append(ChargingSession.start_time < datetime.fromisoformat(args['to']))
+    return conds
+
+
+def _charging_log_query(conds):
+    """只取需要的列，用户、桩、充电区以 OUTER JOIN 带出名称。"""
+    return db.session.query(
+        ChargingSession.id,
+        ChargingSession.user_id,
+        User.name.label('user_name'),
+        ChargingSession.vehicle_id,
+        ChargingSession.pile_id,
+        ChargingPile.name.label('pile_name'),
+        ChargingPile.location_id,
+        CampusLocation.name.label('location_name'),
+        ChargingSession.status,
+        ChargingSession.start_time,
+        ChargingSession.end_time,
+        ChargingSession.energy_kwh,
+        ChargingSession.fee_amount
+    ).select_from(ChargingSession) \
+     .outerjoin(User, User.id == ChargingSession.user_id) \
+     .outerjoin(ChargingPile, ChargingPile.id == ChargingSession.pile_id) \
+     .outerjoin(CampusLocation, CampusLocation.id == ChargingPile.location_id) \
+     .filter(*conds)
+
+
+def _log_record(r) -> dict:
+    if r.location_name:
+        zone = r.location_name
+    elif r.location_id is not None:
+        zone = f'LOC:{r.location_id}'
+    else:
+        zone = '未知区域'
+    return {
+        'id':            r.id,
+        'user_id':       r.user_id,
+        'user_name':     r.user_name or f'UID:{r.user_id}',
+        'vehicle_id':    r.vehicle_id,
+        'pile_id':       r.pile_id,
+        'pile_name':     r.pile_name or '未知桩',
+        'location_id':   r.location_id,
+        'charging_zone': zone,
+        'status':        r.status.value,
+        'start_time':    r.start_time.isoformat() if r.start_time else '',
+        'end_time':      r.end_time.isoformat()   if r.end_time   else '',
+        'energy_kwh':    r.energy_kwh,
+        'fee_amount':    r.fee_amount
+    }
+
 
 @charging_bp.route('/charging-logs', methods=['GET'])
 def get_charging_logs():
-    # 一次性把 user、pile 以及 pile.location 都加载进来
-    logs = (ChargingSession.query
-            .options(
-                joinedload(ChargingSession.user),
-                joinedload(ChargingSession.pile).joinedload(ChargingPile.location)
-            )
+    """
+    充电记录，按 id 倒序的游标（keyset）分页：
+      ?limit=100&cursor=<上一页 X-Next-Cursor>&user_id=&pile_id=&location_id=&from=&to=
+    响应体仍是记录数组；还有下一页时在 X-Next-Cursor 响应头里给出游标。
+    """
+    try:
+        conds  = _parse_log_filters(request.args)
+        limit  = min(int(request.args.get('limit', LOG_PAGE_SIZE)), LOG_PAGE_SIZE_MAX)
+        cursor = request.args.get('cursor', type=int)
+    except ValueError:
+        return jsonify({'error': '筛选参数格式错误'}), 400
+    if limit <= 0:
+        return jsonify({'error': 'limit 必须为正数'}), 400
+    if cursor:
+        conds.append(ChargingSession.id < cursor)
+
+    rows = (_charging_log_query(conds)
             .order_by(ChargingSession.id.desc())
-            .limit(100)
+            .limit(limit + 1)
             .all())
+    resp = jsonify([_log_record(r) for r in rows[:limit]])
+    if len(rows) > limit:
+        resp.headers['X-Next-Cursor'] = str(rows[limit - 1].id)
+    return resp, 200
+
+
+@charging_bp.route('/charging-logs/export', methods=['GET'])
+def export_charging_logs():
+    """
+    导出充电记录（对账用），筛选参数同 /charging-logs，format=csv（默认）或 ndjson。
+    按 id 正序以 yield_per 分批从游标读取、逐行写出，内存占用与导出总量无关。
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format 只支持 csv / ndjson'}), 400
+    try:
+        conds = _parse_log_filters(request.args)
+    except ValueError:
+        return jsonify({'error': '筛选参数格式错误'}), 400
+
+    query = (_charging_log_query(conds)
+             .order_by(ChargingSession.id)
+             .execution_options(stream_results=True)
+             .yield_per(EXPORT_BATCH))
+
+    def generate():
+        if fmt == 'csv':
+            buf = io.StringIO()
+            writer = csv.DictWriter(buf, fieldnames=LOG_FIELDS)
+            writer.writeheader()
+            for r in query:
+                writer.writerow(_log_record(r))
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            yield buf.getvalue()
+        else:
+            for r in query:
+                yield json.dumps(_log_record(r), ensure_ascii=False) + '\n'
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f"charging-logs-{datetime.utcnow():%Y%m%d%H%M%S}.{fmt}"
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={filename}'
+    })
+
+
+@charging_bp.route('/charging/usage', methods=['GET'])
+def get_charging_usage():
+    """
+    充电用量报表（管理端），读汇总表而不是扫描会话：
+      ?from=YYYY-MM-DD&to=YYYY-MM-DD（不含，默认 from 后 7 天）
+       &granularity=day|hour（默认 day）&group=pile|location（默认 pile）
+    返回 {rows: [{pile_id|location_id, period, sessions, energy_kwh, fee_amount,
+                  occupied_minutes, utilisation}], totals: {...}}
+    utilisation = 占用分钟数 / (桩数 × 时段分钟数)
+    """
+    granularity = request.args.get('granularity', 'day')
+    group       = request.args.get('group', 'pile')
+    if granularity not in ('day', 'hour') or group not in ('pile', 'location'):
+        return jsonify({'error': 'granularity 只支持 day / hour，group 只支持 pile / location'}), 400
+    try:
+        since = datetime.strptime(request.args['from'], '%Y-%m-%d').date()
+        until = (datetime.strptime(request.args['to'], '%Y-%m-%d').date()
+                 if request.args.get('to') else since + timedelta(days=7))
+    except KeyError:
+        return jsonify({'error': 'from 参数必填，格式 YYYY-MM-DD'}), 400
+    except ValueError:
+        return jsonify({'error': 'from/to 格式应为 YYYY-MM-DD'}), 400
 
+    if granularity == 'day':
+        model, period = ChargingUsageDaily, ChargingUsageDaily.day
+        lo, hi, period_minutes = since, until, 24 * 60
+    else:
+        model, period = ChargingUsageHourly, ChargingUsageHourly.hour
+        lo = datetime.combine(since, datetime.min.time())
+        hi = datetime.combine(until, datetime.min.time())
+        period_minutes = 60
+
+    if group == 'pile':
+        key = model.pile_id
+        query = db.session.query(key.label('key'), period.label('period'),
+                                 model.sessions, model.energy_kwh,
+                                 model.fee_amount, model.occupied_minutes)
+        pile_counts = None
+    else:
+        key = ChargingPile.location_id
+        query = db.session.query(key.label('key'), period.label('period'),
+                                 func.sum(model.sessions).label('sessions'),
+                                 func.sum(model.energy_kwh).label('energy_kwh'),
+                                 func.sum(model.fee_amount).label('fee_amount'),
+                                 func.sum(model.occupied_minutes).label('occupied_minutes')) \
+                          .join(ChargingPile, ChargingPile.id == model.pile_id) \
+                          .group_by(key, period)
+        pile_counts = dict(db.session.query(ChargingPile.location_id, func.count(ChargingPile.id))
+                                     .group_by(ChargingPile.location_id).all())
+    rows = query.filter(period >= lo, period < hi).order_by(key, period).all()
+
+    key_name = 'pile_id' if group == 'pile' else 'location_id'
+    totals = dict.fromkeys(('sessions', 'energy_kwh', 'fee_amount', 'occupied_minutes'), 0)
     result = []
-    for log in logs:
+    for r in rows:
+        piles = 1 if pile_counts is None else max(pile_counts.get(r.key, 1), 1)
         result.append({
-            'id': log.id,
-            'user_id': log.user_id,
-            # 用户名
-            'user_name': log.user.name if log.user and log.user.name else f'UID:{log.user_id}',
-            # 车辆ID
-            'vehicle_id': log.vehicle_id,
-            # 充电桩名称
-            'pile_name': log.pile.name if log.pile else '未知桩',
-            # 充电区／位置名称
-            'charging_zone': (log.pile.location.name 
-                              if log.pile and log.pile.location and hasattr(log.pile.location, 'name') 
-                              else f'LOC:{log.pile.location_id}' if log.pile else '未知区域'),
-            'start_time': log.start_time.isoformat() if log.start_time else '',
-            'end_time':   log.end_time.isoformat()   if log.end_time   else '',
-            'energy_kwh': log.energy_kwh,
-            'fee_amount': log.fee_amount
+            key_name:           r.key,
+            'period':           r.period.isoformat(),
+            'sessions':         int(r.sessions),
+            'energy_kwh':       round(r.energy_kwh, 3),
+            'fee_amount':       round(r.fee_amount, 2),
+            'occupied_minutes': round(r.occupied_minutes, 1),
+            'utilisation':      round(r.occupied_minutes / (piles * period_minutes), 4)
         })
-
-    return jsonify(result), 200
-
+        for k in totals:
+            totals[k] += getattr(r, k)
+    totals = {'sessions': int(totals['sessions']),
+              'energy_kwh': round(totals['energy_kwh'], 3),
+              'fee_amount': round(totals['fee_amount'], 2),
+              'occupied_minutes': round(totals['occupied_minutes'], 1)}
+    return jsonify({'from': since.isoformat(), 'to': until.isoformat(),
+                    'granularity': granularity, 'group': group,
+                    'rows': result, 'totals': totals}), 200
 
 
 @charging_bp.route('/charging-piles/<int:pile_id>/slots', methods=['GET'])
 def get_pile_slots(pile_id):
-    _cleanup_expired_reservations()
-
     date_str = request.args.get('date')
     user_id  = request.args.get('user_id', type=int)
     if not date_str:
@@ -318,63 +721,26 @@ def get_pile_slots(pile_id):
     except ValueError:
         return jsonify({'error': 'date 格式应为 YYYY-MM-DD'}), 400
 
-    # 生成未来 72 个 20 分钟粒度的 slot
-    slots = []
+    # 与当天有交集的有效会话（含前一天开始、跨午夜延续到当天的）
     now_utc = datetime.utcnow()
-    for i in range(72):
-        slot_dt = day_start + timedelta(minutes=20 * i)
-        if slot_dt > now_utc:
-            slots.append({'slot_time': slot_dt})
-
-    # 拉当天所有未取消的会话
-    sessions = ChargingSession.query.filter(
-        ChargingSession.pile_id   == pile_id,
-        ChargingSession.slot_time >= day_start,
-        ChargingSession.slot_time <  day_start + timedelta(days=1),
-        ChargingSession.status    != ChargingSessionStatus.cancelled
+    sessions = _overlapping(
+        _session_rows(), pile_id, day_start, day_start + timedelta(days=1), now_utc
     ).all()
 
-    result = []
-    for s in slots:
-        st = 'free'
-        owner = None
-
-        # 判断每个 20 分钟格子是否落在某个预约区间内（支持跨日）
-        for sess in sessions:
-            start_dt = datetime.combine(sess.reserved_date, sess.reserved_start_time)
-            if sess.reserved_end_time <= sess.reserved_start_time:
-                end_dt = datetime.combine(sess.reserved_date + timedelta(days=1), sess.reserved_end_time)
-            else:
-                end_dt = datetime.combine(sess.reserved_date, sess.reserved_end_time)
-
-            if start_dt <= s['slot_time'] < end_dt:
-                if sess.status == ChargingSessionStatus.reserved:
-                    st = ('mine' if (user_id and sess.user_id == user_id)
-                          else 'reserved')
-                else:
-                    st = 'occupied'
-                owner = sess.user_id
-                break
-
-        result.append({
-            'slot':            s['slot_time'].strftime('%H:%M'),
-            'status':          st,
-            'session_id':      sess.id if owner else None,
-            'session_user_id': owner
-        })
-
-    return jsonify(result), 200
+    # 72 个 20 分钟粒度的 slot，对排序后的预约区间做一次扫描得出状态
+    engine = AvailabilityEngine(sessions)
+    return jsonify(engine.slot_grid(pile_id, day_start, now_utc, user_id)), 200
 
 
 @charging_bp.route('/charging-sessions/user/<int:user_id>', methods=['GET'])
 def get_my_reservations(user_id):
-    _cleanup_expired_reservations()
     sessions = ChargingSession.query.filter(
         ChargingSession.user_id == user_id,
         ChargingSession.status.in_([
             ChargingSessionStatus.reserved,
             ChargingSessionStatus.ongoing
-        ])
+        ]),
+        live_session_filter()
     ).all()
 
     result = []
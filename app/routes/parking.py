@@ -3,6 +3,7 @@ from datetime import datetime
 from flask import Blueprint, jsonify, request
 from app import db
 from app.models.parking import ParkingLot, ParkingSpace, ParkingRecord
+from app.utils.parking_alloc import allocate_space, forget_lot, release_spaces
 from sqlalchemy.orm import joinedload
 
 parking_bp = Blueprint('parking', __name__,url_prefix='/api/parking')
@@ -55,21 +56,19 @@ def add_parking_lot():
 
     parking_lot = ParkingLot(location_id=location_id, name=name, capacity=capacity)
     db.session.add(parking_lot)
+    db.session.flush()
+
+    # 创建停车位，与停车场在同一个事务里提交，再放入空闲集合
+    spaces = [ParkingSpace(parking_lot_id=parking_lot.id) for _ in range(capacity)]
+    db.session.add_all(spaces)
     db.session.commit()
-    
-    # 创建停车位
-    for _ in range(capacity):
-        parking_space = ParkingSpace(parking_lot_id=parking_lot.id)
-        db.session.add(parking_space)
-    
-    db.session.commit()
+    release_spaces(parking_lot.id, *[space.id for space in spaces])
 
     return jsonify({"message": "停车场创建成功"}), 201
 
 @parking_bp.route('/park_in', methods=['POST'])
 def park_in():
     data = request.get_json()
-    print("收到的数据:", data)  
 
     lot_id = data['lot_id']
     vehicle_id = data['vehicle_id']
@@ -80,23 +79,28 @@ def park_in():
     if not parking_lot:
         return jsonify({"message": "停车场不存在"}), 404
 
-    # 查找空闲停车位
-    available_space = ParkingSpace.query.filter_by(parking_lot_id=lot_id, status='available').first()
-    if not available_space:
+    # 分配空闲停车位（Redis 空闲集合 + 条件更新，见 app/utils/parking_alloc）
+    space_id = allocate_space(lot_id)
+    if space_id is None:
+        db.session.rollback()
         return jsonify({"message": "停车场已满"}), 400
 
-    # 更新停车位状态为“占用”
-    available_space.status = 'occupied'
-
-    # ✅ 更新停车场 occupied +1
-    parking_lot.occupied += 1  
+    # ✅ 更新停车场 occupied +1（在数据库里累加，并发入场不会丢失计数）
+    ParkingLot.query.filter_by(id=lot_id).update(
+        {ParkingLot.occupied: ParkingLot.occupied + 1}, synchronize_session=False
+    )
 
     # 创建停车记录
-    parking_record = ParkingRecord(user_id=user_id, vehicle_id=vehicle_id, parking_space_id=available_space.id)
+    parking_record = ParkingRecord(user_id=user_id, vehicle_id=vehicle_id, parking_space_id=space_id)
     db.session.add(parking_record)
 
-    # 提交所有更改
-    db.session.commit()
+    # 提交所有更改；失败时车位仍为空闲，放回空闲集合
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        release_spaces(lot_id, space_id)
+        raise
 
     return jsonify({"message": "停车成功"}), 200
 
@@ -110,22 +114,29 @@ def park_out(record_id):
     if not record:
         return jsonify({"message": "停车记录不存在"}), 404
 
+    # 先标记出库时间，重复出库（并发 / 重复提交）只有一次生效
+    closed = ParkingRecord.query.filter_by(id=record_id, park_out_time=None).update(
+        {ParkingRecord.park_out_time: datetime.utcnow()}, synchronize_session=False
+    )
+    if not closed:
+        db.session.rollback()
+        return jsonify({"message": "该车辆已出库"}), 400
+
     # 找到停车位
     parking_space = ParkingSpace.query.get(record.parking_space_id)
-    parking_lot = ParkingLot.query.get(parking_space.parking_lot_id)
+    lot_id = parking_space.parking_lot_id
 
     # 更新停车位状态为“空闲”
     parking_space.status = 'available'
 
     # ✅ 更新停车场 occupied -1
-    if parking_lot.occupied > 0:
-        parking_lot.occupied -= 1  
-
-    # 更新停车记录，添加出库时间
-    record.park_out_time = datetime.utcnow()
+    ParkingLot.query.filter(ParkingLot.id == lot_id, ParkingLot.occupied > 0).update(
+        {ParkingLot.occupied: ParkingLot.occupied - 1}, synchronize_session=False
+    )
 
-    # 提交所有更改
+    # 提交所有更改，再把车位放回空闲集合
     db.session.commit()
+    release_spaces(lot_id, parking_space.id)
 
     return jsonify({"message": "取车成功"}), 200
 
@@ -172,9 +183,13 @@ def update_parking_lot(lot_id):
         return jsonify({"message": "停车场不存在"}), 404
 
     parking_lot.name = data.get('name', parking_lot.name)
+    capacity_changed = 'capacity' in data and data['capacity'] != parking_lot.capacity
     parking_lot.capacity = data.get('capacity', parking_lot.capacity)
 
     db.session.commit()
+    if capacity_changed:
+        # 容量变化时丢弃空闲集合，下次入场按库里的车位重新加载
+        forget_lot(lot_id)
     return jsonify({"message": "停车场信息更新成功"}), 200
 
 
@@ -196,6 +211,7 @@ def delete_parking_lot(lot_id):
 
     db.session.delete(parking_lot)
     db.session.commit()
+    forget_lot(lot_id)
     
     return jsonify({"message": "停车场删除成功"}), 200
 
@@ -0,0 +1 @@
+# app/tasks: 后台定时任务
@@ -0,0 +1,132 @@
+# app/tasks/reservations.py
+"""
+过期预约清理
+
+预约创建后 RESERVATION_HOLD 内未开始充电即视为过期。清理由后台定时任务完成，
+读接口不再顺带写库：
+  - 应用内：create_app 启动 ReservationSweeper 线程，每 RESERVATION_SWEEP_INTERVAL 秒扫一次
+  - 独立进程：flask sweep-reservations [--loop]（多实例部署时可关闭应用内线程，只跑一个 worker）
+清理本身是两条批量 UPDATE，可重复执行、多实例并发执行也安全；
+批量 UPDATE 同时递增 version，与 app/utils/charging_state.py 的乐观锁兼容。
+在两次清理之间，读接口与冲突检查用 live_session_filter()（app/utils/session_filters.py）把已过期的预约当作不存在。
+"""
+import logging
+import threading
+from datetime import datetime
+
+import click
+from sqlalchemy import and_, exists, not_, select, update
+
+from app import db
+from app.models.charging import (
+    ChargingPile,
+    ChargingSession,
+    ChargingPileStatus,
+    ChargingSessionStatus
+)
+from app.utils.pile_status import publish_piles
+from app.utils.session_filters import reservation_cutoff
+
+logger = logging.getLogger(__name__)
+
+
+def expire_stale_reservations(now=None) -> int:
+    """
+    把超时未开始的预约批量标记为 cancelled，并释放不再有有效预约的桩。
+    返回取消的会话数。
+    """
+    cutoff = reservation_cutoff(now)
+    stale = and_(ChargingSession.status == ChargingSessionStatus.reserved,
+                 ChargingSession.created_at < cutoff)
+
+    # 先释放桩：有过期预约、且没有其他仍有效预约的 reserved 桩
+    expiring = select(ChargingSession.pile_id).where(stale)
+    still_held = exists().where(
+        ChargingSession.pile_id == ChargingPile.id,
+        ChargingSession.status == ChargingSessionStatus.reserved,
+        ChargingSession.created_at >= cutoff
+    )
+    releasable = and_(ChargingPile.status == ChargingPileStatus.reserved,
+                      ChargingPile.id.in_(expiring),
+                      not_(still_held))
+    # 先取出要释放的桩 id，提交后据此写穿状态缓存
+    released = [pid for (pid,) in db.session.execute(select(ChargingPile.id).where(releasable))]
+    if released:
+        db.session.execute(
+            update(ChargingPile)
+            .where(ChargingPile.id.in_(released), releasable)
+            .values(status=ChargingPileStatus.available, updated_at=datetime.utcnow(),
+                    version=ChargingPile.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+    result = db.session.execute(
+        update(ChargingSession)
+        .where(stale)
+        .values(status=ChargingSessionStatus.cancelled, version=ChargingSession.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if released:
+        publish_piles(ChargingPile.query.filter(ChargingPile.id.in_(released)).all())
+    if result.rowcount:
+        logger.info(f"Expired {result.rowcount} stale reservations")
+    return result.rowcount
+
+
+class ReservationSweeper(threading.Thread):
+    """应用内的定时清理线程；异常只记日志，下个周期重试。"""
+
+    def __init__(self, app, interval: float=60):
+        super().__init__(name="reservation-sweeper", daemon=True)
+        self.app      = app
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def sweep_once(self):
+        with self.app.app_context():
+            try:
+                return expire_stale_reservations()
+            except Exception:
+                db.session.rollback()
+                logger.exception("Reservation sweep failed")
+            finally:
+                db.session.remove()
+
+    def run(self):
+        while True:
+            self.sweep_once()
+            if self._stopped.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stopped.set()
+
+
+def init_reservation_sweeper(app):
+    """注册 CLI 命令；RESERVATION_SWEEP_INTERVAL > 0 且非测试环境时在应用内启动清理线程。"""
+
+    @app.cli.command('sweep-reservations')
+    @click.option('--loop', is_flag=True, help='持续运行，每隔 interval 秒清理一次')
+    @click.option('--interval', default=60, show_default=True, help='清理间隔（秒）')
+    def sweep_reservations(loop, interval):
+        """清理超时未开始的充电预约"""
+        if not loop:
+            click.echo(f"expired {expire_stale_reservations()} reservations")
+            return
+        ReservationSweeper(app, interval).run()
+
+    interval = app.config.get('RESERVATION_SWEEP_INTERVAL', 0)
+    if not interval or app.testing:
+        return
+    lock = threading.Lock()
+
+    # 在首个请求时才启动，避免 flask db upgrade 等 CLI 命令也带起清理线程
+    @app.before_request
+    def _start_reservation_sweeper():
+        if 'reservation_sweeper' in app.extensions:
+            return
+        with lock:
+            if 'reservation_sweeper' not in app.extensions:
+                sweeper = ReservationSweeper(app, interval)
+                sweeper.start()
+                app.extensions['reservation_sweeper'] = sweeper
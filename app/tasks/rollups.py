@@ -0,0 +1,211 @@
+# app/tasks/rollups.py
+"""
+充电用量汇总
+
+charging_usage_hourly / charging_usage_daily 按 (桩, UTC 小时 / UTC 日期) 记录：
+会话数（计入开始所在的小时）、电量、费用、占用分钟数。
+跨小时的会话按时长切开，电量与费用按各段时长比例分摊（电量本身就是 时长 × 功率）。
+
+  - 增量：stop_charging 在同一事务里调用 record_session_usage()，用数据库 upsert 累加
+  - 重建：flask rollup-charging [--since --until] 按时间段删除后从 charging_sessions 重算，
+    用于首次上线回填或修正历史数据；重建期间结束的会话可能被重复或遗漏计数，应在低峰期运行
+管理端报表只读汇总表，代价是 O(桩数 × 天数)，与会话总量无关；
+时段推荐的繁忙度预测（demand_forecast）同样只读小时汇总表。
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import click
+from sqlalchemy import func
+
+from app import db
+from app.models.charging import (
+    ChargingSession,
+    ChargingSessionStatus,
+    ChargingUsageDaily,
+    ChargingUsageHourly
+)
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FIELDS = ('sessions', 'energy_kwh', 'fee_amount', 'occupied_minutes')
+INSERT_BATCH  = 1000
+DEMAND_WEEKS  = 8
+
+
+def split_usage(start, end, energy_kwh, fee_amount):
+    """
+    把一次充电按 UTC 整点切开，逐段产出 (hour, sessions, energy_kwh, fee_amount, minutes)。
+    sessions 只在第一段为 1。
+    """
+    energy_kwh, fee_amount = energy_kwh or 0.0, fee_amount or 0.0
+    hour = start.replace(minute=0, second=0, microsecond=0)
+    total = (end - start).total_seconds()
+    if total <= 0:
+        yield hour, 1, energy_kwh, fee_amount, 0.0
+        return
+    first = 1
+    while hour < end:
+        nxt = hour + timedelta(hours=1)
+        secs = (min(end, nxt) - max(start, hour)).total_seconds()
+        share = secs / total
+        yield hour, first, energy_kwh * share, fee_amount * share, secs / 60
+        first = 0
+        hour = nxt
+
+
+def usage_buckets(sessions):
+    """
+    sessions 需有 pile_id/start_time/end_time/energy_kwh/fee_amount 属性。
+    返回 (hourly, daily)：{(pile_id, hour|day): [sessions, energy_kwh, fee_amount, occupied_minutes]}
+    """
+    hourly = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+    daily  = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+    for s in sessions:
+        for hour, n, kwh, fee, minutes in split_usage(s.start_time, s.end_time, s.energy_kwh, s.fee_amount):
+            for acc in (hourly[(s.pile_id, hour)], daily[(s.pile_id, hour.date())]):
+                acc[0] += n
+                acc[1] += kwh
+                acc[2] += fee
+                acc[3] += minutes
+    return hourly, daily
+
+
+def _rows(buckets, period_col):
+    return [dict(zip(('pile_id', period_col) + ROLLUP_FIELDS, key + tuple(vals)))
+            for key, vals in buckets.items()]
+
+
+def upsert_add_stmt(model, dialect: str):
+    """按主键累加的 INSERT：MySQL 用 ON DUPLICATE KEY UPDATE，SQLite / PostgreSQL 用 ON CONFLICT。"""
+    table = model.__table__
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        return stmt.on_duplicate_key_update({f: table.c[f] + stmt.inserted[f] for f in ROLLUP_FIELDS})
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[c.name for c in table.primary_key],
+        set_={f: table.c[f] + stmt.excluded[f] for f in ROLLUP_FIELDS}
+    )
+
+
+def _upsert_add(model, rows):
+    if not rows:
+        return
+    db.session.execute(upsert_add_stmt(model, db.session.get_bind().dialect.name), rows)
+
+
+def record_session_usage(session):
+    """会话结束时调用（不提交，随调用方的事务一起提交）。"""
+    if session.start_time is None or session.end_time is None:
+        return
+    hourly, daily = usage_buckets([session])
+    _upsert_add(ChargingUsageHourly, _rows(hourly, 'hour'))
+    _upsert_add(ChargingUsageDaily, _rows(daily, 'day'))
+
+
+def rebuild_usage(since: date, until: date) -> int:
+    """
+    重算 [since, until) 内的汇总行并提交，返回参与计算的会话数。
+    跨越边界的会话只计入范围内的部分；会话数仍计入其开始所在的小时。
+    """
+    lo = datetime.combine(since, datetime.min.time())
+    hi = datetime.combine(until, datetime.min.time())
+    db.session.query(ChargingUsageHourly).filter(
+        ChargingUsageHourly.hour >= lo, ChargingUsageHourly.hour < hi
+    ).delete(synchronize_session=False)
+    db.session.query(ChargingUsageDaily).filter(
+        ChargingUsageDaily.day >= since, ChargingUsageDaily.day < until
+    ).delete(synchronize_session=False)
+
+    sessions = db.session.query(
+        ChargingSession.pile_id,
+        ChargingSession.start_time,
+        ChargingSession.end_time,
+        ChargingSession.energy_kwh,
+        ChargingSession.fee_amount
+    ).filter(
+        ChargingSession.status == ChargingSessionStatus.completed,
+        ChargingSession.start_time < hi,
+        ChargingSession.end_time > lo
+    ).execution_options(stream_results=True).yield_per(INSERT_BATCH)
+
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for r in rows:
+            count += 1
+            yield r
+
+    hourly, daily = usage_buckets(counted(sessions))
+    hourly_rows = [r for r in _rows(hourly, 'hour') if lo <= r['hour'] < hi]
+    daily_rows  = [r for r in _rows(daily, 'day') if since <= r['day'] < until]
+    for model, rows in ((ChargingUsageHourly, hourly_rows), (ChargingUsageDaily, daily_rows)):
+        for i in range(0, len(rows), INSERT_BATCH):
+            db.session.execute(model.__table__.insert(), rows[i:i + INSERT_BATCH])
+    db.session.commit()
+    logger.info(f"Rebuilt charging usage {since}..{until}: {count} sessions, "
+                f"{len(hourly_rows)} hourly / {len(daily_rows)} daily rows")
+    return count
+
+
+def demand_forecast(pile_ids, hour: datetime, weeks: int=DEMAND_WEEKS) -> dict:
+    """
+    各桩在 hour 这个时段的预测繁忙度（0~1）：过去 weeks 周里同一星期几、同一小时的平均占用率。
+    只按主键 (pile_id, hour) 取 len(pile_ids) × weeks 行汇总，与会话总量无关。
+    占用分钟已由 record_session_usage / rebuild_usage 按 (桩, 小时) 预先汇总，
+    不必每次把会话历史读进内存再用 NumPy / pandas 按星期几、小时分组，应用服务也不新增依赖。
+    """
+    pile_ids = list(pile_ids)
+    if not pile_ids:
+        return {}
+    hour = hour.replace(minute=0, second=0, microsecond=0)
+    same_slot = [hour - timedelta(weeks=w) for w in range(1, weeks + 1)]
+    rows = db.session.query(
+        ChargingUsageHourly.pile_id,
+        func.sum(ChargingUsageHourly.occupied_minutes)
+    ).filter(
+        ChargingUsageHourly.pile_id.in_(pile_ids),
+        ChargingUsageHourly.hour.in_(same_slot)
+    ).group_by(ChargingUsageHourly.pile_id).all()
+    busy = {pid: 0.0 for pid in pile_ids}
+    for pid, minutes in rows:
+        busy[pid] = round(min((minutes or 0) / (60 * weeks), 1.0), 4)
+    return busy
+
+
+def init_charging_rollups(app):
+    """注册回填 / 重建命令。"""
+
+    @app.cli.command('rollup-charging')
+    @click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']),
+                  help='起始日期（含），默认最早一次充电的日期')
+    @click.option('--until', type=click.DateTime(formats=['%Y-%m-%d']),
+                  help='结束日期（不含），默认明天')
+    @click.option('--chunk-days', default=7, show_default=True,
+                  help='每次重建的天数；分段提交，内存只与单段的桩数 × 小时数有关')
+    def rollup_charging(since, until, chunk_days):
+        """从充电会话重建按小时 / 按天的用量汇总"""
+        if since is None:
+            first = db.session.query(func.min(ChargingSession.start_time)).scalar()
+            if first is None:
+                click.echo("no charging sessions")
+                return
+            since = first
+        until = (until or datetime.utcnow() + timedelta(days=1)).date()
+        day, total = since.date(), 0
+        while day < until:
+            end = min(day + timedelta(days=chunk_days), until)
+            count = rebuild_usage(day, end)
+            if count:
+                click.echo(f"{day} .. {end}: {count} sessions")
+            total += count
+            day = end
+        click.echo(f"rebuilt usage from {total} sessions (sessions spanning chunks counted per chunk)")
@@ -0,0 +1,170 @@
+# app/utils/availability.py
+"""
+充电桩时段可用性引擎
+
+按桩把会话换算成绝对时间区间 [start, end)（end ≤ start 的时间视为跨到次日），
+每个桩排序一次，之后：
+  - slot_grid()：对一串等间隔的格子做一次扫描线（O(格子数 + 会话数)），
+    取代「每个格子 × 每个会话」的双重循环
+  - find()：单个时刻落在哪个会话里，二分查找
+  - free_windows()：某时间窗内的空闲区间
+一个引擎可同时装入多桩、多天的会话，多桩 / 多天查询共用一次加载与排序。
+本模块不依赖 Flask / SQLAlchemy，会话只需有下列属性（ORM 对象或查询行均可）：
+    id, pile_id, user_id, status, 以及 start_ts/end_ts
+    或 reserved_date/reserved_start_time/reserved_end_time
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+SLOT_MINUTES  = 20
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+# 结束时刻不晚于开始时刻即跨到次日，因此单个会话最长 24 小时
+MAX_SESSION_SPAN = timedelta(days=1)
+
+
+def session_interval(sess):
+    """会话的绝对起止时间；结束时刻不晚于开始时刻时视为跨到下一天。"""
+    if getattr(sess, 'start_ts', None) is not None:
+        return sess.start_ts, sess.end_ts
+    start = datetime.combine(sess.reserved_date, sess.reserved_start_time)
+    end_day = sess.reserved_date
+    if sess.reserved_end_time <= sess.reserved_start_time:
+        end_day = end_day + timedelta(days=1)
+    return start, datetime.combine(end_day, sess.reserved_end_time)
+
+
+def _status_value(status):
+    return getattr(status, 'value', status)
+
+
+class PileSchedule:
+    """单个桩按开始时间排序的区间表。"""
+
+    __slots__ = ('starts', 'ends', 'sessions', 'max_end')
+
+    def __init__(self, intervals):
+        intervals = sorted(intervals, key=lambda iv: iv[0])
+        self.starts   = [iv[0] for iv in intervals]
+        self.ends     = [iv[1] for iv in intervals]
+        self.sessions = [iv[2] for iv in intervals]
+        # 前缀最大结束时间：允许区间重叠时仍能用二分剪枝
+        self.max_end  = []
+        cur = None
+        for end in self.ends:
+            cur = end if cur is None or end > cur else cur
+            self.max_end.append(cur)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def find(self, t):
+        """包含时刻 t 的会话（start ≤ t < end），没有则返回 None。"""
+        i = bisect_right(self.starts, t) - 1
+        while i >= 0 and self.max_end[i] > t:
+            if self.ends[i] > t:
+                return self.sessions[i]
+            i -= 1
+        return None
+
+    def occupancy(self, slot_starts):
+        """
+        对递增的时刻序列做扫描线，返回与之一一对应的会话（或 None）。
+        活跃区间放在按下标（即开始时间）排序的小顶堆里，堆顶已结束的随扫描弹出，
+        堆顶即覆盖该时刻、开始最早的会话；每个区间只进出堆一次。
+        """
+        out, active, i, n = [], [], 0, len(self.starts)
+        for t in slot_starts:
+            while i < n and self.starts[i] <= t:
+                heapq.heappush(active, i)
+                i += 1
+            while active and self.ends[active[0]] <= t:
+                heapq.heappop(active)
+            out.append(self.sessions[active[0]] if active else None)
+        return out
+
+    def free_windows(self, start, end):
+        """
+        [start, end) 内未被任何会话覆盖的区间列表 [(s, e), …]。
+        开始不晚于 start 的区间对 [start, …) 的覆盖就是 [start, 前缀最大结束时间)，
+        二分定位后只扫描在窗口内开始的区间：O(log n + 窗口内区间数)，与当天之前的会话数量无关。
+        """
+        windows = []
+        j = bisect_right(self.starts, start)
+        cursor = max(start, self.max_end[j - 1]) if j else start
+        for k in range(j, bisect_left(self.starts, end)):
+            s, e = self.starts[k], self.ends[k]
+            if s > cursor:
+                windows.append((cursor, s))
+            if e > cursor:
+                cursor = e
+        if cursor < end:
+            windows.append((cursor, end))
+        return windows
+
+
+class AvailabilityEngine:
+    """多桩的 PileSchedule 集合；sessions 可一次装入多桩、多天。"""
+
+    def __init__(self, sessions=()):
+        grouped = defaultdict(list)
+        for sess in sessions:
+            start, end = session_interval(sess)
+            grouped[sess.pile_id].append((start, end, sess))
+        self.schedules = {pile_id: PileSchedule(ivs) for pile_id, ivs in grouped.items()}
+        self._empty = PileSchedule([])
+
+    def schedule(self, pile_id) -> PileSchedule:
+        return self.schedules.get(pile_id, self._empty)
+
+    @staticmethod
+    def slot_times(day_start, now=None, slot_minutes: int=SLOT_MINUTES, count: int=SLOTS_PER_DAY):
+        """day_start 起的等间隔格子，只保留晚于 now 的。"""
+        step = timedelta(minutes=slot_minutes)
+        times = [day_start + step * i for i in range(count)]
+        return [t for t in times if now is None or t > now]
+
+    @staticmethod
+    def _rows(times, occupied, user_id=None):
+        rows = []
+        for t, sess in zip(times, occupied):
+            if sess is None:
+                rows.append({'slot': t.strftime('%H:%M'), 'status': 'free',
+                             'session_id': None, 'session_user_id': None})
+                continue
+            if _status_value(sess.status) == 'reserved':
+                status = 'mine' if (user_id and sess.user_id == user_id) else 'reserved'
+            else:
+                status = 'occupied'
+            rows.append({'slot': t.strftime('%H:%M'), 'status': status,
+                         'session_id': sess.id, 'session_user_id': sess.user_id})
+        return rows
+
+    def slot_grid(self, pile_id, day_start, now=None, user_id=None):
+        """
+        单桩单天的格子状态，与原 /charging-piles/<id>/slots 返回格式一致：
+        [{slot, status: free|mine|reserved|occupied, session_id, session_user_id}, …]
+        """
+        times = self.slot_times(day_start, now)
+        return self._rows(times, self.schedule(pile_id).occupancy(times), user_id)
+
+    def grids(self, pile_ids, days, now=None, user_id=None):
+        """
+        多桩多天：{pile_id: {date_iso: slot_grid}}，days 为 date 列表。
+        各天的格子按时间拼成一条序列，每个桩只扫描一遍。
+        """
+        per_day = []
+        for day in sorted(days):
+            day_start = datetime.combine(day, datetime.min.time())
+            per_day.append((day.isoformat(), self.slot_times(day_start, now)))
+        all_times = [t for _, times in per_day for t in times]
+
+        out = {}
+        for pile_id in pile_ids:
+            occupied = self.schedule(pile_id).occupancy(all_times)
+            out[pile_id], offset = {}, 0
+            for key, times in per_day:
+                out[pile_id][key] = self._rows(times, occupied[offset:offset + len(times)], user_id)
+                offset += len(times)
+        return out
@@ -0,0 +1,216 @@
+# app/utils/charging_state.py
+"""
+充电桩 / 充电会话状态机
+
+所有会改变 ChargingPile.status / ChargingSession.status 的操作都经过这里：
+  - 先 SELECT ... FOR UPDATE 锁住桩，再读会话（统一按 桩 → 会话 的顺序加锁，避免死锁）
+  - 两张表都有 version 列（mapper 的 version_id_col），ORM 更新带 WHERE version = 旧值，
+    不支持行锁的数据库（SQLite）或绕过行锁的写入也会在提交时以 StaleDataError 暴露冲突
+  - 桩状态不由调用方直接指定，而是按桩上仍有效的会话重新推导（_settle_pile），
+    不会出现「取消一个预约把正在充电的桩改成空闲」之类的覆盖
+run_transition() 负责事务：提交成功返回结果；乐观锁冲突、死锁、锁等待超时时回滚并退避重试；
+非法转换抛 TransitionError，由路由转成 400。
+"""
+import logging
+import random
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+
+from app import db
+from app.models.charging import (
+    ChargingPile,
+    ChargingSession,
+    ChargingPileStatus,
+    ChargingSessionStatus
+)
+from app.tasks.rollups import record_session_usage
+from app.utils.session_filters import live_session_filter, overlap_filter
+
+logger = logging.getLogger(__name__)
+
+TRANSITION_RETRIES = 8
+
+PILE_TRANSITIONS = {
+    ChargingPileStatus.available: {ChargingPileStatus.reserved, ChargingPileStatus.charging,
+                                   ChargingPileStatus.offline},
+    ChargingPileStatus.reserved:  {ChargingPileStatus.available, ChargingPileStatus.charging,
+                                   ChargingPileStatus.offline},
+    ChargingPileStatus.charging:  {ChargingPileStatus.available, ChargingPileStatus.reserved,
+                                   ChargingPileStatus.finished, ChargingPileStatus.offline},
+    ChargingPileStatus.finished:  {ChargingPileStatus.available, ChargingPileStatus.reserved,
+                                   ChargingPileStatus.offline},
+    ChargingPileStatus.offline:   {ChargingPileStatus.available},
+}
+
+SESSION_TRANSITIONS = {
+    ChargingSessionStatus.reserved:  {ChargingSessionStatus.ongoing, ChargingSessionStatus.cancelled},
+    ChargingSessionStatus.ongoing:   {ChargingSessionStatus.completed},
+    ChargingSessionStatus.completed: set(),
+    ChargingSessionStatus.cancelled: set(),
+}
+
+
+class TransitionError(Exception):
+    """状态转换不合法或对象不存在；消息可直接返回给客户端。"""
+
+
+def _retryable(exc) -> bool:
+    if isinstance(exc, StaleDataError):
+        return True
+    if isinstance(exc, OperationalError):
+        args = getattr(exc.orig, 'args', ())
+        # MySQL 1205 锁等待超时 / 1213 死锁；SQLite 写锁冲突
+        return (args and args[0] in (1205, 1213)) or 'database is locked' in str(exc.orig)
+    return False
+
+
+def run_transition(fn, *args, retries: int=TRANSITION_RETRIES, **kwargs):
+    """在一个事务里执行 fn(*args, **kwargs) 并提交，冲突时回滚重试，返回 fn 的结果。"""
+    for attempt in range(retries + 1):
+        try:
+            result = fn(*args, **kwargs)
+            db.session.commit()
+            return result
+        except Exception as e:
+            db.session.rollback()
+            if attempt == retries or not _retryable(e):
+                raise
+            logger.info(f"{fn.__name__} conflict ({type(e).__name__}), retry {attempt + 1}/{retries}")
+            time.sleep(random.uniform(0, 0.01 * 2 ** min(attempt, 5)))
+
+
+def _lock_pile(pile_id):
+    return (ChargingPile.query.filter_by(id=pile_id)
+            .with_for_update()
+            .populate_existing()
+            .first())
+
+
+def _load_session(session_id):
+    """锁住会话所在的桩，再读取加锁后的会话最新状态。"""
+    sess = db.session.get(ChargingSession, session_id)
+    if sess is None:
+        raise TransitionError('会话不存在')
+    pile = _lock_pile(sess.pile_id)
+    sess = ChargingSession.query.filter_by(id=session_id).populate_existing().one()
+    return sess, pile
+
+
+def _set_session(sess, target):
+    if target not in SESSION_TRANSITIONS[sess.status]:
+        raise TransitionError(f'会话状态为 {sess.status.value}，不能变为 {target.value}')
+    sess.status = target
+
+
+def _settle_pile(pile, now=None):
+    """
+    按桩上的会话推导桩状态：有充电中的会话 → charging，有有效预约 → reserved，否则 available；
+    离线桩保持离线。无论状态是否变化都写一次 updated_at，使本事务对桩做一次版本号比较。
+    """
+    now = now or datetime.utcnow()
+    db.session.flush()
+    if pile.status != ChargingPileStatus.offline:
+        base = db.session.query(ChargingSession.id).filter(ChargingSession.pile_id == pile.id)
+        if base.filter(ChargingSession.status == ChargingSessionStatus.ongoing).first():
+            target = ChargingPileStatus.charging
+        elif base.filter(ChargingSession.status == ChargingSessionStatus.reserved,
+                         ChargingSession.end_ts > now,
+                         live_session_filter(now)).first():
+            target = ChargingPileStatus.reserved
+        else:
+            target = ChargingPileStatus.available
+        if target != pile.status and target not in PILE_TRANSITIONS[pile.status]:
+            raise TransitionError(f'充电桩状态为 {pile.status.value}，不能变为 {target.value}')
+        pile.status = target
+    pile.updated_at = now
+
+
+PILE_EDITABLE = ('name', 'connector', 'power_kw', 'fee_rate')
+
+
+def update_pile(pile_id, fields: dict):
+    """修改桩的静态属性（PILE_EDITABLE 中出现在 fields 里的字段），与状态转换一样先锁桩。"""
+    pile = _lock_pile(pile_id)
+    if pile is None:
+        raise TransitionError('未找到充电桩')
+    for name in PILE_EDITABLE:
+        if name in fields:
+            setattr(pile, name, fields[name])
+    return pile
+
+
+def delete_pile(pile_id):
+    """锁桩后删除，返回 (location_id, pile_id) 供推送删除增量。"""
+    pile = _lock_pile(pile_id)
+    if pile is None:
+        raise TransitionError('充电桩不存在')
+    deleted = (pile.location_id, pile.id)
+    db.session.delete(pile)
+    return deleted
+
+
+def reserve_session(user_id, vehicle_id, pile_id, start, end, now=None):
+    """预约 [start, end)；与有效会话重叠时抛 TransitionError。返回 (session, pile)。"""
+    now = now or datetime.utcnow()
+    pile = _lock_pile(pile_id)
+    if pile is None:
+        raise TransitionError('车辆或充电桩不存在')
+    if pile.status == ChargingPileStatus.offline:
+        raise TransitionError('充电桩离线，暂不可预约')
+    conflict = db.session.query(ChargingSession.id).filter(
+        ChargingSession.pile_id == pile_id,
+        overlap_filter(start, end, now)
+    ).first()
+    if conflict:
+        raise TransitionError('该时段区间已被占用')
+
+    sess = ChargingSession(
+        user_id             = user_id,
+        pile_id             = pile_id,
+        vehicle_id          = vehicle_id,
+        slot_time           = start,
+        reserved_date       = start.date(),
+        reserved_start_time = start.time(),
+        reserved_end_time   = end.time(),
+        start_ts            = start,
+        end_ts              = end,
+        status              = ChargingSessionStatus.reserved
+    )
+    db.session.add(sess)
+    _settle_pile(pile, now)
+    return sess, pile
+
+
+def cancel_session(session_id):
+    sess, pile = _load_session(session_id)
+    _set_session(sess, ChargingSessionStatus.cancelled)
+    _settle_pile(pile)
+    return sess, pile
+
+
+def start_session(session_id):
+    sess, pile = _load_session(session_id)
+    if pile.status == ChargingPileStatus.offline:
+        raise TransitionError('充电桩离线')
+    if pile.status == ChargingPileStatus.charging:
+        raise TransitionError('充电桩正在使用中')
+    _set_session(sess, ChargingSessionStatus.ongoing)
+    sess.start_time = datetime.utcnow()
+    _settle_pile(pile)
+    return sess, pile
+
+
+def stop_session(session_id):
+    """结束充电，按时长与功率计算电量和费用，并累加用量汇总。"""
+    sess, pile = _load_session(session_id)
+    _set_session(sess, ChargingSessionStatus.completed)
+    sess.end_time = datetime.utcnow()
+    duration_h = (sess.end_time - sess.start_time).total_seconds() / 3600.0
+    sess.energy_kwh = round(duration_h * pile.power_kw, 3)
+    sess.fee_amount = round(sess.energy_kwh * pile.fee_rate, 2)
+    record_session_usage(sess)
+    _settle_pile(pile, sess.end_time)
+    return sess, pile
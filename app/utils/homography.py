@@ -0,0 +1,89 @@
+# app/utils/homography.py
+"""
+摄像头标定：由 4 个以上「像素点 ↔ 经纬度」参考点求 3×3 单应矩阵（像素 → 地理）。
+
+后端不依赖 NumPy，这里用纯 Python 做归一化 DLT：固定 h33 = 1，
+对 8 个未知数解最小二乘的正规方程。结果的符号与检测端 geo.py 约定一致：
+参考点的齐次坐标 w 为正。
+"""
+import math
+
+
+def _normalize(points):
+    n = len(points)
+    mx = sum(p[0] for p in points) / n
+    my = sum(p[1] for p in points) / n
+    dist = sum(math.hypot(p[0] - mx, p[1] - my) for p in points) / n
+    s = math.sqrt(2) / dist if dist > 0 else 1.0
+    T = [[s, 0.0, -s * mx], [0.0, s, -s * my], [0.0, 0.0, 1.0]]
+    return [((x - mx) * s, (y - my) * s) for x, y in points], T
+
+
+def _solve(A, b):
+    """高斯消元（列主元）解 A x = b；奇异时抛 ValueError。"""
+    n = len(A)
+    M = [row[:] + [b[i]] for i, row in enumerate(A)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(M[r][col]))
+        if abs(M[pivot][col]) < 1e-12:
+            raise ValueError('reference points are degenerate (collinear or duplicated)')
+        M[col], M[pivot] = M[pivot], M[col]
+        for r in range(col + 1, n):
+            f = M[r][col] / M[col][col]
+            for c in range(col, n + 1):
+                M[r][c] -= f * M[col][c]
+    x = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        x[r] = (M[r][n] - sum(M[r][c] * x[c] for c in range(r + 1, n))) / M[r][r]
+    return x
+
+
+def _matmul(A, B):
+    return [[sum(A[i][k] * B[k][j] for k in range(3)) for j in range(3)] for i in range(3)]
+
+
+def _inv_similarity(T):
+    s = T[0][0]
+    return [[1 / s, 0.0, -T[0][2] / s], [0.0, 1 / s, -T[1][2] / s], [0.0, 0.0, 1.0]]
+
+
+def apply(H, x, y):
+    """把单个像素点换算到经纬度。"""
+    w = H[2][0] * x + H[2][1] * y + H[2][2]
+    return ((H[0][0] * x + H[0][1] * y + H[0][2]) / w,
+            (H[1][0] * x + H[1][1] * y + H[1][2]) / w)
+
+
+def fit_homography(pixel_points, geo_points):
+    """
+    pixel_points: [[x, y], …]，geo_points: [[lng, lat], …]，一一对应且不少于 4 组。
+    返回 3×3 嵌套列表；点数不足或退化时抛 ValueError。
+    """
+    if len(pixel_points) != len(geo_points) or len(pixel_points) < 4:
+        raise ValueError('need at least 4 matching reference points')
+    src = [(float(p[0]), float(p[1])) for p in pixel_points]
+    dst = [(float(p[0]), float(p[1])) for p in geo_points]
+    src_n, T_src = _normalize(src)
+    dst_n, T_dst = _normalize(dst)
+
+    rows, rhs = [], []
+    for (x, y), (u, v) in zip(src_n, dst_n):
+        rows.append([x, y, 1, 0, 0, 0, -u * x, -u * y]); rhs.append(u)
+        rows.append([0, 0, 0, x, y, 1, -v * x, -v * y]); rhs.append(v)
+    AtA = [[sum(r[i] * r[j] for r in rows) for j in range(8)] for i in range(8)]
+    Atb = [sum(r[i] * b for r, b in zip(rows, rhs)) for i in range(8)]
+    h = _solve(AtA, Atb) + [1.0]
+    H_n = [h[0:3], h[3:6], h[6:9]]
+
+    H = _matmul(_matmul(_inv_similarity(T_dst), H_n), T_src)
+    scale = max(abs(v) for row in H for v in row)
+    w_mean = sum(H[2][0] * x + H[2][1] * y + H[2][2] for x, y in src) / len(src)
+    sign = 1.0 if w_mean > 0 else -1.0
+    return [[v / scale * sign for v in row] for row in H]
+
+
+def reprojection_error(H, pixel_points, geo_points):
+    """参考点换算后与给定经纬度的最大偏差（度）。"""
+    return max(math.hypot(gx - ex, gy - ey)
+               for (gx, gy), (ex, ey) in
+               ((apply(H, p[0], p[1]), g) for p, g in zip(pixel_points, geo_points)))
@@ -0,0 +1,106 @@
+# app/utils/parking_alloc.py
+"""
+停车位分配
+
+Redis 中每个停车场一个空闲车位集合 parking:free:<lot_id>，入场时 SPOP 取一个（原子、O(1)），
+出场提交后 SADD 放回。集合只是候选来源，真正的占用以数据库为准：
+    UPDATE parking_spaces SET status='occupied' WHERE id=? AND status='available'
+影响行数为 0 说明集合里的 id 已过期（被其他途径占用），丢弃后再取下一个，
+因此集合多出旧 id 不会造成重复分配，只会多一次 UPDATE。
+
+集合缺少 parking:free:<lot_id>:loaded 标记（首次使用 / 过期）时从库里按索引加载；
+加载只做 SADD 不清空，不会吞掉加载期间出场放回的车位。标记设有过期时间，
+事务回滚等原因漏放回的车位最多 FREE_CACHE_TTL 秒后随重新加载回到集合。
+集合为空、Redis 不可用或连续取到过期 id 时退回数据库：
+按 (parking_lot_id, status) 索引 SELECT ... FOR UPDATE SKIP LOCKED 取一个，并发入场互不等待。
+"""
+import logging
+
+from redis.exceptions import RedisError
+
+from app import db
+from app.extensions import redis_client
+from app.models.parking import ParkingSpace
+
+logger = logging.getLogger(__name__)
+
+FREE_CACHE_TTL = 600
+CLAIM_ATTEMPTS = 8
+AVAILABLE      = 'available'
+OCCUPIED       = 'occupied'
+
+
+def _free_key(lot_id) -> str:
+    return f"parking:free:{lot_id}"
+
+
+def _loaded_key(lot_id) -> str:
+    return f"parking:free:{lot_id}:loaded"
+
+
+def _fill(lot_id):
+    ids = [sid for (sid,) in db.session.query(ParkingSpace.id)
+           .filter_by(parking_lot_id=lot_id, status=AVAILABLE)]
+    pipe = redis_client.pipeline(transaction=True)
+    if ids:
+        pipe.sadd(_free_key(lot_id), *ids)
+        pipe.expire(_free_key(lot_id), FREE_CACHE_TTL)
+    pipe.set(_loaded_key(lot_id), 1, ex=FREE_CACHE_TTL)
+    pipe.execute()
+
+
+def _pop_free(lot_id):
+    """从 Redis 集合取一个候选车位 id；集合为空或 Redis 不可用时返回 None。"""
+    try:
+        if not redis_client.exists(_loaded_key(lot_id)):
+            _fill(lot_id)
+        space_id = redis_client.spop(_free_key(lot_id))
+    except RedisError as e:
+        logger.warning(f"Parking free list unavailable: {e}")
+        return None
+    return int(space_id) if space_id is not None else None
+
+
+def _claim(lot_id, space_id) -> bool:
+    """条件更新占用车位（不提交），成功返回 True。"""
+    return ParkingSpace.query.filter_by(
+        id=space_id, parking_lot_id=lot_id, status=AVAILABLE
+    ).update({ParkingSpace.status: OCCUPIED}, synchronize_session=False) == 1
+
+
+def allocate_space(lot_id):
+    """在当前事务里占用 lot_id 的一个空闲车位，返回车位 id；已满返回 None。"""
+    for _ in range(CLAIM_ATTEMPTS):
+        space_id = _pop_free(lot_id)
+        if space_id is None:
+            break
+        if _claim(lot_id, space_id):
+            return space_id
+
+    for _ in range(CLAIM_ATTEMPTS):
+        space_id = db.session.query(ParkingSpace.id).filter_by(
+            parking_lot_id=lot_id, status=AVAILABLE
+        ).with_for_update(skip_locked=True).limit(1).scalar()
+        if space_id is None:
+            return None
+        if _claim(lot_id, space_id):
+            return space_id
+    return None
+
+
+def release_spaces(lot_id, *space_ids):
+    """数据库提交之后调用：车位重新可用（出场，或入场事务回滚）时放回集合。"""
+    if not space_ids:
+        return
+    try:
+        redis_client.sadd(_free_key(lot_id), *space_ids)
+    except RedisError as e:
+        logger.warning(f"Parking free list release failed: {e}")
+
+
+def forget_lot(lot_id):
+    """停车场删除后丢弃其空闲集合。"""
+    try:
+        redis_client.delete(_free_key(lot_id), _loaded_key(lot_id))
+    except RedisError as e:
+        logger.warning(f"Parking free list invalidation failed: {e}")
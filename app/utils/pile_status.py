@@ -0,0 +1,129 @@
+# app/utils/pile_status.py
+"""
+充电桩实时状态缓存
+
+Redis 中每个充电区一个 hash：charging:piles:<location_id>，field 为桩 id，value 为桩的列表记录（JSON），
+另有全局版本号 charging:piles:version。写路径（预约 / 取消 / 开始 / 结束充电、桩增删改、过期清理）
+在数据库提交后调用 publish_piles()：同一个 MULTI 里写入 hash 中的记录并把版本号 +1，
+再通过 socketio 广播 'pile:status' 增量 {version, piles: [...]}。
+记录带桩的乐观锁版本号，写入用 Lua 脚本比较：只有比 hash 中已有记录新的才覆盖，
+同一个桩先后提交的两次转换即使发布顺序颠倒，缓存和广播也不会退回旧状态。
+客户端收到的版本号不连续（或为 null，即 Redis 写入失败）时重新拉取 /charging-piles 即可，不需要轮询。
+
+列表接口用 cached_piles() 读取：hash 里带 _loaded 标记才算完整；缺失时从库里加载，
+加载用 HSETNX 写入，不会覆盖加载期间由写路径写入的较新记录。
+hash 设有过期时间，Redis 写入失败留下的旧数据最多保留 PILE_CACHE_TTL 秒。
+Redis 不可用时读写都退回数据库，只记日志。
+"""
+import json
+import logging
+
+from redis.exceptions import RedisError
+
+from app.extensions import redis_client, socketio
+from app.models.charging import ChargingPile
+
+logger = logging.getLogger(__name__)
+
+PILE_CACHE_TTL  = 600
+VERSION_KEY     = 'charging:piles:version'
+LOADED_FIELD    = '_loaded'
+
+# KEYS[1] 充电区 hash；ARGV: 桩 id, 桩版本号, 记录 JSON。写入返回 1，已有同版本或更新的记录返回 0
+CAS_SCRIPT = """
+local cur = redis.call('HGET', KEYS[1], ARGV[1])
+if cur and tonumber(cjson.decode(cur)['version'] or 0) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+return 1
+"""
+
+
+def _key(location_id) -> str:
+    return f"charging:piles:{location_id}"
+
+
+def pile_record(pile) -> dict:
+    """与 GET /charging-piles 返回的单条记录一致（多一个 location_id）。"""
+    return {
+        'id':          pile.id,
+        'location_id': pile.location_id,
+        'name':        pile.name,
+        'connector':   pile.connector,
+        'power_kw':    pile.power_kw,
+        'fee_rate':    pile.fee_rate,
+        'status':      pile.status.value,
+        'updated_at':  pile.updated_at.isoformat(),
+        'version':     pile.version
+    }
+
+
+def cached_piles(location_id):
+    """某充电区的桩记录列表（按 id 排序）与当前版本号。"""
+    try:
+        raw = redis_client.hgetall(_key(location_id))
+        version = int(redis_client.get(VERSION_KEY) or 0)
+    except RedisError as e:
+        logger.warning(f"Pile status cache unavailable: {e}")
+        piles = ChargingPile.query.filter_by(location_id=location_id).order_by(ChargingPile.id).all()
+        return [pile_record(p) for p in piles], 0
+
+    if LOADED_FIELD.encode() in raw:
+        records = [json.loads(v) for k, v in raw.items() if k != LOADED_FIELD.encode()]
+        return sorted(records, key=lambda r: r['id']), version
+
+    piles = ChargingPile.query.filter_by(location_id=location_id).order_by(ChargingPile.id).all()
+    records = [pile_record(p) for p in piles]
+    try:
+        pipe = redis_client.pipeline()
+        for r in records:
+            pipe.hsetnx(_key(location_id), r['id'], json.dumps(r))
+        pipe.hset(_key(location_id), LOADED_FIELD, 1)
+        pipe.expire(_key(location_id), PILE_CACHE_TTL)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Pile status cache fill failed: {e}")
+    return records, version
+
+
+def publish_piles(piles=(), deleted=()):
+    """
+    数据库提交之后调用：写穿 Redis 并广播增量。
+    piles 为最新状态的 ChargingPile，deleted 为已删除桩的 (location_id, pile_id)。
+    缓存中已有更新版本的桩不写入，也不出现在广播里。
+    """
+    records = [pile_record(p) for p in piles]
+    if not records and not deleted:
+        return
+    version = None
+    try:
+        cas = redis_client.register_script(CAS_SCRIPT)
+        pipe = redis_client.pipeline(transaction=True)
+        for r in records:
+            cas(keys=[_key(r['location_id'])], args=[r['id'], r['version'], json.dumps(r)], client=pipe)
+        for location_id, pile_id in deleted:
+            pipe.hdel(_key(location_id), pile_id)
+        pipe.incr(VERSION_KEY)
+        results = pipe.execute()
+        version = results[-1]
+        records = [r for r, written in zip(records, results) if written]
+    except RedisError as e:
+        logger.warning(f"Pile status write-through failed: {e}")
+
+    socketio.emit('pile:status', {
+        'version': version,
+        'piles':   records,
+        'deleted': [pile_id for _, pile_id in deleted]
+    })
+
+
+def invalidate_location(location_id):
+    """整个充电区被删除等批量变化时，丢弃该区缓存，下次读取重新加载。"""
+    try:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(_key(location_id))
+        pipe.incr(VERSION_KEY)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Pile status cache invalidation failed: {e}")
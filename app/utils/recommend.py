@@ -0,0 +1,54 @@
+# app/utils/recommend.py
+"""
+充电时段推荐
+
+对每个候选桩取「最早能放下所需时长、且对齐到预约格子」的开始时间，按综合代价排序：
+    代价 = 等待分钟 + 步行分钟（直线距离 / WALK_METERS_PER_MIN） + BUSY_PENALTY_MIN × 预测繁忙度
+预测繁忙度（0~1）来自历史同一星期几、同一小时的平均占用率（见 app/tasks/rollups.demand_forecast），
+让热门桩在同等条件下排到后面，把预约分散到其他桩。
+本模块不依赖 Flask / SQLAlchemy。
+"""
+import math
+from datetime import datetime, timedelta
+
+from app.utils.availability import SLOT_MINUTES
+
+WALK_METERS_PER_MIN = 80
+BUSY_PENALTY_MIN    = 30
+
+
+def haversine_m(lat1, lng1, lat2, lng2) -> float:
+    """两点间的球面距离（米）。"""
+    r = 6371000.0
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * r * math.asin(math.sqrt(a))
+
+
+def align_up(t: datetime, slot_minutes: int=SLOT_MINUTES) -> datetime:
+    """向上取整到 slot_minutes 的格子边界。"""
+    base = t.replace(minute=0, second=0, microsecond=0)
+    step = timedelta(minutes=slot_minutes)
+    n = math.ceil((t - base) / step)
+    return base + step * n
+
+
+def first_fit(windows, duration: timedelta, not_before: datetime, slot_minutes: int=SLOT_MINUTES):
+    """windows（[(start, end), …]，按时间排序）中最早能容纳 duration 的格子对齐开始时间，没有则 None。"""
+    for s, e in windows:
+        start = align_up(max(s, not_before), slot_minutes)
+        if start + duration <= e:
+            return start
+    return None
+
+
+def rank(candidates, limit: int):
+    """
+    candidates: [{wait_minutes, distance_m (可为 None), predicted_busy, ...}, …]
+    写入 score 后按 score 升序返回前 limit 个。
+    """
+    for c in candidates:
+        walk = (c['distance_m'] or 0) / WALK_METERS_PER_MIN
+        c['score'] = round(c['wait_minutes'] + walk + BUSY_PENALTY_MIN * c['predicted_busy'], 2)
+    return sorted(candidates, key=lambda c: c['score'])[:limit]
@@ -0,0 +1,45 @@
+# app/utils/session_filters.py
+"""
+充电会话查询条件
+
+路由、状态机与过期清理共用的 SQL 条件，只依赖模型，不会带起后台线程或 CLI 注册：
+  - live_session_filter()：未取消、且不是已过期未清理的预约
+  - overlap_filter()：与某时间窗有交集的有效会话，走 ix_session_pile_span 的有界范围扫描
+预约创建后 RESERVATION_HOLD 内未开始充电即视为过期，实际取消由 app/tasks/reservations.py 的清理任务完成，
+两次清理之间靠 live_session_filter() 把已过期的预约当作不存在。
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, not_
+
+from app.models.charging import ChargingSession, ChargingSessionStatus
+from app.utils.availability import MAX_SESSION_SPAN
+
+RESERVATION_HOLD = timedelta(minutes=10)
+
+
+def reservation_cutoff(now=None):
+    return (now or datetime.utcnow()) - RESERVATION_HOLD
+
+
+def live_session_filter(now=None):
+    """未取消、且不是已过期未清理的预约。"""
+    return and_(
+        ChargingSession.status != ChargingSessionStatus.cancelled,
+        not_(and_(ChargingSession.status == ChargingSessionStatus.reserved,
+                  ChargingSession.created_at < reservation_cutoff(now)))
+    )
+
+
+def overlap_filter(start, end, now=None):
+    """
+    与 [start, end) 有交集的有效会话。
+    会话最长 MAX_SESSION_SPAN，所以 start_ts 可以限定在 (start - MAX_SESSION_SPAN, end) 内，
+    配合 pile_id 条件在 ix_session_pile_span 上是一次有界的范围扫描，与历史会话总量无关。
+    """
+    return and_(
+        ChargingSession.start_ts >  start - MAX_SESSION_SPAN,
+        ChargingSession.start_ts <  end,
+        ChargingSession.end_ts   >  start,
+        live_session_filter(now)
+    )
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+禁停区查找微基准：逐个多边形线性扫描 vs ZoneIndex（STR-tree + prepared）
+
+运行：
+    python bench_zones.py                 # 默认 10 / 1000 / 10000 个区域
+    python bench_zones.py --sizes 10 100000 --points 5000
+"""
+import argparse
+import math
+import random
+import time
+
+from shapely.geometry import Point, Polygon
+
+from zones import ZoneIndex
+
+
+def make_zones(n: int, seed: int=0):
+    """在 sqrt(n) × sqrt(n) 网格中生成 n 个互不重叠的小六边形。"""
+    rnd  = random.Random(seed)
+    side = math.ceil(math.sqrt(n))
+    zones = []
+    for i in range(n):
+        cx, cy = (i % side) * 10 + 5, (i // side) * 10 + 5
+        r = rnd.uniform(2, 4.5)
+        path = [[cx + r * math.cos(k * math.pi / 3), cy + r * math.sin(k * math.pi / 3)]
+                for k in range(6)]
+        zones.append({'id': i + 1, 'path': path})
+    return zones, side * 10
+
+
+def linear_find(polygons: dict, x: float, y: float):
+    pt = Point(x, y)
+    for zone_id, poly in polygons.items():
+        if poly.contains(pt):
+            return zone_id
+    return None
+
+
+def bench(fn, points, repeat: int=3) -> float:
+    """返回最优一轮的单次查找耗时（微秒）。"""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for x, y in points:
+            fn(x, y)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(points) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--points', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'zones':>8} {'linear us':>12} {'index us':>12} {'build ms':>10} {'speedup':>9}")
+    for n in args.sizes:
+        zones, extent = make_zones(n)
+        rnd = random.Random(1)
+        points = [(rnd.uniform(0, extent), rnd.uniform(0, extent)) for _ in range(args.points)]
+
+        polygons = {z['id']: Polygon(z['path']) for z in zones}
+        t0 = time.perf_counter()
+        index = ZoneIndex.from_zones(zones)
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        for x, y in points[:50]:
+            assert linear_find(polygons, x, y) == index.find(x, y)
+
+        # 线性扫描在大规模下极慢，按区域数缩减采样点数，结果仍为单次查找耗时
+        lin_points = points[:max(20, min(len(points), 200000 // n))]
+        lin = bench(lambda x, y: linear_find(polygons, x, y), lin_points)
+        idx = bench(index.find, points)
+        print(f"{n:>8} {lin:>12.2f} {idx:>12.2f} {build_ms:>10.1f} {lin / idx:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检测流水线离线回放与吞吐基准
+
+不需要显示器、OSS、Roboflow 或后端：默认对模型、OCR、OSS 上传和违停上报
+全部注入桩实现（可用参数模拟各阶段耗时），只跑真实的解码、跟踪、禁停区判定、
+证据图编码上传线程池与线程/队列调度；也可用 --real-model / --real-ocr 换成本地真实模型。
+结果以 JSON 输出：FPS、各阶段 p50/p95/p99 延迟、峰值 RSS。
+峰值 RSS 分两项：main_process 是基准进程本身，largest_child 是已回收子进程中最大的一个
+（--processes 模式下即单个解码进程，getrusage(RUSAGE_CHILDREN) 只给出最大值而非总和），
+总内存约为 main_process + largest_child × 摄像头数的上界。
+
+运行：
+    python benchmark.py videos/                       # 目录下每个视频一路，图片合并为一路
+    python benchmark.py a.mp4 b.mp4 --batch-size 4 --infer-ms 30
+    python benchmark.py images/ --real-model --output bench.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+from evidence import EvidenceUploader
+from pipeline import (StreamingService, DECODE_PROCESSES, INFER_BATCH_SIZE, INFER_MAX_WAIT_MS,
+                      INFER_WORKERS)
+from zones import ZoneIndex
+
+VIDEO_EXTS = {'.mp4', '.avi', '.mkv', '.mov', '.ts', '.flv'}
+IMAGE_EXTS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+logger = logging.getLogger(__name__)
+
+
+class StubModel:
+    """
+    模拟检测模型：每次调用耗时 call_ms + per_frame_ms × 帧数，
+    每帧在画面下半部给出一个由帧内容决定的车牌框（同一画面结果稳定）。
+    """
+
+    def __init__(self, call_ms: float=20.0, per_frame_ms: float=5.0):
+        self.call_ms      = call_ms
+        self.per_frame_ms = per_frame_ms
+
+    def infer(self, frames, **kwargs):
+        if not isinstance(frames, list):
+            frames = [frames]
+        time.sleep((self.call_ms + self.per_frame_ms * len(frames)) / 1000.0)
+        results = []
+        for frame in frames:
+            h, w = frame.shape[:2]
+            seed = zlib.crc32(frame[::64, ::64].tobytes())
+            pred = SimpleNamespace(
+                x=w * (0.25 + (seed % 50) / 100.0), y=h * 0.75,
+                width=w * 0.08, height=h * 0.04,
+                class_name='license_plate', confidence=0.5 + (seed % 40) / 100.0,
+            )
+            results.append(SimpleNamespace(predictions=[pred]))
+        return results
+
+
+class StubOcr:
+    """模拟 OCR：每张裁剪图耗时 per_crop_ms，返回固定格式的车牌号。"""
+
+    def __init__(self, per_crop_ms: float=15.0):
+        self.per_crop_ms = per_crop_ms
+        self._ids = itertools.count(1)
+
+    def read(self, crops):
+        time.sleep(self.per_crop_ms * len(crops) / 1000.0)
+        return [f"BENCH{next(self._ids):05d}" for _ in crops]
+
+
+class StubBucket:
+    """模拟 OSS Bucket：每次 put_object 耗时 upload_ms，只记录字节数。"""
+
+    def __init__(self, upload_ms: float=50.0):
+        self.upload_ms = upload_ms
+        self.bytes     = 0
+        self._lock     = threading.Lock()
+
+    def put_object(self, key: str, data: bytes):
+        time.sleep(self.upload_ms / 1000.0)
+        with self._lock:
+            self.bytes += len(data)
+
+
+class StubReporter:
+    def __init__(self):
+        self.reports = 0
+
+    def report(self, payload: dict):
+        self.reports += 1
+
+
+def discover_sources(paths):
+    """每个视频文件一路「摄像头」，同一目录下的图片按文件名排序合并为一路。"""
+    cameras, ids = [], itertools.count(1)
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, f) for f in os.listdir(path))
+        else:
+            files = [path]
+        images = [f for f in files if os.path.splitext(f)[1].lower() in IMAGE_EXTS]
+        for f in files:
+            if os.path.splitext(f)[1].lower() in VIDEO_EXTS:
+                cameras.append({'id': next(ids), 'name': f, 'rtsp_url': f})
+        if images:
+            cameras.append({'id': next(ids), 'name': path, 'rtsp_url': path, 'images': images})
+    return cameras
+
+
+def build_backends(args, reporter: StubReporter, evidence: EvidenceUploader):
+    if args.real_model:
+        from inference import get_model
+        model = get_model(model_id=os.getenv('MODEL_ID', 'motorcycle-lp/5'),
+                          api_key=os.getenv('ROBOFLOW_API_KEY'))
+    else:
+        model = StubModel(args.infer_ms, args.infer_ms_per_frame)
+    if args.real_ocr:
+        import easyocr
+        from ocr_stage import OcrStage
+        ocr = OcrStage(easyocr.Reader(['en'], gpu=False))
+    else:
+        ocr = StubOcr(args.ocr_ms)
+    # 覆盖整幅画面的单个禁停区，保证每个检测都会走完 OCR / 上报路径
+    zones = SimpleNamespace(index=ZoneIndex.from_zones(
+        [{'id': 1, 'path': [[-1e6, -1e6], [1e6, -1e6], [1e6, 1e6], [-1e6, 1e6]]}]))
+    return SimpleNamespace(model=model, ocr=ocr, zones=zones,
+                           upload=evidence.submit, report=reporter.report)
+
+
+def _maxrss_mb(who) -> float:
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux 以 KB 计，macOS 以字节计
+    return round(rss / (1024.0 * 1024.0) if sys.platform == 'darwin' else rss / 1024.0, 1)
+
+
+def peak_rss_mb(children: bool) -> dict:
+    """
+    本进程与解码子进程的峰值 RSS（MB）。子进程只统计已退出并被 join 的，
+    须在 service.stop() 之后调用；线程解码（children=False）时 largest_child 为 None。
+    """
+    return {"main_process":  _maxrss_mb(resource.RUSAGE_SELF),
+            "largest_child": _maxrss_mb(resource.RUSAGE_CHILDREN) if children else None}
+
+
+def run_benchmark(args) -> dict:
+    cameras = discover_sources(args.inputs)
+    if not cameras:
+        raise SystemExit(f"No video or image found in {args.inputs}")
+    reporter = StubReporter()
+    bucket   = StubBucket(args.upload_ms)
+    # 真实的编码/上传线程池，只把网络换成桩
+    evidence = EvidenceUploader(bucket, 'stub://', quality=args.jpeg_quality,
+                                max_width=args.max_width)
+    backends = build_backends(args, reporter, evidence)
+    service = StreamingService(cameras, backends, frame_step=args.frame_step,
+                               infer_workers=args.workers, batch_size=args.batch_size,
+                               max_wait_ms=args.max_wait_ms,
+                               motion_gate=args.motion_gate, replay=True,
+                               decode_processes=args.processes)
+    t0 = time.perf_counter()
+    service.start()
+    service.wait_replay()
+    elapsed = time.perf_counter() - t0
+    service.stop()
+    evidence.close(wait=True)
+
+    gate = service.gate_stats()
+    decoded  = sum(g['decoded'] for g in gate.values())
+    inferred = sum(g['inferred'] for g in gate.values())
+    return {
+        "cameras":         len(cameras),
+        "elapsed_s":       round(elapsed, 3),
+        "frames_decoded":  decoded,
+        "frames_inferred": inferred,
+        "decode_fps":      round(decoded / elapsed, 2) if elapsed else None,
+        "fps":             round(inferred / elapsed, 2) if elapsed else None,
+        "reports":         reporter.reports,
+        "evidence":        dict(evidence.stats(), bytes=bucket.bytes),
+        "stages":          service.timer.percentiles(),
+        "batch":           service.batch_stats.snapshot(),
+        "peak_rss_mb":     peak_rss_mb(children=args.processes),
+        "config": {
+            "frame_step":  args.frame_step,
+            "workers":     args.workers,
+            "batch_size":  args.batch_size,
+            "max_wait_ms": args.max_wait_ms,
+            "motion_gate": args.motion_gate,
+            "processes":   args.processes,
+            "real_model":  args.real_model,
+            "real_ocr":    args.real_ocr,
+            "jpeg_quality": args.jpeg_quality,
+            "max_width":   args.max_width,
+        },
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Offline replay throughput benchmark')
+    parser.add_argument('inputs', nargs='+', help='Video files, image files or directories')
+    parser.add_argument('--frame-step', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=INFER_WORKERS)
+    parser.add_argument('--batch-size', type=int, default=INFER_BATCH_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=INFER_MAX_WAIT_MS)
+    parser.add_argument('--motion-gate', action='store_true', help='Enable motion-gated sampling')
+    parser.add_argument('--processes', action='store_true', default=DECODE_PROCESSES,
+                        help='Decode in separate processes via the shared-memory frame ring')
+    parser.add_argument('--real-model', action='store_true', help='Use the local Roboflow model')
+    parser.add_argument('--real-ocr', action='store_true', help='Use EasyOCR instead of the stub')
+    parser.add_argument('--infer-ms', type=float, default=20.0, help='Stub model per-call cost')
+    parser.add_argument('--infer-ms-per-frame', type=float, default=5.0, help='Stub model per-frame cost')
+    parser.add_argument('--ocr-ms', type=float, default=15.0, help='Stub OCR per-crop cost')
+    parser.add_argument('--upload-ms', type=float, default=50.0, help='Stub OSS per-object cost')
+    parser.add_argument('--jpeg-quality', type=int, default=80, help='Evidence JPEG quality')
+    parser.add_argument('--max-width', type=int, default=1280, help='Evidence downscale width, 0 = off')
+    parser.add_argument('--output', help='Also write the JSON result to this file')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    result = run_benchmark(args)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+检测服务运行时上下文
+
+所有重量级资源（Roboflow 模型、EasyOCR、OSS Bucket、证据图上传池、禁停区、发件箱）都在
+首次访问时才构建，并且同一进程内只构建一次，推理线程共享同一个模型实例。
+导入本模块、解析命令行、校验配置都不会触发网络访问或模型加载。
+
+    ctx = DetectorContext()
+    ctx.warmup()          # 可选：启动时一次性加载全部资源并记录耗时
+    ctx.model.infer(...)  # 或者按需懒加载
+    ctx.close()
+
+DetectorContext 同时实现了 pipeline 所需的 backends 接口
+（model / ocr / zones / upload / report），可直接传给 StreamingService。
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+class DetectorContext:
+    """懒加载的检测资源容器，线程安全。"""
+
+    def __init__(self, env=None):
+        env = os.environ if env is None else env
+        self.oss_access_key_id     = env.get('OSS_ACCESS_KEY_ID')
+        self.oss_access_key_secret = env.get('OSS_ACCESS_KEY_SECRET')
+        self.oss_endpoint          = env.get('OSS_ENDPOINT')
+        self.oss_bucket_name       = env.get('OSS_BUCKET_NAME')
+        self.oss_image_folder      = env.get('OSS_IMAGE_FOLDER', 'captures/')
+        self.zones_api             = env.get('ZONES_API', 'http://localhost:5000/api/zones')
+        self.zones_refresh_secs    = env.get('ZONES_REFRESH_SECS', '30')
+        self.model_id              = env.get('MODEL_ID', 'motorcycle-lp/5')
+        self.api_key               = env.get('ROBOFLOW_API_KEY')
+        self.ocr_cache_size        = env.get('OCR_CACHE_SIZE', '1024')
+        self.violation_api         = env.get('VIOLATION_API', 'http://localhost:5000/api/violations')
+        self.violation_batch_api   = env.get('VIOLATION_BATCH_API',
+                                             self.violation_api.rstrip('/') + '/batch')
+        self.outbox_path           = env.get('OUTBOX_PATH', 'outbox.db')
+        self.outbox_max_attempts   = env.get('OUTBOX_MAX_ATTEMPTS', '50')
+        self.evidence_quality      = env.get('EVIDENCE_JPEG_QUALITY', '80')
+        self.evidence_max_width    = env.get('EVIDENCE_MAX_WIDTH', '1280')
+        self.evidence_workers      = env.get('EVIDENCE_WORKERS', '4')
+        self.evidence_max_pending  = env.get('EVIDENCE_MAX_PENDING', '64')
+        self.evidence_retries      = env.get('EVIDENCE_RETRIES', '3')
+        self.timings    = {}
+        self._resources = {}
+        self._lock      = threading.RLock()
+
+    # —— 配置校验（不加载任何资源）——
+    def validate(self):
+        """返回配置问题列表，空列表表示配置可用。"""
+        problems = []
+        for key in ('oss_access_key_id', 'oss_access_key_secret', 'oss_endpoint', 'oss_bucket_name'):
+            if not getattr(self, key):
+                problems.append(f"{key.upper()} is not set")
+        for key in ('zones_refresh_secs', 'ocr_cache_size', 'evidence_quality',
+                    'evidence_max_width', 'evidence_workers', 'evidence_max_pending',
+                    'evidence_retries', 'outbox_max_attempts'):
+            try:
+                float(getattr(self, key))
+            except (TypeError, ValueError):
+                problems.append(f"{key.upper()} must be a number, got {getattr(self, key)!r}")
+        try:
+            if not 1 <= int(self.evidence_quality) <= 100:
+                problems.append("EVIDENCE_JPEG_QUALITY must be within 1..100")
+        except (TypeError, ValueError):
+            pass
+        if not self.model_id:
+            problems.append("MODEL_ID is not set")
+        return problems
+
+    # —— 懒加载 ——
+    def _get(self, name: str, factory):
+        res = self._resources.get(name)
+        if res is not None:
+            return res
+        with self._lock:
+            res = self._resources.get(name)
+            if res is None:
+                t0 = time.perf_counter()
+                res = factory()
+                self.timings[name] = round(time.perf_counter() - t0, 3)
+                logger.info(f"{name} ready in {self.timings[name]:.2f}s")
+                self._resources[name] = res
+        return res
+
+    def _build_model(self):
+        from inference import get_model
+        return get_model(model_id=self.model_id, api_key=self.api_key)
+
+    def _build_ocr(self):
+        import easyocr
+        from ocr_stage import OcrStage
+        reader = easyocr.Reader(['en'], gpu=False)
+        return OcrStage(reader, cache_size=int(self.ocr_cache_size))
+
+    def _build_bucket(self):
+        import oss2
+        auth = oss2.Auth(self.oss_access_key_id, self.oss_access_key_secret)
+        # 连接池与上传线程数一致，上传线程复用 keep-alive 连接
+        session = oss2.Session(pool_size=int(self.evidence_workers))
+        return oss2.Bucket(auth, self.oss_endpoint, self.oss_bucket_name, session=session)
+
+    def _build_evidence(self):
+        from evidence import EvidenceUploader
+        return EvidenceUploader(self.bucket,
+                                url_prefix=f"https://{self.oss_bucket_name}.{self.oss_endpoint}/",
+                                folder=self.oss_image_folder,
+                                quality=int(self.evidence_quality),
+                                max_width=int(self.evidence_max_width),
+                                workers=int(self.evidence_workers),
+                                max_pending=int(self.evidence_max_pending),
+                                retries=int(self.evidence_retries))
+
+    def _build_zones(self):
+        from zones import ZoneRefresher
+        zones = ZoneRefresher(self.zones_api, interval=float(self.zones_refresh_secs))
+        try:
+            zones.refresh()
+        except Exception:
+            logger.exception("Failed fetch zones, using empty polygon list until next refresh")
+        return zones
+
+    def _build_outbox(self):
+        from outbox import Outbox
+        return Outbox(self.outbox_path, max_attempts=int(self.outbox_max_attempts))
+
+    def _build_sender(self):
+        from outbox import OutboxSender
+        return OutboxSender(self.outbox, self.violation_batch_api, single_url=self.violation_api,
+                            prepare=self._prepare_report)
+
+    def _prepare_report(self, payload: dict):
+        """
+        证据图仍在上传时暂缓发送；上传最终失败时去掉 image_path。
+        重启前写入发件箱的上报查不到上传任务，先 HEAD 确认对象确实存在，查询失败时暂缓到下一轮。
+        """
+        url = payload.get('image_path')
+        if not url:
+            return payload
+        evidence = self.evidence
+        state = evidence.resolve(url)
+        if state == 'unknown':
+            try:
+                state = 'uploaded' if evidence.exists(url) else 'failed'
+            except Exception as e:
+                logger.warning(f"Evidence check for {url} failed ({e}), holding report")
+                return None
+        if state == 'pending':
+            return None
+        if state == 'failed':
+            return dict(payload, image_path=None)
+        return payload
+
+    def peek(self, name: str):
+        """返回已构建的资源，未构建时返回 None（不会触发加载）。"""
+        return self._resources.get(name)
+
+    @property
+    def model(self):
+        return self._get('model', self._build_model)
+
+    @property
+    def ocr(self):
+        return self._get('ocr', self._build_ocr)
+
+    @property
+    def bucket(self):
+        return self._get('bucket', self._build_bucket)
+
+    @property
+    def evidence(self):
+        return self._get('evidence', self._build_evidence)
+
+    @property
+    def zones(self):
+        return self._get('zones', self._build_zones)
+
+    @property
+    def outbox(self):
+        return self._get('outbox', self._build_outbox)
+
+    @property
+    def sender(self):
+        return self._get('sender', self._build_sender)
+
+    # —— backends 接口 ——
+    def upload(self, frame, box=None):
+        """把证据图交给后台线程池编码上传，立即返回预先生成的 URL。"""
+        return self.evidence.submit(frame, box)
+
+    def report(self, payload: dict):
+        """写入本地发件箱后立即返回，由后台 sender 负责投递与重试。"""
+        self.outbox.put(payload)
+
+    # —— 生命周期 ——
+    def warmup(self, names=('zones', 'model', 'ocr', 'evidence', 'outbox')):
+        """预先构建指定资源，返回各资源构建耗时（秒）。"""
+        for name in names:
+            getattr(self, name)
+        return dict(self.timings)
+
+    def start_background(self):
+        """启动禁停区热更新与发件箱发送线程。"""
+        self.zones.start()
+        if not self.sender.is_alive():
+            self.sender.start()
+
+    def close(self):
+        """停止后台线程并释放已构建的资源；未构建的资源不会被触发加载。"""
+        with self._lock:
+            res = self._resources
+            if 'zones' in res:
+                res['zones'].stop()
+            if 'evidence' in res:
+                res['evidence'].close(wait=True)
+            if 'sender' in res and res['sender'].is_alive():
+                res['sender'].stop()
+            if 'outbox' in res:
+                res['outbox'].close()
+            self._resources = {}
@@ -6,9 +6,14 @@
 功能：
   - Roboflow 云端/本地模型推理
   - EasyOCR 文字识别
-  - 阿里云 OSS 图像上传
+  - 阿里云 OSS 证据图异步上传（见 evidence.py）
   - 禁停区判定上报
   - 支持单张图片和视频检测
+  - 多摄像头常驻服务（解码 → 推理 → OCR/上报 多线程流水线，见 pipeline.py；
+    --decode-processes 时解码放到独立进程，帧经共享内存环形缓冲区传递，见 frame_ring.py）
+  - 离线回放吞吐基准（见 benchmark.py，无需网络）
+  - 按摄像头的运行指标：HTTP /metrics（Prometheus）或定期 JSON（见 metrics.py）
+  - 重量级资源懒加载（见 context.py），--help / --check-config 不加载模型、不访问网络
   - 实时结果可视化
 
 使用说明：
@@ -27,21 +32,21 @@
   3. 运行：
        python detector_service.py --image images/frame4.jpg
        python detector_service.py --video videos/video1.mp4
+       python detector_service.py --serve            # 从 /api/cameras 拉取全部摄像头常驻运行
+       python detector_service.py --check-config     # 只校验环境变量配置
 """
-import os
 import time
-import uuid
-import queue
+_T_START = time.perf_counter()
+
+import os
+import sys
 import logging
 import argparse
-from datetime import datetime, timezone
 
-import cv2
-import requests
-import oss2
-import easyocr
-from shapely.geometry import Point, Polygon
-from inference import get_model
+from context import DetectorContext
+
+# pipeline / metrics 在各子命令里按需导入：pipeline 会加载 cv2、numpy、shapely、requests，
+# --help、参数错误与 --check-config 不需要这些
 
 # —— 日志配置 ——
 logging.basicConfig(
@@ -50,92 +55,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# —— OSS 配置 ——
-OSS_ACCESS_KEY_ID     = os.getenv('OSS_ACCESS_KEY_ID')
-OSS_ACCESS_KEY_SECRET = os.getenv('OSS_ACCESS_KEY_SECRET')
-OSS_ENDPOINT          = os.getenv('OSS_ENDPOINT')
-OSS_BUCKET_NAME       = os.getenv('OSS_BUCKET_NAME')
-OSS_IMAGE_FOLDER      = os.getenv('OSS_IMAGE_FOLDER', 'captures/')
-
-auth   = oss2.Auth(OSS_ACCESS_KEY_ID, OSS_ACCESS_KEY_SECRET)
-bucket = oss2.Bucket(auth, OSS_ENDPOINT, OSS_BUCKET_NAME)
-
-def upload_bytes_to_oss(image_bytes: bytes, ext='jpg') -> str:
-    """上传字节到 OSS，返回 URL。"""
-    object_name = f"{OSS_IMAGE_FOLDER}{uuid.uuid4().hex}.{ext}"
-    bucket.put_object(object_name, image_bytes)
-    return f"https://{OSS_BUCKET_NAME}.{OSS_ENDPOINT}/{object_name}"
-
-# —— 禁停区读取 ——
-ZONES_API = os.getenv('ZONES_API', 'http://localhost:5000/api/zones')
-polygons = {}
-try:
-    zones = requests.get(ZONES_API, timeout=5).json()
-    polygons = {z['id']: Polygon(z['path']) for z in zones}
-    logger.info(f"Loaded {len(polygons)} zones from {ZONES_API}")
-except Exception:
-    logger.exception("Failed fetch zones, using empty polygon list")
-
-# —— 模型加载 ——
-MODEL_ID = os.getenv('MODEL_ID', 'motorcycle-lp/5')
-API_KEY  = os.getenv('ROBOFLOW_API_KEY')
-try:
-    model = get_model(model_id=MODEL_ID, api_key=API_KEY)
-    logger.info("Detection model loaded successfully")
-except Exception:
-    logger.exception("Model load failed, exiting.")
-    raise
+# —— 常驻服务配置 ——
+CAMERAS_API = os.getenv('CAMERAS_API', 'http://localhost:5000/api/cameras')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+METRICS_JSON = os.getenv('METRICS_JSON')
+STATS_INTERVAL = 30
 
-# —— OCR 初始化 ——
-reader = easyocr.Reader(['en'], gpu=False)
-logger.info("OCR engine initialized")
-
-# —— 上报配置 ——
-VIOLATION_API = os.getenv('VIOLATION_API', 'http://localhost:5000/api/violations')
-CAMERA_ID     = int(os.getenv('CAMERA_ID', '1'))
-report_queue = queue.Queue()
-
-def iso_timestamp() -> str:
-    return datetime.now(timezone.utc).isoformat()
-
-def pixel_to_geo(x: int, y: int):
-    return float(x), float(y)
-
-def safe_report(payload: dict):
-    try:
-        r = requests.post(VIOLATION_API, json=payload, timeout=5)
-        r.raise_for_status()
-    except Exception:
-        report_queue.put((payload, time.time()))
-
-def retry_reports(max_age=60):
-    size = report_queue.qsize()
-    for _ in range(size):
-        payload, t0 = report_queue.get()
-        if time.time() - t0 < max_age:
-            safe_report(payload)
+def draw_predictions(frame, preds):
+    """在帧上绘制检测框与标签（原地修改）。"""
+    import cv2
+    from pipeline import pred_box
+    for p in preds:
+        x1, y1, x2, y2 = pred_box(p)
+        label = f"{p.class_name} {p.confidence:.2f}"
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0,255,0), 2)
+        (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
+        cv2.rectangle(frame, (x1, y1-th-4), (x1+tw, y1), (255,255,255), -1)
+        cv2.putText(frame, label, (x1, y1-4), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,0), 1)
 
 # —— 单张图片检测 ——
-def detect_image(image_path: str,
+def detect_image(ctx: DetectorContext, image_path: str,
                  confidence=0.25, iou_threshold=0.4,
                  display=True):
     """对单张图片做检测并可视化。"""
+    import cv2
     frame = cv2.imread(image_path)
     if frame is None:
         logger.error(f"Cannot read image: {image_path}")
         return
-    res = model.infer(frame, confidence=confidence, iou_threshold=iou_threshold)[0]
+    res = ctx.model.infer(frame, confidence=confidence, iou_threshold=iou_threshold)[0]
     preds = getattr(res, 'predictions', []) or []
-    for p in preds:
-        x1 = int(p.x - p.width/2)
-        y1 = int(p.y - p.height/2)
-        x2 = int(p.x + p.width/2)
-        y2 = int(p.y + p.height/2)
-        label = f"{p.class_name} {p.confidence:.2f}"
-        cv2.rectangle(frame, (x1, y1), (x2, y2), (0,255,0), 2)
-        (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
-        cv2.rectangle(frame, (x1, y1-th-4), (x1+tw, y1), (255,255,255), -1)
-        cv2.putText(frame, label, (x1, y1-4), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,0), 1)
+    draw_predictions(frame, preds)
     if display:
         cv2.imshow("Image Detections", frame)
         cv2.waitKey(0)
@@ -143,10 +93,11 @@ def detect_image(image_path: str,
     return preds
 
 # —— 视频检测 ——
-def run(video_path: str='video1.mp4', frame_step: int=5,
+def run(ctx: DetectorContext, video_path: str='video1.mp4', frame_step: int=5,
         confidence: float=0.25, iou_threshold: float=0.4,
         display: bool=True):
     """对视频文件做逐帧检测并可视化。"""
+    import cv2
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         logger.error(f"Cannot open video: {video_path}")
@@ -162,36 +113,120 @@ def run(video_path: str='video1.mp4', frame_step: int=5,
         idx += 1
         if idx % frame_step != 0:
             continue
-        res = model.infer(frame, confidence=confidence, iou_threshold=iou_threshold)[0]
+        res = ctx.model.infer(frame, confidence=confidence, iou_threshold=iou_threshold)[0]
         preds = getattr(res, 'predictions', []) or []
-        for p in preds:
-            x1 = int(p.x - p.width/2)
-            y1 = int(p.y - p.height/2)
-            x2 = int(p.x + p.width/2)
-            y2 = int(p.y + p.height/2)
-            label = f"{p.class_name} {p.confidence:.2f}"
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0,255,0), 2)
-            (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
-            cv2.rectangle(frame, (x1, y1-th-4), (x1+tw, y1), (255,255,255), -1)
-            cv2.putText(frame, label, (x1, y1-4), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,0), 1)
+        draw_predictions(frame, preds)
         if display:
             cv2.imshow("Video Detections", frame)
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
-        retry_reports()
     cap.release()
     if display:
         cv2.destroyAllWindows()
 
-if __name__ == '__main__':
+# —— 多摄像头常驻服务 ——
+def fetch_cameras():
+    """从后端拉取配置了 rtsp_url 的摄像头列表。"""
+    import requests
+    cams = requests.get(CAMERAS_API, timeout=5).json()
+    return [c for c in cams if c.get('rtsp_url')]
+
+def serve(ctx: DetectorContext, frame_step: int=5, workers: int=None,
+          batch_size: int=None, max_wait_ms: float=None,
+          decode_processes: bool=None,
+          metrics_port: int=METRICS_PORT, metrics_json: str=METRICS_JSON):
+    """
+    常驻运行：为 /api/cameras 中的每一路摄像头启动解码线程，直到 Ctrl-C。
+    workers / batch_size / max_wait_ms / decode_processes 为 None 时取 pipeline 中的环境变量配置。
+    metrics_port > 0 时在该端口提供 /metrics；给出 metrics_json 时每 30 秒落盘一次 JSON 指标。
+    发件箱发送与禁停区热更新线程只在这里启动，单图 / 视频检测不上报。
+    """
+    import pipeline
+    from metrics import MetricsCollector, MetricsServer
+    workers          = pipeline.INFER_WORKERS if workers is None else workers
+    batch_size       = pipeline.INFER_BATCH_SIZE if batch_size is None else batch_size
+    max_wait_ms      = pipeline.INFER_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms
+    decode_processes = pipeline.DECODE_PROCESSES if decode_processes is None else decode_processes
+    cameras = fetch_cameras()
+    if not cameras:
+        logger.error(f"No camera with rtsp_url from {CAMERAS_API}")
+        return
+    logger.info(f"Warmup: {ctx.warmup()}")
+    service = pipeline.StreamingService(cameras, ctx, frame_step=frame_step, infer_workers=workers,
+                               batch_size=batch_size, max_wait_ms=max_wait_ms,
+                               decode_processes=decode_processes)
+    collector = MetricsCollector(service, ctx)
+    metrics_server = None
+    if metrics_port:
+        metrics_server = MetricsServer(collector, metrics_port)
+        metrics_server.start()
+    ctx.start_background()
+    service.start()
+    try:
+        while True:
+            time.sleep(STATS_INTERVAL)
+            if metrics_json:
+                collector.dump_json(metrics_json)
+            logger.info(f"Batch stats: {service.batch_stats.snapshot()}, "
+                        f"outbox backlog: {ctx.outbox.backlog()}")
+            logger.info(f"Frame gate: {service.gate_stats()}")
+            logger.info(f"Evidence upload: {ctx.evidence.stats()}")
+    except KeyboardInterrupt:
+        logger.info("Stopping streaming service")
+    finally:
+        service.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+
+def build_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument('--image', help='Path to image for detection')
     parser.add_argument('--video', help='Path to video for detection')
-    args = parser.parse_args()
-    if args.image:
-        detect_image(args.image)
-    elif args.video:
-        run(video_path=args.video)
-    else:
-        print("请通过 --image 或 --video 参数指定输入文件。 示例: python detector_service.py --image images/test.jpg")
+    parser.add_argument('--serve', action='store_true',
+                        help='Run as a long-lived service over all cameras from CAMERAS_API')
+    parser.add_argument('--check-config', action='store_true',
+                        help='Validate configuration without loading any model, then exit')
+    parser.add_argument('--frame-step', type=int, default=5, help='Run inference on every N-th frame (in --serve mode: while there is motion)')
+    parser.add_argument('--workers', type=int, help='Inference worker threads (default: INFER_WORKERS)')
+    parser.add_argument('--batch-size', type=int,
+                        help='Max frames per inference call (default: INFER_BATCH_SIZE)')
+    parser.add_argument('--max-wait-ms', type=float,
+                        help='Max time to wait for a batch to fill (default: INFER_MAX_WAIT_MS)')
+    parser.add_argument('--decode-processes', action='store_true', default=None,
+                        help='Decode each camera in its own process, frames shared via shared memory '
+                             '(default: DECODE_PROCESSES)')
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help='Serve Prometheus metrics on this port (0 = off)')
+    parser.add_argument('--metrics-json', default=METRICS_JSON,
+                        help='Also dump metrics as JSON to this file every 30s')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    ctx = DetectorContext()
+    problems = ctx.validate()
+    logger.info(f"Startup (imports + config): {time.perf_counter() - _T_START:.3f}s")
+    if args.check_config:
+        for p in problems:
+            print(f"config error: {p}")
+        return 1 if problems else 0
+    for p in problems:
+        logger.warning(f"config: {p}")
+    try:
+        if args.serve:
+            serve(ctx, frame_step=args.frame_step, workers=args.workers,
+                  batch_size=args.batch_size, max_wait_ms=args.max_wait_ms,
+                  decode_processes=args.decode_processes,
+                  metrics_port=args.metrics_port, metrics_json=args.metrics_json)
+        elif args.image:
+            detect_image(ctx, args.image)
+        elif args.video:
+            run(ctx, video_path=args.video, frame_step=args.frame_step)
+        else:
+            print("请通过 --image、--video 或 --serve 参数指定运行方式。 示例: python detector_service.py --image images/test.jpg")
+    finally:
+        ctx.close()
+    return 0
 
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+违停证据图异步上传
+
+上报线程只做两件事：生成对象键、把帧交给线程池，然后立刻用预先生成的 URL 上报；
+JPEG 编码（可缩放、可标注检测框）和 OSS 上传都在线程池里完成，失败按指数退避重试。
+排队中的任务数有上限，超出时丢弃本张证据图（上报照常进行，image_path 为空），
+避免 OSS 变慢时帧在内存里无限堆积。
+上传状态可用 resolve(url) 查询：发件箱在证据图上传完成前暂缓发送对应上报，
+重试全部失败的上报改为 image_path 为空，违停记录不会指向不存在的对象。
+进程重启后之前的上传任务已不存在，resolve 返回 'unknown'，由调用方用 exists(url) 向 OSS 确认。
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+def encode_evidence(frame, box=None, quality: int=80, max_width: int=1280) -> bytes:
+    """
+    把帧缩放到不超过 max_width 像素宽，在 box 处画框后编码为 JPEG。
+    不修改传入的 frame。
+    """
+    h, w = frame.shape[:2]
+    scale = 1.0
+    if max_width and w > max_width:
+        scale = max_width / float(w)
+        img = cv2.resize(frame, (max_width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    else:
+        img = frame.copy() if box is not None else frame
+    if box is not None:
+        x1, y1, x2, y2 = (int(v * scale) for v in box)
+        cv2.rectangle(img, (x1, y1), (x2, y2), (0, 0, 255), 2)
+    ok, buf = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    if not ok:
+        raise ValueError("JPEG encode failed")
+    return buf.tobytes()
+
+
+class EvidenceUploader:
+    """
+    证据图上传线程池。
+
+    参数:
+        bucket: 具有 put_object(key, data) 的 OSS Bucket（应自带连接池）
+        url_prefix (str): 对象 URL 前缀，如 https://<bucket>.<endpoint>/
+        folder (str): 对象键前缀
+        quality (int): JPEG 质量（1~100）
+        max_width (int): 上传前缩放到的最大宽度，0 表示不缩放
+        workers (int): 并发编码/上传线程数
+        max_pending (int): 排队 + 进行中任务的上限
+        retries (int): 上传失败的最大重试次数
+        history (int): 最多记住多少个已结束（成功/失败）但尚未被 resolve 取走的上传结果
+    """
+
+    def __init__(self, bucket, url_prefix: str, folder: str='captures/',
+                 quality: int=80, max_width: int=1280, workers: int=4,
+                 max_pending: int=64, retries: int=3, backoff: float=0.5, history: int=4096):
+        self.bucket      = bucket
+        self.url_prefix  = url_prefix
+        self.folder      = folder
+        self.quality     = quality
+        self.max_width   = max_width
+        self.retries     = retries
+        self.backoff     = backoff
+        self.max_pending = max_pending
+        self.history     = history
+        self._slots    = threading.BoundedSemaphore(max_pending)
+        self._pool     = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='evidence')
+        self._lock     = threading.Lock()
+        self._pending  = set()
+        self._done     = OrderedDict()
+        self.submitted = 0
+        self.uploaded  = 0
+        self.failed    = 0
+        self.dropped   = 0
+
+    def new_key(self, ext: str='jpg') -> str:
+        return f"{self.folder}{uuid.uuid4().hex}.{ext}"
+
+    def url_for(self, key: str) -> str:
+        return f"{self.url_prefix}{key}"
+
+    def submit(self, frame, box=None):
+        """
+        异步编码并上传，立即返回该证据图最终的 URL；
+        队列已满时丢弃并返回 None。
+        """
+        if not self._slots.acquire(blocking=False):
+            self._bump('dropped')
+            logger.warning(f"Evidence queue full ({self.max_pending}), dropping image")
+            return None
+        key = self.new_key()
+        url = self.url_for(key)
+        with self._lock:
+            self._pending.add(url)
+        try:
+            self._pool.submit(self._work, key, frame, box)
+        except RuntimeError:
+            # 已 close
+            with self._lock:
+                self._pending.discard(url)
+            self._slots.release()
+            self._bump('dropped')
+            return None
+        self._bump('submitted')
+        return url
+
+    def resolve(self, url: str) -> str:
+        """
+        证据图上传状态：'pending' 仍在排队或重试，'uploaded' 已上传，'failed' 最终失败，
+        'unknown' 不是本进程提交的（或结果已被取走）。
+        'uploaded' / 'failed' 只返回一次，调用方应据此改写并持久化上报。
+        """
+        with self._lock:
+            if url in self._pending:
+                return 'pending'
+            return self._done.pop(url, 'unknown')
+
+    def key_for(self, url: str):
+        """由 URL 反推对象键，不是本 bucket 的 URL 返回 None。"""
+        if url and url.startswith(self.url_prefix):
+            return url[len(self.url_prefix):]
+        return None
+
+    def exists(self, url: str) -> bool:
+        """HEAD 查询对象是否存在（网络异常向上抛出）。"""
+        key = self.key_for(url)
+        return key is not None and self.bucket.object_exists(key)
+
+    def _finish(self, key: str, ok: bool):
+        url = self.url_for(key)
+        with self._lock:
+            self._pending.discard(url)
+            self._done[url] = 'uploaded' if ok else 'failed'
+            # 没有对应上报来取的结果（如上报前进程退出）按先进先出淘汰，长期运行不会无限增长
+            while len(self._done) > self.history:
+                self._done.popitem(last=False)
+            if ok:
+                self.uploaded += 1
+            else:
+                self.failed += 1
+
+    def _bump(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _work(self, key: str, frame, box):
+        try:
+            data = encode_evidence(frame, box, self.quality, self.max_width)
+            for attempt in range(self.retries + 1):
+                try:
+                    self.bucket.put_object(key, data)
+                    self._finish(key, True)
+                    return
+                except Exception as e:
+                    if attempt == self.retries:
+                        raise
+                    delay = self.backoff * (2 ** attempt)
+                    logger.warning(f"Upload {key} failed ({e}), retry in {delay:.1f}s")
+                    time.sleep(delay)
+        except Exception:
+            self._finish(key, False)
+            logger.exception(f"Evidence upload failed: {key}")
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "uploaded":  self.uploaded,
+                "failed":    self.failed,
+                "dropped":   self.dropped,
+                "pending":   self.submitted - self.uploaded - self.failed,
+            }
+
+    def close(self, wait: bool=True):
+        """停止接收新任务；wait=True 时等待已提交的上传完成。"""
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+跨进程共享内存帧环形缓冲区
+
+解码进程把帧写进 multiprocessing.shared_memory 中的固定大小槽位，
+只通过队列传递 (槽位号, 摄像头, 时间戳, 高, 宽)，推理进程直接在共享内存上
+取 NumPy 视图，避免每帧 pickle 一张 1080p 图像（约 6 MB）。
+
+槽位的所有权靠两个队列流转：
+    free  : 空闲槽位号，解码进程取出后写入
+    ready : 已写好的帧，推理端处理完后调用 release() 把槽位放回 free
+槽位用完时解码进程直接丢帧（回放模式下阻塞等待），环本身就是有界队列。
+"""
+import logging
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FrameRing:
+    """
+    参数:
+        slots (int): 槽位数
+        height, width, channels: 单个槽位能容纳的最大帧尺寸
+        ctx: multiprocessing 上下文，用于创建跨进程队列
+        name (str): 附着到已有共享内存时传入；为 None 时新建
+    """
+
+    def __init__(self, slots: int, height: int=1080, width: int=1920, channels: int=3,
+                 ctx=None, name: str=None, free=None, ready=None):
+        self.slots      = slots
+        self.shape      = (height, width, channels)
+        self.slot_bytes = height * width * channels
+        self._owner     = name is None
+        if self._owner:
+            self.shm   = shared_memory.SharedMemory(create=True, size=slots * self.slot_bytes)
+            self.free  = ctx.Queue()
+            self.ready = ctx.Queue()
+            for i in range(slots):
+                self.free.put(i)
+        else:
+            self.shm   = shared_memory.SharedMemory(name=name)
+            self.free  = free
+            self.ready = ready
+        self._buf = np.ndarray((slots, self.slot_bytes), dtype=np.uint8, buffer=self.shm.buf)
+
+    def handle(self) -> dict:
+        """传给子进程用于 attach() 的参数（队列随 Process 参数一起继承）。"""
+        h, w, c = self.shape
+        return {'slots': self.slots, 'height': h, 'width': w, 'channels': c,
+                'name': self.shm.name, 'free': self.free, 'ready': self.ready}
+
+    @classmethod
+    def attach(cls, handle: dict):
+        return cls(**handle)
+
+    def fits(self, frame) -> bool:
+        return frame.nbytes <= self.slot_bytes
+
+    def view(self, slot: int, shape):
+        """槽位上指定形状的 ndarray 视图（不拷贝）。"""
+        n = int(np.prod(shape))
+        return self._buf[slot, :n].reshape(shape)
+
+    # —— 写端（解码进程）——
+    def write(self, frame, meta: tuple, block: bool=False, timeout: float=0.5) -> bool:
+        """
+        取一个空闲槽位写入帧，并把 (slot, shape, *meta) 放入 ready 队列。
+        没有空闲槽位时返回 False（调用方计为丢帧）。
+        """
+        try:
+            slot = self.free.get(timeout=timeout) if block else self.free.get_nowait()
+        except queue.Empty:
+            return False
+        np.copyto(self.view(slot, frame.shape), frame)
+        self.ready.put((slot, frame.shape) + tuple(meta))
+        return True
+
+    # —— 读端（推理进程）——
+    def get(self, timeout: float=0.5):
+        """取一帧：返回 (slot, 帧视图, *meta)；超时抛 queue.Empty。"""
+        slot, shape, *meta = self.ready.get(timeout=timeout)
+        return (slot, self.view(slot, shape), *meta)
+
+    def release(self, slot: int):
+        self.free.put(slot)
+
+    def close(self):
+        """解除映射；创建方同时删除共享内存段（仍被映射时会在最后一个进程退出后释放）。"""
+        self._buf = None
+        try:
+            self.shm.close()
+        except BufferError:
+            logger.warning("Frame views still alive, shared memory left mapped until exit")
+        if self._owner:
+            self.shm.unlink()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+摄像头标定：像素坐标 ↔ 地理坐标（lng, lat）的单应变换
+
+每路摄像头的 3×3 单应矩阵 H 由 4 个以上「像素点 ↔ 经纬度」参考点求得，
+保存在后端 Camera.homography 中，检测端启动时随 /api/cameras 一起拉取。
+变换全部用 NumPy 向量化完成：一帧内所有检测点一次矩阵乘法即可换算。
+"""
+import numpy as np
+
+
+def _normalize(points):
+    """Hartley 归一化：平移到质心、缩放到平均距离 √2，返回 (归一化点, 3×3 变换)。"""
+    mean = points.mean(axis=0)
+    dist = np.sqrt(((points - mean) ** 2).sum(axis=1)).mean()
+    s = np.sqrt(2) / dist if dist > 0 else 1.0
+    T = np.array([[s, 0, -s * mean[0]],
+                  [0, s, -s * mean[1]],
+                  [0, 0, 1]])
+    return (points - mean) * s, T
+
+
+def fit_homography(pixel_points, geo_points):
+    """
+    由 N≥4 组对应点用归一化 DLT 求像素 → 地理的 3×3 单应矩阵（最小二乘）。
+    经纬度在小范围内变化极小，不归一化会严重病态。
+    """
+    src = np.asarray(pixel_points, dtype=np.float64)
+    dst = np.asarray(geo_points, dtype=np.float64)
+    if src.shape != dst.shape or src.ndim != 2 or src.shape[1] != 2 or len(src) < 4:
+        raise ValueError("need at least 4 matching (x, y) point pairs")
+    src_n, T_src = _normalize(src)
+    dst_n, T_dst = _normalize(dst)
+    x, y = src_n[:, 0], src_n[:, 1]
+    u, v = dst_n[:, 0], dst_n[:, 1]
+    zeros, ones = np.zeros_like(x), np.ones_like(x)
+    A = np.concatenate([
+        np.stack([-x, -y, -ones, zeros, zeros, zeros, u * x, u * y, u], axis=1),
+        np.stack([zeros, zeros, zeros, -x, -y, -ones, v * x, v * y, v], axis=1),
+    ])
+    _, _, vt = np.linalg.svd(A)
+    H_n = vt[-1].reshape(3, 3)
+    H = np.linalg.inv(T_dst) @ H_n @ T_src
+    # 单应矩阵只差一个比例因子；统一符号，使参考点的 w 为正（即位于地平线前方）
+    w = src @ H[2, :2] + H[2, 2]
+    if np.all(np.abs(w) < 1e-12):
+        raise ValueError("degenerate reference points")
+    return H / np.abs(H).max() * (1 if w.mean() > 0 else -1)
+
+
+def apply_homography(H, points):
+    """
+    对 (N, 2) 点集做透视变换，返回 (N, 2) float64 数组。
+    落在地平线之后（齐次坐标 w ≤ 0）的点返回 NaN；
+    约定 H 的符号使标定参考点的 w 为正（fit_homography 与后端保持一致）。
+    """
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    homo = pts @ H[:, :2].T + H[:, 2]
+    w = homo[:, 2:3]
+    out = np.full((len(pts), 2), np.nan)
+    ok = w[:, 0] > 0
+    out[ok] = homo[ok, :2] / w[ok]
+    return out
+
+
+class CameraCalibration:
+    """单路摄像头的标定结果，同时持有正反两个方向的矩阵。"""
+
+    def __init__(self, homography):
+        self.H     = np.asarray(homography, dtype=np.float64).reshape(3, 3)
+        self.H_inv = np.linalg.inv(self.H)
+
+    @classmethod
+    def from_camera(cls, camera: dict):
+        """camera 未标定（没有 homography）时返回 None。"""
+        H = camera.get('homography')
+        return cls(H) if H else None
+
+    def pixel_to_geo(self, points):
+        return apply_homography(self.H, points)
+
+    def geo_to_pixel(self, points):
+        return apply_homography(self.H_inv, points)
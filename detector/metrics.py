@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+检测服务运行指标
+
+MetricsCollector 在每次抓取时从流水线与运行时上下文现场汇总，不在热路径上额外加锁：
+  - 每路摄像头：解码 FPS、解码/门控跳过/推理帧数、丢帧数、
+    各阶段（decode / queue_wait / infer / ocr / upload_report / end_to_end）延迟直方图
+  - 全局：队列深度、发件箱积压与发送失败、证据图上传失败/丢弃
+
+导出方式：
+  - MetricsServer：HTTP /metrics（Prometheus 文本格式）与 /metrics.json
+  - dump_json()：写 JSON 文件（先写临时文件再原子替换），供没有 Prometheus 的环境定期落盘
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+FPS_WINDOW_SECS = 60.0
+
+
+def _labels(**kw) -> str:
+    parts = [f'{k}="{str(v)}"' for k, v in kw.items() if v is not None]
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _fmt(v) -> str:
+    if v == float('inf'):
+        return '+Inf'
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class MetricsCollector:
+    """
+    参数:
+        service: StreamingService
+        ctx: DetectorContext；为 None 时（如基准测试）不导出发件箱与上传指标。
+             只读取已经构建的资源，不会因为抓取指标触发模型或网络加载。
+    """
+
+    def __init__(self, service, ctx=None):
+        self.service  = service
+        self.ctx      = ctx
+        self._lock    = threading.Lock()
+        self._history = deque()    # [(t, {camera_id: decoded})]
+
+    def _decode_fps(self, gate: dict, now: float) -> dict:
+        """最近 FPS_WINDOW_SECS 秒内各摄像头的解码帧率。"""
+        decoded = {cid: g['decoded'] for cid, g in gate.items()}
+        with self._lock:
+            self._history.append((now, decoded))
+            while len(self._history) > 1 and now - self._history[1][0] >= FPS_WINDOW_SECS:
+                self._history.popleft()
+            t0, old = self._history[0]
+        dt = now - t0
+        return {cid: round((n - old.get(cid, 0)) / dt, 2) if dt > 0 else 0.0
+                for cid, n in decoded.items()}
+
+    def _resource(self, name: str):
+        return self.ctx.peek(name) if self.ctx is not None else None
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        svc  = self.service
+        gate = svc.gate_stats()
+        fps  = self._decode_fps(gate, now)
+        drops = svc.drop_counts()
+        hists = svc.timer.histograms()
+        buckets = svc.timer.buckets
+
+        cameras = {}
+        for cid, g in gate.items():
+            cameras[cid] = {
+                "decode_fps": fps.get(cid, 0.0),
+                "decoded":    g['decoded'],
+                "gated":      g['gated'],
+                "inferred":   g['inferred'],
+                "motion":     g['motion'],
+                "dropped":    {stage: n for (c, stage), n in drops.items() if c == cid},
+                "latency":    {},
+            }
+        for (stage, cid), (cum, total, count) in hists.items():
+            if cid not in cameras:
+                continue
+            cameras[cid]["latency"][stage] = {
+                "count":   count,
+                "sum_s":   round(total, 6),
+                "avg_ms":  round(1000 * total / count, 3) if count else None,
+                "buckets": dict(zip(buckets, cum)),
+            }
+
+        out = {
+            "timestamp": now,
+            "cameras":   cameras,
+            "queues":    svc.queue_depths(),
+            "stages":    svc.timer.percentiles(),
+        }
+        outbox = self._resource('outbox')
+        sender = self._resource('sender')
+        if outbox is not None:
+            out["outbox"] = {"backlog": outbox.backlog(), "dead": outbox.dead_letters()}
+            if sender is not None:
+                out["outbox"].update(sent=sender.sent, failures=sender.failures)
+        evidence = self._resource('evidence')
+        if evidence is not None:
+            out["evidence"] = evidence.stats()
+        return out
+
+    def prometheus(self) -> str:
+        """Prometheus 文本暴露格式（0.0.4）。"""
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {_fmt(value)}")
+
+        cams = snap["cameras"]
+        metric("detector_decode_fps", "gauge", "Decoded frames per second over the last minute",
+               [(_labels(camera=c), v["decode_fps"]) for c, v in cams.items()])
+        metric("detector_frames_decoded_total", "counter", "Frames decoded",
+               [(_labels(camera=c), v["decoded"]) for c, v in cams.items()])
+        metric("detector_frames_gated_total", "counter", "Frames skipped by the motion gate",
+               [(_labels(camera=c), v["gated"]) for c, v in cams.items()])
+        metric("detector_frames_inferred_total", "counter", "Frames sent to inference",
+               [(_labels(camera=c), v["inferred"]) for c, v in cams.items()])
+        metric("detector_frames_dropped_total", "counter", "Frames dropped because a stage fell behind",
+               [(_labels(camera=c, stage=s), n) for c, v in cams.items() for s, n in v["dropped"].items()])
+
+        hist = []
+        for c, v in cams.items():
+            for stage, h in v["latency"].items():
+                lab = dict(camera=c, stage=stage)
+                for le, n in h["buckets"].items():
+                    hist.append(("_bucket", _labels(**lab, le=_fmt(float(le))), n))
+                hist.append(("_bucket", _labels(**lab, le='+Inf'), h["count"]))
+                hist.append(("_sum", _labels(**lab), h["sum_s"]))
+                hist.append(("_count", _labels(**lab), h["count"]))
+        lines.append("# HELP detector_stage_latency_seconds Per-camera stage latency")
+        lines.append("# TYPE detector_stage_latency_seconds histogram")
+        for suffix, labels, value in hist:
+            lines.append(f"detector_stage_latency_seconds{suffix}{labels} {_fmt(value)}")
+
+        metric("detector_queue_depth", "gauge", "Items waiting in each pipeline queue",
+               [(_labels(queue=q), n) for q, n in snap["queues"].items()])
+        if "outbox" in snap:
+            ob = snap["outbox"]
+            metric("detector_outbox_backlog", "gauge", "Violation reports waiting to be sent",
+                   [("", ob["backlog"])])
+            metric("detector_outbox_dead_letters", "gauge", "Violation reports rejected or given up on",
+                   [("", ob["dead"])])
+            if "failures" in ob:
+                metric("detector_outbox_sent_total", "counter", "Violation reports delivered",
+                       [("", ob["sent"])])
+                metric("detector_outbox_failures_total", "counter", "Failed violation report POSTs",
+                       [("", ob["failures"])])
+        if "evidence" in snap:
+            ev = snap["evidence"]
+            metric("detector_evidence_uploads_total", "counter", "Evidence images by outcome",
+                   [(_labels(result=k), ev[k]) for k in ("uploaded", "failed", "dropped")])
+            metric("detector_evidence_pending", "gauge", "Evidence images being encoded or uploaded",
+                   [("", ev["pending"])])
+        return "\n".join(lines) + "\n"
+
+    def dump_json(self, path: str):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, default=str)
+        os.replace(tmp, path)
+
+
+class MetricsServer:
+    """后台 HTTP 服务：GET /metrics 返回 Prometheus 文本，GET /metrics.json 返回 JSON。"""
+
+    def __init__(self, collector: MetricsCollector, port: int, host: str='0.0.0.0'):
+        collector_ref = collector
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                try:
+                    if self.path.split('?')[0] == '/metrics':
+                        body = collector_ref.prometheus().encode()
+                        ctype = 'text/plain; version=0.0.4; charset=utf-8'
+                    elif self.path.split('?')[0] == '/metrics.json':
+                        body = json.dumps(collector_ref.snapshot(), default=str).encode()
+                        ctype = 'application/json'
+                    else:
+                        self.send_error(404)
+                        return
+                except Exception:
+                    logger.exception("Metrics collection failed")
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', ctype)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                logger.debug("metrics: " + fmt % args)
+
+        self.httpd   = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Metrics at http://{self.httpd.server_address[0]}:{self.port}/metrics")
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+运动门控的自适应抽帧
+
+用缩小后的灰度帧与滑动平均背景做差，得到画面变化比例：
+  - 画面静止且没有活跃轨迹时，按 idle_step 稀疏抽帧（仍保留心跳，保证停放车辆能被发现）
+  - 检测到运动或有活跃轨迹时，切到 active_step 密集抽帧，并保持 hold 秒
+"""
+import time
+
+import cv2
+
+
+class MotionGate:
+    """
+    单路摄像头的运动门控。
+
+    参数:
+        active_step (int): 有运动/活跃轨迹时每 N 帧推理一次
+        idle_step (int): 静止时每 N 帧推理一次
+        threshold (float): 变化像素占比超过该值视为有运动
+        hold (float): 触发后保持高频抽帧的秒数
+        width (int): 计算运动分数时缩放到的宽度
+        enabled (bool): 关闭时退化为固定每 active_step 帧推理一次
+    """
+
+    def __init__(self, active_step: int=5, idle_step: int=50,
+                 threshold: float=0.01, hold: float=5.0, width: int=160,
+                 pixel_delta: int=25, alpha: float=0.05, enabled: bool=True):
+        self.active_step = active_step
+        self.idle_step   = idle_step
+        self.threshold   = threshold
+        self.hold        = hold
+        self.width       = width
+        self.pixel_delta = pixel_delta
+        self.alpha       = alpha
+        self.enabled     = enabled
+        self._background = None
+        self._since_last = 0
+        self._hot_until  = 0.0
+        self.decoded  = 0
+        self.gated    = 0
+        self.inferred = 0
+        self.last_score = 0.0
+
+    def motion_score(self, frame) -> float:
+        """变化像素占比（0~1）；首帧只用于初始化背景，返回 1.0。"""
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, int(h * self.width / w))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype('float32')
+            return 1.0
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(gray, self._background, self.alpha)
+        return float((diff > self.pixel_delta).mean())
+
+    def should_infer(self, frame, active_tracks: bool=False, now: float=None) -> bool:
+        """每个解码帧调用一次，返回该帧是否送去推理。"""
+        now = time.time() if now is None else now
+        self.decoded += 1
+        if self.enabled:
+            self.last_score = self.motion_score(frame)
+            if self.last_score >= self.threshold or active_tracks:
+                self._hot_until = now + self.hold
+            step = self.active_step if now < self._hot_until else self.idle_step
+        else:
+            step = self.active_step
+        self._since_last += 1
+        if self._since_last >= step:
+            self._since_last = 0
+            self.inferred += 1
+            return True
+        self.gated += 1
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "decoded":  self.decoded,
+            "gated":    self.gated,
+            "inferred": self.inferred,
+            "motion":   round(self.last_score, 4),
+        }
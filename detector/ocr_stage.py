@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+车牌 OCR 阶段
+
+  - 只对检测到的车牌框裁剪识别，不再整帧 OCR
+  - 裁剪图统一灰度化、对比度均衡并缩放/填充到固定尺寸，便于批量识别
+  - 多帧的裁剪图合并为一次 readtext_batched 调用
+  - 以裁剪图宽高比 + 256 位感知哈希（dHash）为键做 LRU 缓存，静止车辆的同一车牌不重复识别；
+    命中后再与缓存的归一化图比对（crop_distance），差异过大视为哈希碰撞，重新识别
+  - 识别为空的结果不缓存，避免一帧模糊的裁剪图让该车牌一直返回空
+"""
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def crop_box(frame, box, pad: float=0.05):
+    """按 (x1, y1, x2, y2) 裁剪，四周外扩 pad 比例并裁到画面范围内。"""
+    x1, y1, x2, y2 = box
+    h, w = frame.shape[:2]
+    px, py = int((x2 - x1) * pad), int((y2 - y1) * pad)
+    x1, y1 = max(x1 - px, 0), max(y1 - py, 0)
+    x2, y2 = min(x2 + px, w), min(y2 + py, h)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return frame[y1:y2, x1:x2]
+
+
+def normalize_plate(crop, width: int=256, height: int=64):
+    """灰度 + CLAHE 均衡，按高度等比缩放后右侧填充到 width × height。"""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    gray = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4)).apply(gray)
+    h, w = gray.shape[:2]
+    new_w = max(1, min(width, int(w * height / float(h))))
+    resized = cv2.resize(gray, (new_w, height), interpolation=cv2.INTER_CUBIC)
+    out = np.full((height, width), 255, dtype=np.uint8)
+    out[:, :new_w] = resized
+    return out
+
+
+def dhash(img, size: int=16) -> int:
+    """差值感知哈希：缩放到 (size+1) × size，比较相邻像素得到 size² 位整数。"""
+    small = cv2.resize(img, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).tobytes().hex(), 16)
+
+
+def crop_distance(a, b, shift: int=4, strips: int=16) -> int:
+    """
+    两张归一化车牌图的差异：在 ±shift 像素平移内取最小值，
+    每次平移按列切成 strips 条取最大的条带平均灰度差，只差一个字符也会被放大。
+    """
+    h, w = a.shape[:2]
+    best = 255
+    for dy in range(-shift, shift + 1):
+        for dx in range(-shift, shift + 1):
+            sa = a[max(dy, 0):h + min(dy, 0), max(dx, 0):w + min(dx, 0)]
+            sb = b[max(-dy, 0):h + min(-dy, 0), max(-dx, 0):w + min(-dx, 0)]
+            d = cv2.resize(cv2.absdiff(sa, sb), (strips, 1), interpolation=cv2.INTER_AREA)
+            best = min(best, int(d.max()))
+    return best
+
+
+class LRUCache:
+    """线程安全的定长 LRU 缓存。"""
+
+    def __init__(self, maxsize: int=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class OcrStage:
+    """
+    批量 + 缓存的车牌识别。
+
+    参数:
+        reader: easyocr.Reader 实例
+        width, height (int): 归一化后的裁剪图尺寸
+        cache_size (int): 感知哈希 LRU 缓存条数
+        max_diff (int): 命中时与缓存图的 crop_distance 上限，超过视为不同车牌
+    """
+
+    def __init__(self, reader, width: int=256, height: int=64, cache_size: int=1024,
+                 max_diff: int=12):
+        self.reader   = reader
+        self.width    = width
+        self.height   = height
+        self.max_diff = max_diff
+        self.cache    = LRUCache(cache_size)
+
+    @staticmethod
+    def cache_key(crop, img):
+        """(宽高比保留一位小数, dHash)：版式相同但尺寸比例不同的车牌不会共用一个键。"""
+        h, w = crop.shape[:2]
+        return round(w / float(h), 1), dhash(img)
+
+    def _lookup(self, key, img):
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        text, ref = cached
+        return text if crop_distance(img, ref) <= self.max_diff else None
+
+    def read(self, crops):
+        """识别一组裁剪图，返回与输入一一对应的车牌文本（无法识别为空字符串）。"""
+        texts = [''] * len(crops)
+        todo, keys, images = [], [], []
+        for i, crop in enumerate(crops):
+            if crop is None or crop.size == 0:
+                continue
+            img = normalize_plate(crop, self.width, self.height)
+            key = self.cache_key(crop, img)
+            cached = self._lookup(key, img)
+            if cached is not None:
+                texts[i] = cached
+                continue
+            todo.append(i)
+            keys.append(key)
+            images.append(img)
+        if images:
+            results = self.reader.readtext_batched(images, n_width=self.width,
+                                                   n_height=self.height,
+                                                   batch_size=len(images), detail=0)
+            for i, key, img, found in zip(todo, keys, images, results):
+                text = ''.join(t.replace(' ', '') for t in found).upper()
+                if text:
+                    self.cache.put(key, (text, img))
+                texts[i] = text
+        return texts
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+违停上报持久化发件箱
+
+  - 上报先追加写入本地 SQLite（WAL 模式），进程重启或后端宕机都不会丢失
+  - 后台 OutboxSender 线程使用连接池化的 requests.Session 批量 POST，
+    失败按指数退避重试，推理线程永远不会阻塞在网络 I/O 上
+  - 每条上报带 event_id 作为幂等键，重发不会在服务端产生重复记录
+  - 只确认服务端逐条接受（created / duplicate）的上报；鉴权失败、限流、超时、5xx 都按退避重试，
+    被服务端判为非法或重试超过上限的上报移入死信表 outbox_dead 保留，不会被静默删除
+  - 可选的 prepare 钩子在发送前检查每条上报：暂缓（证据图仍在上传）或改写后持久化再发送
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# 这些状态码说明请求本身没问题（令牌过期、代理限流、服务端故障），重发可能成功
+RETRYABLE_STATUS = {401, 403, 408, 429}
+ACCEPTED         = ('created', 'duplicate')
+
+
+def retryable(status_code: int) -> bool:
+    return status_code in RETRYABLE_STATUS or status_code >= 500
+
+
+class Outbox:
+    """
+    基于 SQLite 的先进先出发件箱，线程安全。
+
+    参数:
+        path (str): SQLite 文件路径
+        max_attempts (int): 失败计数达到该值的上报移入死信表
+    """
+
+    def __init__(self, path: str, max_attempts: int=50):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox_dead ("
+            " id INTEGER PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " attempts INTEGER NOT NULL,"
+            " failed_at REAL NOT NULL,"
+            " reason TEXT)"
+        )
+
+    def put(self, payload: dict) -> str:
+        """追加一条上报，自动补 event_id，返回该 event_id。"""
+        payload = dict(payload)
+        payload.setdefault('event_id', uuid.uuid4().hex)
+        with self._lock:
+            self._conn.execute("INSERT INTO outbox (payload, created_at) VALUES (?, ?)",
+                               (json.dumps(payload, ensure_ascii=False), time.time()))
+        return payload['event_id']
+
+    def peek(self, limit: int, after: int=0):
+        """按写入顺序取出 id 大于 after 的最多 limit 条 [(id, payload)]，不删除。"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM outbox WHERE id > ? ORDER BY id LIMIT ?", (after, limit)
+            ).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def replace(self, row_id: int, payload: dict):
+        """改写一条尚未发送的上报。"""
+        with self._lock:
+            self._conn.execute("UPDATE outbox SET payload = ? WHERE id = ?",
+                               (json.dumps(payload, ensure_ascii=False), row_id))
+
+    def ack(self, ids):
+        """发送成功（或确认无需重发）后删除。"""
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    def mark_failed(self, ids, reason: str=None):
+        """失败计数加一；达到 max_attempts 的上报移入死信表。"""
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?",
+                                   [(i,) for i in ids])
+            exhausted = [i for (i,) in self._conn.execute(
+                f"SELECT id FROM outbox WHERE attempts >= ? AND id IN ({','.join('?' * len(ids))})",
+                (self.max_attempts, *ids))]
+            self._move_dead(exhausted, f"gave up after {self.max_attempts} attempts: {reason}")
+
+    def dead_letter(self, ids, reason: str):
+        """服务端明确拒绝（重发也不会成功）的上报移入死信表，留待人工处理。"""
+        with self._lock:
+            self._move_dead(ids, reason)
+
+    def _move_dead(self, ids, reason):
+        if not ids:
+            return
+        logger.error(f"Moving {len(ids)} violation reports to dead letters: {reason}")
+        now = time.time()
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO outbox_dead (id, payload, created_at, attempts, failed_at, reason)"
+                " SELECT id, payload, created_at, attempts, ?, ? FROM outbox WHERE id = ?",
+                [(now, reason, i) for i in ids])
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def backlog(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def dead_letters(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox_dead").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OutboxSender(threading.Thread):
+    """
+    后台发送线程：每次从发件箱取一批 POST 到批量接口。
+
+    参数:
+        batch_url (str): 批量上报接口，请求体为 JSON 数组
+        single_url (str): 批量接口不存在（404）时退回逐条上报
+        batch_size (int): 每次 POST 的最大条数
+        max_backoff (float): 退避上限（秒）
+        prepare: 可选，prepare(payload) 返回 None 表示暂不发送（留在发件箱），
+                 否则返回要发送的上报；与原上报不同时先写回发件箱
+    """
+
+    def __init__(self, outbox: Outbox, batch_url: str, single_url: str=None,
+                 batch_size: int=50, poll_interval: float=1.0,
+                 max_backoff: float=60.0, timeout: float=5.0, prepare=None):
+        super().__init__(name="outbox-sender", daemon=True)
+        self.outbox        = outbox
+        self.batch_url     = batch_url
+        self.single_url    = single_url
+        self.batch_size    = batch_size
+        self.poll_interval = poll_interval
+        self.max_backoff   = max_backoff
+        self.timeout       = timeout
+        self.prepare       = prepare
+        self.session       = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.sent     = 0
+        self.failures = 0
+        self._stopped = threading.Event()
+
+    def _rejected(self, r, rows) -> bool:
+        """
+        检查响应状态：可重试的失败抛 HTTPError（由调用方计数并退避），
+        其余 4xx 说明这些上报本身被拒绝，移入死信表并返回 True。
+        """
+        if r.status_code < 400:
+            return False
+        if retryable(r.status_code):
+            r.raise_for_status()
+        self.outbox.dead_letter([row_id for row_id, _ in rows],
+                                f"HTTP {r.status_code}: {r.text[:200]}")
+        return True
+
+    def _post_single(self, row) -> int:
+        row_id, payload = row
+        r = self.session.post(self.single_url, json=payload, timeout=self.timeout)
+        if self._rejected(r, [row]):
+            return 0
+        self.outbox.ack([row_id])
+        return 1
+
+    def _post_batch(self, rows) -> int:
+        """POST 一批 [(id, payload)]，按服务端逐条结果确认，返回被接受的条数。"""
+        r = self.session.post(self.batch_url, json=[p for _, p in rows], timeout=self.timeout)
+        if r.status_code == 404 and self.single_url:
+            # 逐条发送、逐条确认：中途失败时已送达的上报不会被重发
+            return sum(self._post_single(row) for row in rows)
+        if r.status_code == 413 and len(rows) > 1:
+            half = len(rows) // 2
+            return self._post_batch(rows[:half]) + self._post_batch(rows[half:])
+        if self._rejected(r, rows):
+            return 0
+
+        try:
+            results = {res['index']: res for res in r.json()['results']}
+        except (ValueError, KeyError, TypeError):
+            results = {}
+        accepted, invalid = [], []
+        for i, (row_id, _) in enumerate(rows):
+            res = results.get(i)
+            if res is None or res.get('status') in ACCEPTED:
+                accepted.append(row_id)
+            else:
+                invalid.append((row_id, res.get('error') or res.get('status')))
+        self.outbox.ack(accepted)
+        for row_id, reason in invalid:
+            self.outbox.dead_letter([row_id], f"rejected: {reason}")
+        return len(accepted)
+
+    def flush_once(self) -> int:
+        """发送一批；返回服务端接受的条数，发件箱为空返回 0，可重试的失败抛异常。"""
+        rows = self._next_batch()
+        if not rows:
+            return 0
+        try:
+            n = self._post_batch(rows)
+        except (requests.ConnectionError, requests.Timeout):
+            # 后端不可达不是这批上报的问题，不计失败次数，等恢复后原样重发
+            raise
+        except Exception as e:
+            # 已确认的行已删除，计数只落在剩下的行上
+            self.outbox.mark_failed([row_id for row_id, _ in rows], reason=str(e)[:200])
+            raise
+        self.sent += n
+        return n
+
+    def _next_batch(self):
+        """
+        取最多 batch_size 条可发送的上报。prepare 暂缓的行被跳过并继续往后取，
+        一张迟迟传不完的证据图不会挡住后面已就绪的上报。
+        """
+        if self.prepare is None:
+            return self.outbox.peek(self.batch_size)
+        ready, after = [], 0
+        while len(ready) < self.batch_size:
+            rows = self.outbox.peek(self.batch_size, after=after)
+            if not rows:
+                break
+            for row_id, payload in rows:
+                after = row_id
+                prepared = self.prepare(payload)
+                if prepared is None:
+                    continue
+                if prepared != payload:
+                    self.outbox.replace(row_id, prepared)
+                ready.append((row_id, prepared))
+                if len(ready) == self.batch_size:
+                    break
+        return ready
+
+    def run(self):
+        backoff = self.poll_interval
+        while not self._stopped.is_set():
+            try:
+                n = self.flush_once()
+                backoff = self.poll_interval
+                if n < self.batch_size:
+                    self._stopped.wait(self.poll_interval)
+            except Exception:
+                self.failures += 1
+                logger.warning(f"Violation report failed, {self.outbox.backlog()} queued, "
+                               f"retry in {backoff:.0f}s", exc_info=True)
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def stop(self, timeout: float=5.0):
+        self._stopped.set()
+        self.join(timeout)
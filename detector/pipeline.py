@@ -0,0 +1,662 @@
+# -*- coding: utf-8 -*-
+"""
+多摄像头检测流水线
+
+  每路摄像头一个解码线程 → 有界推理队列 → 共享推理线程池（跨摄像头攒批）
+  → 有界上报队列 → OCR/上报线程
+
+流水线本身不持有任何重量级资源，各阶段依赖的外部服务通过 backends 注入：
+  backends.model               具有 infer(frames, confidence, iou_threshold) 的检测模型
+  backends.ocr                 具有 read(crops) -> [text] 的 OCR 阶段
+  backends.zones               具有 .index（地理坐标 ZoneIndex）的禁停区
+  backends.upload(frame, box)  异步上传证据图，立即返回最终 URL（可为 None）
+  backends.report(payload)     提交违停上报
+常驻服务注入真实的模型 / OSS / 发件箱，基准测试注入桩实现。
+"""
+import bisect
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+from frame_ring import FrameRing
+from geo import CameraCalibration
+from motion import MotionGate
+from ocr_stage import crop_box
+from tracker import PlateTracker
+from zones import CameraZones
+
+logger = logging.getLogger(__name__)
+
+UNCALIBRATED = CameraZones()
+
+# —— 流水线配置 ——
+INFER_WORKERS     = int(os.getenv('INFER_WORKERS', '2'))
+INFER_QUEUE_SIZE  = int(os.getenv('INFER_QUEUE_SIZE', '16'))
+REPORT_QUEUE_SIZE = int(os.getenv('REPORT_QUEUE_SIZE', '32'))
+INFER_BATCH_SIZE  = int(os.getenv('INFER_BATCH_SIZE', '8'))
+INFER_MAX_WAIT_MS = float(os.getenv('INFER_MAX_WAIT_MS', '50'))
+REPORT_DWELL_SECS = float(os.getenv('REPORT_DWELL_SECS', '600'))
+TRACK_MAX_AGE     = float(os.getenv('TRACK_MAX_AGE', '10'))
+IDLE_FRAME_STEP   = int(os.getenv('IDLE_FRAME_STEP', '50'))
+MOTION_THRESHOLD  = float(os.getenv('MOTION_THRESHOLD', '0.01'))
+OCR_BATCH_SIZE    = int(os.getenv('OCR_BATCH_SIZE', '8'))
+OCR_MAX_WAIT_MS   = float(os.getenv('OCR_MAX_WAIT_MS', '100'))
+# 解码放到独立进程，帧经共享内存环形缓冲区传给推理进程
+DECODE_PROCESSES  = os.getenv('DECODE_PROCESSES', '0') == '1'
+RING_SLOTS_PER_CAMERA = int(os.getenv('RING_SLOTS_PER_CAMERA', '4'))
+FRAME_SLOT_WIDTH  = int(os.getenv('FRAME_SLOT_WIDTH', '1920'))
+FRAME_SLOT_HEIGHT = int(os.getenv('FRAME_SLOT_HEIGHT', '1080'))
+ACTIVE_WITHIN     = 5.0
+# 只对这些类别的检测框做车牌识别，留空表示所有类别
+PLATE_CLASSES     = {c.strip() for c in os.getenv('PLATE_CLASSES', '').split(',') if c.strip()}
+
+
+def iso_timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def pred_box(p):
+    """预测框中心坐标 → (x1, y1, x2, y2) 像素坐标。"""
+    return (int(p.x - p.width/2), int(p.y - p.height/2),
+            int(p.x + p.width/2), int(p.y + p.height/2))
+
+def is_plate(p) -> bool:
+    return not PLATE_CLASSES or p.class_name in PLATE_CLASSES
+
+def ground_points(preds, boxes):
+    """各检测框的地面接触点（框底边中点），(N, 2) 像素坐标数组。"""
+    return np.array([(p.x, box[3]) for p, box in zip(preds, boxes)], dtype=np.float64).reshape(-1, 2)
+
+def handle_detections(batch, trackers: dict, backends, timer=None, camera_zones=None):
+    """
+    对一批帧的检测结果做禁停区判定：
+    地面点（框底边中点）落在禁停区内时识别车牌、上传截图并上报。
+    一帧内所有地面点一次批量判定；camera_zones 为 {camera_id: CameraZones}，
+    已标定的摄像头在预先投影到像素空间的禁停区上判定，缺省时按未标定处理。
+
+    batch 为 [(camera_id, frame, preds), …]，可来自多路摄像头。
+    借助 tracker 去重：同一轨迹只在新建或置信度提升时 OCR，
+    同一 (track, zone) 在 dwell 窗口内只上报一次；
+    需要识别的车牌裁剪图跨帧合并为一次批量 OCR。
+    """
+    now = time.time()
+    zone_index = backends.zones.index
+    camera_zones = camera_zones or {}
+    pending = []
+    for camera_id, frame, preds in batch:
+        tracker = trackers[camera_id]
+        preds = [p for p in preds if is_plate(p)]
+        boxes = [pred_box(p) for p in preds]
+        tracks = tracker.update(boxes, now)
+        if not preds:
+            continue
+        zones = camera_zones.get(camera_id) or UNCALIBRATED
+        zone_ids = zones.find_many(zone_index, ground_points(preds, boxes))
+        for p, box, track, zone_id in zip(preds, boxes, tracks, zone_ids):
+            if zone_id is None or not tracker.should_report(track, zone_id, now):
+                continue
+            pending.append((camera_id, frame, box, p.confidence, track, zone_id))
+
+    need_ocr = [item for item in pending if item[4].needs_ocr(item[3])]
+    if need_ocr:
+        t0 = time.perf_counter()
+        texts = backends.ocr.read([crop_box(frame, box) for _, frame, box, _, _, _ in need_ocr])
+        if timer:
+            elapsed = time.perf_counter() - t0
+            timer.record('ocr', elapsed)
+            for camera_id in {item[0] for item in need_ocr}:
+                timer.observe('ocr', elapsed, camera_id)
+        for (_, _, _, conf, track, _), text in zip(need_ocr, texts):
+            if text and track.needs_ocr(conf):
+                track.set_plate(text, conf)
+
+    for camera_id, frame, box, conf, track, zone_id in pending:
+        tracker = trackers[camera_id]
+        # 同一轨迹可能在本批的多帧中出现，只上报一次
+        if not track.plate or not tracker.should_report(track, zone_id, now):
+            continue
+        t0 = time.perf_counter()
+        # 编码与上传在后台线程池完成，这里只拿到预先生成的对象 URL
+        image_url = backends.upload(frame, box)
+        backends.report({
+            "camera_id":    camera_id,
+            "zone_id":      zone_id,
+            "plate_number": track.plate,
+            "image_path":   image_url,
+            "occurred_at":  iso_timestamp(),
+        })
+        tracker.mark_reported(track, zone_id, now)
+        if timer:
+            timer.record('upload_report', time.perf_counter() - t0, camera_id)
+
+
+def put_latest(q: queue.Queue, item) -> bool:
+    """
+    非阻塞入队；队列满时丢弃最旧的一项再放入，保证下游只处理最新的帧。
+    返回 True 表示本次发生了丢帧。
+    """
+    dropped = False
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped = True
+            except queue.Empty:
+                pass
+
+def collect_batch(q: queue.Queue, max_batch: int, max_wait: float, timeout: float=0.5):
+    """
+    从队列中攒一批：阻塞等到第一项（最多 timeout 秒），
+    之后在 max_wait 秒内继续收集，凑满 max_batch 或超时即返回。
+    """
+    try:
+        batch = [q.get(timeout=timeout)]
+    except queue.Empty:
+        return []
+    deadline = time.perf_counter() + max_wait
+    while len(batch) < max_batch:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(q.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+class ImageSequence:
+    """把一组图片文件包装成 cv2.VideoCapture 式的 read()/release() 接口，用于离线回放。"""
+
+    def __init__(self, paths):
+        self._paths = iter(paths)
+
+    def isOpened(self) -> bool:
+        return True
+
+    def read(self):
+        for path in self._paths:
+            frame = cv2.imread(path)
+            if frame is not None:
+                return True, frame
+            logger.warning(f"Cannot read image: {path}")
+        return False, None
+
+    def release(self):
+        pass
+
+
+def open_source(camera: dict):
+    """camera 带 images 列表时按图片序列回放，否则用 cv2 打开 rtsp_url（流地址或视频文件）。"""
+    if camera.get('images'):
+        return ImageSequence(camera['images'])
+    return cv2.VideoCapture(camera['rtsp_url'])
+
+
+# 各阶段延迟直方图的桶上界（秒），与 Prometheus histogram 的 le 标签一致
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class StageTimer:
+    """
+    各阶段耗时采样（每阶段保留最近 maxlen 个样本），用于输出 p50/p95/p99；
+    带 camera_id 的样本另外累计到 (stage, camera_id) 的直方图，供 metrics 导出。
+    """
+
+    def __init__(self, maxlen: int=10000, buckets=LATENCY_BUCKETS):
+        self._lock    = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=maxlen))
+        self.counts   = defaultdict(int)
+        self.buckets  = tuple(buckets)
+        self._hist    = {}
+
+    def record(self, stage: str, secs: float, camera_id=None):
+        with self._lock:
+            self._samples[stage].append(secs)
+            self.counts[stage] += 1
+        if camera_id is not None:
+            self.observe(stage, secs, camera_id)
+
+    def observe(self, stage: str, secs: float, camera_id):
+        """只计入某路摄像头的直方图（批量阶段把整批耗时分摊记到批内各摄像头）。"""
+        i = bisect.bisect_left(self.buckets, secs)
+        with self._lock:
+            h = self._hist.get((stage, camera_id))
+            if h is None:
+                h = self._hist[(stage, camera_id)] = [[0] * len(self.buckets), 0.0, 0]
+            if i < len(self.buckets):    # 超出最大桶的样本只计入 +Inf（即 count）
+                h[0][i] += 1
+            h[1] += secs
+            h[2] += 1
+
+    def histograms(self) -> dict:
+        """{(stage, camera_id): (累计桶计数列表, sum, count)}，桶与 self.buckets 一一对应。"""
+        with self._lock:
+            snap = {k: (list(v[0]), v[1], v[2]) for k, v in self._hist.items()}
+        return {k: (list(itertools.accumulate(b)), total, n) for k, (b, total, n) in snap.items()}
+
+    def percentiles(self, ps=(50, 95, 99)) -> dict:
+        """{stage: {count, p50_ms, p95_ms, p99_ms, max_ms}}，按最近邻秩取分位数。"""
+        with self._lock:
+            snap = {stage: sorted(s) for stage, s in self._samples.items()}
+            counts = dict(self.counts)
+        out = {}
+        for stage, values in snap.items():
+            if not values:
+                continue
+            row = {"count": counts[stage]}
+            for p in ps:
+                k = max(0, min(len(values) - 1, math.ceil(p / 100.0 * len(values)) - 1))
+                row[f"p{p}_ms"] = round(values[k] * 1000, 3)
+            row["max_ms"] = round(values[-1] * 1000, 3)
+            out[stage] = row
+        return out
+
+
+class BatchStats:
+    """批量推理统计：批大小、排队等待、单帧推理耗时，用于调 batch/wait 参数。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.batches     = 0
+        self.frames      = 0
+        self.wait_total  = 0.0
+        self.wait_max    = 0.0
+        self.infer_total = 0.0
+
+    def record(self, waits, infer_secs: float):
+        with self._lock:
+            self.batches     += 1
+            self.frames      += len(waits)
+            self.wait_total  += sum(waits)
+            self.wait_max     = max(self.wait_max, max(waits))
+            self.infer_total += infer_secs
+
+    def snapshot(self, reset: bool=True) -> dict:
+        with self._lock:
+            n = self.frames or 1
+            snap = {
+                "batches":          self.batches,
+                "frames":           self.frames,
+                "avg_batch_size":   self.frames / (self.batches or 1),
+                "avg_queue_wait_ms": 1000 * self.wait_total / n,
+                "max_queue_wait_ms": 1000 * self.wait_max,
+                "per_frame_ms":     1000 * self.infer_total / n,
+            }
+            if reset:
+                self.reset()
+            return snap
+
+
+def iter_frames(camera: dict, stopped, replay: bool, timer=None):
+    """
+    逐帧读取一路摄像头，断流按指数退避重连；回放模式下读到末尾即结束。
+    stopped 为 threading.Event 或 multiprocessing.Event。
+    """
+    backoff = 1
+    while not stopped.is_set():
+        cap = open_source(camera)
+        if not cap.isOpened():
+            if replay:
+                logger.error(f"Cannot open {camera.get('rtsp_url')}")
+                return
+            logger.warning(f"Camera {camera['id']} unreachable, retry in {backoff}s")
+            stopped.wait(backoff)
+            backoff = min(backoff * 2, 60)
+            continue
+        backoff = 1
+        try:
+            while not stopped.is_set():
+                t0 = time.perf_counter()
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if timer:
+                    timer.record('decode', time.perf_counter() - t0, camera['id'])
+                yield frame
+        finally:
+            cap.release()
+        if replay:
+            return
+        logger.warning(f"Camera {camera['id']} stream lost, reconnecting")
+
+
+def make_gate(frame_step: int, motion_gate: bool) -> MotionGate:
+    return MotionGate(active_step=frame_step,
+                      idle_step=max(frame_step, IDLE_FRAME_STEP),
+                      threshold=MOTION_THRESHOLD,
+                      enabled=motion_gate)
+
+
+class CameraReader(threading.Thread):
+    """
+    单路摄像头解码线程：经运动门控自适应抽帧后送入推理队列，断流自动重连。
+    静止画面按 IDLE_FRAME_STEP 稀疏抽帧，有运动或活跃轨迹时按 frame_step 抽帧。
+    回放模式下读到文件末尾即结束，并以阻塞方式入队（不丢帧），便于测吞吐。
+    """
+
+    def __init__(self, service, camera: dict, frame_step: int):
+        super().__init__(name=f"decode-{camera['id']}", daemon=True)
+        self.service    = service
+        self.camera     = camera
+        self.camera_id  = camera['id']
+        self.gate       = make_gate(frame_step, service.motion_gate)
+
+    def _enqueue(self, item):
+        q = self.service.infer_queue
+        if not self.service.replay:
+            if put_latest(q, item):
+                self.service.count_drop(self.camera_id, 'infer')
+            return
+        while not self.service.stopped.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                self.service._count(enqueued=1)
+                return
+            except queue.Full:
+                continue
+
+    def run(self):
+        tracker = self.service.trackers[self.camera_id]
+        for frame in iter_frames(self.camera, self.service.stopped,
+                                 self.service.replay, self.service.timer):
+            if not self.gate.should_infer(frame, tracker.is_active(ACTIVE_WITHIN)):
+                continue
+            self._enqueue((None, frame, self.camera_id, time.perf_counter()))
+
+
+# 解码进程通过共享数组回报的计数，每路摄像头占一行
+STAT_FIELDS = ('decoded', 'gated', 'inferred', 'enqueued', 'dropped')
+
+
+def decode_process(camera: dict, row: int, ring_handle: dict, stats, motion, last_active,
+                   stopped, frame_step: int, motion_gate: bool, replay: bool):
+    """
+    解码子进程入口：与 CameraReader 相同的抽帧逻辑，但帧写入共享内存环形缓冲区。
+    轨迹活跃时间由主进程写入 last_active[row]，计数写入 stats 的第 row 行。
+    """
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    ring = FrameRing.attach(ring_handle)
+    gate = make_gate(frame_step, motion_gate)
+    base = row * len(STAT_FIELDS)
+    enqueued = dropped = 0
+    too_big  = False
+    try:
+        for frame in iter_frames(camera, stopped, replay):
+            active = time.time() - last_active[row] <= ACTIVE_WITHIN
+            if gate.should_infer(frame, active):
+                meta = (camera['id'], time.perf_counter())
+                if not ring.fits(frame):
+                    if not too_big:
+                        logger.error(f"Camera {camera['id']} frame {frame.shape} exceeds ring slot "
+                                     f"{ring.shape}, raise FRAME_SLOT_WIDTH/HEIGHT")
+                        too_big = True
+                    dropped += 1
+                elif replay:
+                    while not ring.write(frame, meta, block=True):
+                        if stopped.is_set():
+                            break
+                    else:
+                        enqueued += 1
+                # 归还的槽位经队列 feeder 线程回传有少许延迟，短暂等待以免误丢帧
+                elif ring.write(frame, meta, block=True, timeout=0.01):
+                    enqueued += 1
+                else:
+                    dropped += 1
+            stats[base:base + len(STAT_FIELDS)] = [gate.decoded, gate.gated, gate.inferred,
+                                                   enqueued, dropped]
+            motion[row] = gate.last_score
+    finally:
+        ring.close()
+
+
+class StreamingService:
+    """
+    多摄像头流水线：
+      每路摄像头一个解码线程 → 有界推理队列 → 共享推理线程池
+      → 有界上报队列 → OCR/上报线程
+    任一阶段处理不过来时丢弃最旧的帧，而不是无限堆积（回放模式除外）。
+
+    decode_processes=True 时每路摄像头改为一个解码进程，帧经共享内存环形缓冲区
+    （FrameRing）传给本进程的推理线程池，只有槽位号经过队列；环满时在解码端丢帧。
+    模型仍只在本进程加载一次。
+    """
+
+    def __init__(self, cameras, backends, frame_step: int=5,
+                 confidence: float=0.25, iou_threshold: float=0.4,
+                 infer_workers: int=INFER_WORKERS,
+                 batch_size: int=INFER_BATCH_SIZE,
+                 max_wait_ms: float=INFER_MAX_WAIT_MS,
+                 infer_queue_size: int=INFER_QUEUE_SIZE,
+                 report_queue_size: int=REPORT_QUEUE_SIZE,
+                 motion_gate: bool=True, replay: bool=False,
+                 decode_processes: bool=DECODE_PROCESSES):
+        self.cameras       = cameras
+        self.backends      = backends
+        self.frame_step    = frame_step
+        self.confidence    = confidence
+        self.iou_threshold = iou_threshold
+        self.infer_workers = infer_workers
+        self.batch_size    = batch_size
+        self.max_wait      = max_wait_ms / 1000
+        self.motion_gate   = motion_gate
+        self.replay        = replay
+        self.decode_processes = decode_processes
+        self.batch_stats   = BatchStats()
+        self.timer         = StageTimer()
+        self.report_queue  = queue.Queue(maxsize=report_queue_size)
+        self.dropped       = {}
+        self._drop_lock    = threading.Lock()
+        self.frames_in     = 0
+        self.frames_done   = 0
+        self._count_lock   = threading.Lock()
+        self.trackers      = {c['id']: PlateTracker(max_age=TRACK_MAX_AGE,
+                                                    dwell_window=REPORT_DWELL_SECS)
+                              for c in cameras}
+        # 标定矩阵只在启动时加载一次
+        self.camera_zones  = {c['id']: CameraZones(CameraCalibration.from_camera(c))
+                              for c in cameras}
+        if decode_processes:
+            self._init_processes(cameras, frame_step)
+        else:
+            self.ring        = None
+            self.stopped     = threading.Event()
+            self.infer_queue = queue.Queue(maxsize=infer_queue_size)
+            self.readers = [CameraReader(self, c, frame_step) for c in cameras]
+        self.threads = [threading.Thread(target=self._infer_loop, name=f"infer-{i}", daemon=True)
+                        for i in range(infer_workers)]
+        self.threads.append(threading.Thread(target=self._report_loop, name="report", daemon=True))
+
+    def _init_processes(self, cameras, frame_step: int):
+        # spawn：子进程不继承本进程的线程与模型，只重新导入解码所需的模块
+        mp = multiprocessing.get_context('spawn')
+        self.ring = FrameRing(RING_SLOTS_PER_CAMERA * len(cameras),
+                              height=FRAME_SLOT_HEIGHT, width=FRAME_SLOT_WIDTH, ctx=mp)
+        self.infer_queue  = self.ring
+        self.stopped      = mp.Event()
+        self._rows        = {c['id']: i for i, c in enumerate(cameras)}
+        self._stats       = mp.Array('q', len(cameras) * len(STAT_FIELDS), lock=False)
+        self._motion      = mp.Array('d', len(cameras), lock=False)
+        self._last_active = mp.Array('d', [float('-inf')] * len(cameras), lock=False)
+        self.readers = [
+            mp.Process(target=decode_process, name=f"decode-{c['id']}", daemon=True,
+                       args=(c, i, self.ring.handle(), self._stats, self._motion,
+                             self._last_active, self.stopped, frame_step,
+                             self.motion_gate, self.replay))
+            for i, c in enumerate(cameras)
+        ]
+
+    def count_drop(self, camera_id: int, stage: str):
+        with self._drop_lock:
+            key = (camera_id, stage)
+            self.dropped[key] = self.dropped.get(key, 0) + 1
+
+    def _count(self, enqueued: int=0, done: int=0):
+        with self._count_lock:
+            self.frames_in   += enqueued
+            self.frames_done += done
+
+    def _process_stats(self, camera_id: int) -> dict:
+        base = self._rows[camera_id] * len(STAT_FIELDS)
+        return dict(zip(STAT_FIELDS, self._stats[base:base + len(STAT_FIELDS)]))
+
+    def drop_counts(self) -> dict:
+        """{(camera_id, stage): 丢帧数}，含解码进程在环满时丢弃的帧。"""
+        with self._drop_lock:
+            dropped = dict(self.dropped)
+        if self.ring is not None:
+            for camera_id in self._rows:
+                n = self._process_stats(camera_id)['dropped']
+                if n:
+                    dropped[(camera_id, 'infer')] = dropped.get((camera_id, 'infer'), 0) + n
+        return dropped
+
+    def gate_stats(self) -> dict:
+        """各摄像头的解码 / 门控跳过 / 推理帧数。"""
+        if self.ring is None:
+            return {r.camera_id: r.gate.stats() for r in self.readers}
+        out = {}
+        for camera_id, row in self._rows.items():
+            st = self._process_stats(camera_id)
+            out[camera_id] = {"decoded": st['decoded'], "gated": st['gated'],
+                              "inferred": st['inferred'], "motion": round(self._motion[row], 4)}
+        return out
+
+    def queue_depths(self) -> dict:
+        """当前排队帧数；多进程模式下 infer 为环中待推理的帧数，ring_free 为空闲槽位数。"""
+        depths = {"report": self.report_queue.qsize()}
+        try:
+            if self.ring is None:
+                depths["infer"] = self.infer_queue.qsize()
+            else:
+                depths["infer"]     = self.ring.ready.qsize()
+                depths["ring_free"] = self.ring.free.qsize()
+        except NotImplementedError:
+            # macOS 的 multiprocessing.Queue 不支持 qsize()
+            pass
+        return depths
+
+    def _infer_loop(self):
+        """攒批推理：一次 model.infer 处理多路摄像头的帧，再按帧拆回各自的预测。"""
+        while not self.stopped.is_set():
+            batch = collect_batch(self.infer_queue, self.batch_size, self.max_wait)
+            if batch:
+                try:
+                    self._infer_batch(batch)
+                finally:
+                    if self.ring is not None:
+                        for slot, _, _, _ in batch:
+                            self.ring.release(slot)
+
+    def _infer_batch(self, batch):
+        """batch 为 [(slot, frame, camera_id, t_in), …]；slot 非 None 时 frame 是共享内存视图。"""
+        t0 = time.perf_counter()
+        frames = [frame for _, frame, _, _ in batch]
+        try:
+            results = self.backends.model.infer(frames, confidence=self.confidence,
+                                                iou_threshold=self.iou_threshold)
+        except Exception:
+            logger.exception(f"Inference failed on batch of {len(batch)}")
+            self._count(done=len(batch))
+            return
+        elapsed = time.perf_counter() - t0
+        self.batch_stats.record([t0 - t_in for _, _, _, t_in in batch], elapsed)
+        self.timer.record('infer_batch', elapsed)
+        for _, _, camera_id, t_in in batch:
+            self.timer.record('queue_wait', t0 - t_in, camera_id)
+            self.timer.observe('infer', elapsed, camera_id)
+        for (slot, frame, camera_id, t_in), res in zip(batch, results):
+            preds = getattr(res, 'predictions', []) or []
+            if not preds:
+                self.timer.record('end_to_end', time.perf_counter() - t_in, camera_id)
+                self._count(done=1)
+                continue
+            if slot is not None:
+                # 槽位在本批结束后归还，只有需要 OCR/取证的帧才拷出共享内存
+                frame = frame.copy()
+            item = (camera_id, frame, preds, t_in)
+            if self.replay:
+                self.report_queue.put(item)
+            elif put_latest(self.report_queue, item):
+                self.count_drop(camera_id, 'report')
+
+    def _publish_activity(self, camera_ids):
+        """把轨迹活跃时间同步给解码进程的运动门控。"""
+        for camera_id in camera_ids:
+            self._last_active[self._rows[camera_id]] = self.trackers[camera_id].last_active
+
+    def _report_loop(self):
+        while not self.stopped.is_set():
+            batch = collect_batch(self.report_queue, OCR_BATCH_SIZE, OCR_MAX_WAIT_MS / 1000)
+            if not batch:
+                continue
+            t0 = time.perf_counter()
+            try:
+                handle_detections([(c, f, p) for c, f, p, _ in batch],
+                                  self.trackers, self.backends, self.timer,
+                                  self.camera_zones)
+                if self.ring is not None:
+                    self._publish_activity({c for c, _, _, _ in batch})
+            except Exception:
+                logger.exception("Report stage failed")
+            finally:
+                done = time.perf_counter()
+                self.timer.record('report_batch', done - t0)
+                for camera_id, _, _, t_in in batch:
+                    self.timer.record('end_to_end', done - t_in, camera_id)
+                self._count(done=len(batch))
+
+    def start(self):
+        for r in self.readers:
+            r.start()
+        for t in self.threads:
+            t.start()
+        logger.info(f"Streaming service started: {len(self.cameras)} cameras "
+                    f"({'processes' if self.ring is not None else 'threads'}), "
+                    f"{self.infer_workers} inference workers")
+
+    def _frames_in(self) -> int:
+        if self.ring is None:
+            with self._count_lock:
+                return self.frames_in
+        return sum(self._process_stats(c)['enqueued'] for c in self._rows)
+
+    def wait_replay(self, poll: float=0.01):
+        """回放模式：等所有解码线程/进程读完，且已入队的帧全部走完推理/上报。"""
+        for r in self.readers:
+            r.join()
+        frames_in = self._frames_in()
+        while True:
+            with self._count_lock:
+                if self.frames_done >= frames_in:
+                    return
+            time.sleep(poll)
+
+    def stop(self, timeout: float=5):
+        self.stopped.set()
+        for r in self.readers:
+            r.join(timeout)
+            if self.ring is not None and r.is_alive():
+                r.terminate()
+        for t in self.threads:
+            t.join(timeout)
+        if self.ring is not None:
+            self.ring.close()
+        dropped = self.drop_counts()
+        if dropped:
+            logger.info(f"Dropped frames: {dropped}")
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+轻量级 IoU / 质心多目标跟踪，用于违停上报去重
+
+  - 每个检测框分配稳定的 track_id（跨帧贪心匹配：IoU 优先，质心距离兜底）
+  - 仅在轨迹新建或出现更高置信度的车牌框时才需要重新 OCR
+  - 同一 (track, zone) 在 dwell 窗口内最多上报一次
+"""
+import itertools
+import time
+
+
+def iou(a, b) -> float:
+    """两个 (x1, y1, x2, y2) 框的交并比。"""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def centroid(box):
+    return (box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0
+
+
+class Track:
+    """一条跟踪轨迹：当前框、最近出现时间、已识别车牌及各禁停区的上次上报时间。"""
+
+    __slots__ = ('id', 'box', 'first_seen', 'last_seen', 'hits',
+                 'plate', 'ocr_conf', 'reported')
+
+    def __init__(self, track_id: int, box, now: float):
+        self.id         = track_id
+        self.box        = box
+        self.first_seen = now
+        self.last_seen  = now
+        self.hits       = 1
+        self.plate      = ''
+        self.ocr_conf   = 0.0
+        self.reported   = {}    # zone_id -> 上次上报时间
+
+    def needs_ocr(self, confidence: float) -> bool:
+        """新轨迹，或本帧框的置信度高于上次 OCR 所用框时才值得再识别。"""
+        return not self.plate or confidence > self.ocr_conf
+
+    def set_plate(self, plate: str, confidence: float):
+        self.plate    = plate
+        self.ocr_conf = confidence
+
+
+class PlateTracker:
+    """
+    单路摄像头的跟踪器。
+
+    参数:
+        iou_threshold (float): 判为同一目标的最小 IoU
+        max_distance (float): IoU 不足时，质心距离（像素）小于该值也视为同一目标
+        max_age (float): 轨迹超过该秒数未出现则丢弃
+        dwell_window (float): 同一 (track, zone) 两次上报的最短间隔（秒）
+    """
+
+    def __init__(self, iou_threshold: float=0.3, max_distance: float=50.0,
+                 max_age: float=10.0, dwell_window: float=600.0):
+        self.iou_threshold = iou_threshold
+        self.max_distance  = max_distance
+        self.max_age       = max_age
+        self.dwell_window  = dwell_window
+        self.tracks = {}
+        self.last_active = float('-inf')
+        self._ids   = itertools.count(1)
+
+    def update(self, boxes, now: float=None):
+        """
+        用本帧检测框更新轨迹，返回与 boxes 一一对应的 Track 列表。
+        匹配按 (IoU 降序, 质心距离升序) 贪心进行，每条轨迹最多匹配一个框。
+        """
+        now = time.time() if now is None else now
+        for tid in [t.id for t in self.tracks.values() if now - t.last_seen > self.max_age]:
+            del self.tracks[tid]
+
+        candidates = []
+        for i, box in enumerate(boxes):
+            cx, cy = centroid(box)
+            for t in self.tracks.values():
+                overlap = iou(box, t.box)
+                tx, ty = centroid(t.box)
+                dist = ((cx - tx) ** 2 + (cy - ty) ** 2) ** 0.5
+                if overlap >= self.iou_threshold or dist <= self.max_distance:
+                    candidates.append((-overlap, dist, i, t.id))
+        candidates.sort()
+
+        assigned = [None] * len(boxes)
+        used = set()
+        for _, _, i, tid in candidates:
+            if assigned[i] is not None or tid in used:
+                continue
+            t = self.tracks[tid]
+            t.box, t.last_seen = boxes[i], now
+            t.hits += 1
+            assigned[i] = t
+            used.add(tid)
+
+        for i, box in enumerate(boxes):
+            if assigned[i] is None:
+                t = Track(next(self._ids), box, now)
+                self.tracks[t.id] = t
+                assigned[i] = t
+                self.last_active = now
+        return assigned
+
+    def is_active(self, within: float=5.0, now: float=None) -> bool:
+        """
+        最近 within 秒内是否出现过新轨迹（供抽帧器判断是否提高采样率）。
+        已稳定跟踪的静止车辆不算活跃，避免停满车的画面一直高频推理。
+        """
+        now = time.time() if now is None else now
+        return now - self.last_active <= within
+
+    def should_report(self, track: Track, zone_id, now: float=None) -> bool:
+        """该轨迹在该禁停区的上次上报是否已超出 dwell 窗口。"""
+        now = time.time() if now is None else now
+        last = track.reported.get(zone_id)
+        return last is None or now - last >= self.dwell_window
+
+    def mark_reported(self, track: Track, zone_id, now: float=None):
+        track.reported[zone_id] = time.time() if now is None else now
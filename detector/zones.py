@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+禁停区空间索引
+
+将 /api/zones 返回的多边形装入 STR-tree，每个多边形预先 prepare，
+对检测点先用包围盒在树上筛出候选区，再做精确的点在多边形内判定，
+查找复杂度从逐个多边形扫描的 O(n) 降为 O(log n + k)。
+
+ZoneRefresher 在后台用 ETag / If-None-Match 轮询 /api/zones，
+有变化时重建索引并整体替换引用，推理线程读取时无需加锁。
+
+禁停区以经纬度保存；CameraZones 按每路摄像头的标定把多边形预先投影到像素空间，
+检测点无需逐个换算即可直接在像素坐标上判定。
+"""
+import logging
+import threading
+
+import numpy as np
+import requests
+import shapely
+from shapely.geometry import Point, Polygon
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+
+logger = logging.getLogger(__name__)
+
+
+class ZoneIndex:
+    """不可变的禁停区索引；区域变化时整体重建后替换引用即可。"""
+
+    def __init__(self, polygons: dict):
+        self.polygons = dict(polygons)
+        self._ids     = list(self.polygons.keys())
+        self._geoms   = [self.polygons[i] for i in self._ids]
+        self._prepared = [prep(g) for g in self._geoms]
+        self._tree    = STRtree(self._geoms) if self._geoms else None
+
+    @classmethod
+    def from_zones(cls, zones):
+        """由 [{ id, path: [[x, y], ...] }, …] 构建索引，跳过顶点不足的区域。"""
+        return cls({z['id']: Polygon(z['path']) for z in zones if len(z.get('path') or []) >= 3})
+
+    def __len__(self):
+        return len(self._ids)
+
+    def candidates(self, x: float, y: float):
+        """包围盒命中的候选区下标（尚未做精确判定）。"""
+        if self._tree is None:
+            return []
+        return self._tree.query(Point(x, y))
+
+    def find_all(self, x: float, y: float):
+        """返回包含点 (x, y) 的全部禁停区 id。"""
+        pt = Point(x, y)
+        return [self._ids[i] for i in self.candidates(x, y) if self._prepared[i].contains(pt)]
+
+    def find(self, x: float, y: float):
+        """返回包含点 (x, y) 的任一禁停区 id，没有则返回 None。"""
+        pt = Point(x, y)
+        for i in self.candidates(x, y):
+            if self._prepared[i].contains(pt):
+                return self._ids[i]
+        return None
+
+    def find_many(self, points):
+        """
+        批量判定：points 为 (N, 2) 数组，返回长度 N 的禁停区 id 列表（不在任何区内为 None）。
+        一次 STR-tree 查询完成，点落在多个区内时取最先加入索引的那个。
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        result = [None] * len(points)
+        if self._tree is None or not len(points):
+            return result
+        valid = np.flatnonzero(~np.isnan(points).any(axis=1))
+        if not len(valid):
+            return result
+        hits = self._tree.query(shapely.points(points[valid]), predicate='within')
+        for i, j in sorted(zip(hits[0].tolist(), hits[1].tolist()), reverse=True):
+            result[valid[i]] = self._ids[j]
+        return result
+
+
+class CameraZones:
+    """
+    单路摄像头视角下的禁停区。
+
+    已标定的摄像头：把地理坐标索引中的多边形用 H⁻¹ 投影到像素空间另建一份索引，
+    地理索引被 ZoneRefresher 替换后首次查询时重建；跨越地平线、无法整体投影的多边形
+    留在地理空间，只对像素索引未命中的点做一次向量化换算后再判定。
+    未标定的摄像头沿用旧行为，直接把像素坐标当作区域坐标。
+    """
+
+    def __init__(self, calibration=None):
+        self.calibration = calibration
+        self._state = (None, ZoneIndex({}), ZoneIndex({}))
+
+    def _project(self, geo_index: ZoneIndex):
+        state = self._state
+        if state[0] is geo_index:
+            return state
+        pixel, unprojectable = {}, {}
+        for zone_id, poly in geo_index.polygons.items():
+            pts = self.calibration.geo_to_pixel(np.asarray(poly.exterior.coords))
+            projected = None if np.isnan(pts).any() else Polygon(pts)
+            if projected is not None and projected.is_valid:
+                pixel[zone_id] = projected
+            else:
+                unprojectable[zone_id] = poly
+        state = (geo_index, ZoneIndex(pixel), ZoneIndex(unprojectable))
+        self._state = state
+        if unprojectable:
+            logger.info(f"{len(unprojectable)} zones cross the horizon, tested in geo space")
+        return state
+
+    def find_many(self, geo_index: ZoneIndex, pixel_points):
+        """pixel_points 为 (N, 2) 像素坐标，返回各点所在禁停区 id（或 None）。"""
+        if self.calibration is None:
+            return geo_index.find_many(pixel_points)
+        pixel_points = np.asarray(pixel_points, dtype=np.float64).reshape(-1, 2)
+        _, pixel_index, geo_rest = self._project(geo_index)
+        ids = pixel_index.find_many(pixel_points)
+        if len(geo_rest):
+            missing = [i for i, z in enumerate(ids) if z is None]
+            if missing:
+                geo = self.calibration.pixel_to_geo(pixel_points[missing])
+                for i, zone_id in zip(missing, geo_rest.find_many(geo)):
+                    ids[i] = zone_id
+        return ids
+
+
+class ZoneRefresher:
+    """
+    后台轮询 /api/zones 并热更新 ZoneIndex。
+
+    - 带 If-None-Match 发送条件请求，未变化时服务端返回 304，不重建索引
+    - 拉取失败时保留上一份索引，下个周期重试
+    - 新索引构建完成后一次性替换 self.index（引用赋值是原子的）
+    """
+
+    def __init__(self, url: str, interval: float=30.0, timeout: float=5.0):
+        self.url      = url
+        self.interval = interval
+        self.timeout  = timeout
+        self.index    = ZoneIndex({})
+        self.etag     = None
+        self._session = requests.Session()
+        self._stopped = threading.Event()
+        self._thread  = None
+
+    def refresh(self) -> bool:
+        """拉取一次；索引被替换时返回 True。"""
+        headers = {'If-None-Match': self.etag} if self.etag else {}
+        r = self._session.get(self.url, headers=headers, timeout=self.timeout)
+        if r.status_code == 304:
+            return False
+        r.raise_for_status()
+        index = ZoneIndex.from_zones(r.json())
+        self.index = index
+        self.etag  = r.headers.get('ETag')
+        logger.info(f"Loaded {len(index)} zones from {self.url}")
+        return True
+
+    def _loop(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.warning(f"Zone refresh from {self.url} failed, keeping {len(self.index)} zones",
+                               exc_info=True)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="zone-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(self.timeout)
+            self._thread = None
@@ -26,4 +26,9 @@ export const deletePile = (id) =>
   api.delete(`/charging-piles/${id}`)
 
 // ---- 充电日志 ----
-export const fetchChargingLogs = () => api.get('/charging-logs') // 自行实现后端路由
+// params: { limit, cursor, user_id, pile_id, location_id, from, to }；下一页游标在响应头 x-next-cursor
+export const fetchChargingLogs = (params = {}) => api.get('/charging-logs', { params })
+
+// 导出链接（format: 'csv' | 'ndjson'），直接用于 <a href> 下载
+export const chargingLogsExportUrl = (params = {}) =>
+  `${api.defaults.baseURL}/charging-logs/export?${new URLSearchParams(params)}`
@@ -0,0 +1,131 @@
+# tests/bench_availability.py
+"""
+充电桩时段可用性基准：500 个桩 × 7 天的预约
+
+对比原 get_pile_slots 的「每个格子 × 当天每个会话」双重循环
+与 AvailabilityEngine（单桩单天扫描 / 多桩多天一次扫描），并校验结果一致。
+纯 Python，不需要数据库：
+    python tests/bench_availability.py [--piles 500] [--days 7] [--per-day 12]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'utils'))
+
+from availability import AvailabilityEngine, SLOTS_PER_DAY, SLOT_MINUTES
+
+
+def make_sessions(piles: int, days: int, per_day: int, start: date, seed: int=42):
+    """每桩每天 per_day 个互不重叠的 20~120 分钟预约，部分跨午夜。"""
+    rng = random.Random(seed)
+    sessions, next_id = [], 1
+    for pile_id in range(1, piles + 1):
+        for d in range(days):
+            day = start + timedelta(days=d)
+            cursor = datetime.combine(day, datetime.min.time())
+            day_end = cursor + timedelta(days=1)
+            for _ in range(per_day):
+                cursor += timedelta(minutes=SLOT_MINUTES * rng.randint(0, 3))
+                end = cursor + timedelta(minutes=SLOT_MINUTES * rng.randint(1, 6))
+                if cursor >= day_end:
+                    break
+                sessions.append(SimpleNamespace(
+                    id=next_id, pile_id=pile_id, user_id=rng.randint(1, 2000),
+                    status=rng.choice(['reserved', 'reserved', 'ongoing']),
+                    reserved_date=cursor.date(),
+                    reserved_start_time=cursor.time(),
+                    reserved_end_time=end.time(),
+                    slot_time=cursor,
+                ))
+                next_id += 1
+                cursor = end
+    return sessions
+
+
+def naive_grid(sessions, day_start, now, user_id):
+    """原 get_pile_slots 的算法（sessions 已按桩、按天过滤）。"""
+    result = []
+    for i in range(SLOTS_PER_DAY):
+        slot_dt = day_start + timedelta(minutes=SLOT_MINUTES * i)
+        if slot_dt <= now:
+            continue
+        st, owner, sid = 'free', None, None
+        for sess in sessions:
+            start_dt = datetime.combine(sess.reserved_date, sess.reserved_start_time)
+            if sess.reserved_end_time <= sess.reserved_start_time:
+                end_dt = datetime.combine(sess.reserved_date + timedelta(days=1), sess.reserved_end_time)
+            else:
+                end_dt = datetime.combine(sess.reserved_date, sess.reserved_end_time)
+            if start_dt <= slot_dt < end_dt:
+                if sess.status == 'reserved':
+                    st = 'mine' if (user_id and sess.user_id == user_id) else 'reserved'
+                else:
+                    st = 'occupied'
+                owner, sid = sess.user_id, sess.id
+                break
+        result.append({'slot': slot_dt.strftime('%H:%M'), 'status': st,
+                       'session_id': sid, 'session_user_id': owner})
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--piles', type=int, default=500)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--per-day', type=int, default=12)
+    args = parser.parse_args(argv)
+
+    start = date(2026, 1, 5)
+    days = [start + timedelta(days=d) for d in range(args.days)]
+    now = datetime.combine(start, datetime.min.time())
+    sessions = make_sessions(args.piles, args.days, args.per_day, start)
+    print(f"{args.piles} piles x {args.days} days, {len(sessions)} sessions, "
+          f"{args.piles * args.days * SLOTS_PER_DAY} slots")
+
+    # 原实现：每个 (桩, 天) 一次请求，请求内按天过滤会话（跨午夜的前一天会话会漏掉，这里照搬）
+    by_pile_day = {}
+    for s in sessions:
+        by_pile_day.setdefault((s.pile_id, s.reserved_date), []).append(s)
+    t0 = time.perf_counter()
+    naive = {(p, d): naive_grid(by_pile_day.get((p, d), []),
+                                datetime.combine(d, datetime.min.time()), now, 7)
+             for p in range(1, args.piles + 1) for d in days}
+    t_naive = time.perf_counter() - t0
+
+    # 引擎：每个 (桩, 天) 单独构建 + 扫描（对应新的 /slots 接口，含前一天的会话）
+    t0 = time.perf_counter()
+    per_request = {}
+    for p in range(1, args.piles + 1):
+        for d in days:
+            rows = by_pile_day.get((p, d), []) + by_pile_day.get((p, d - timedelta(days=1)), [])
+            per_request[(p, d)] = AvailabilityEngine(rows).slot_grid(
+                p, datetime.combine(d, datetime.min.time()), now, 7)
+    t_engine = time.perf_counter() - t0
+
+    # 引擎：全部桩、全部天一次装载、每桩一次扫描
+    t0 = time.perf_counter()
+    grids = AvailabilityEngine(sessions).grids(range(1, args.piles + 1), days, now, 7)
+    t_bulk = time.perf_counter() - t0
+
+    mismatches = 0
+    for (p, d), rows in per_request.items():
+        assert rows == grids[p][d.isoformat()]
+        if d != start:
+            # 第一天之外，原实现漏掉了前一天跨午夜的会话，统计差异格子数
+            mismatches += sum(a != b for a, b in zip(naive[(p, d)], rows))
+        else:
+            assert naive[(p, d)] == rows
+
+    print(f"naive nested loop : {t_naive * 1000:9.1f} ms")
+    print(f"engine per request: {t_engine * 1000:9.1f} ms  ({t_naive / t_engine:.1f}x)")
+    print(f"engine bulk       : {t_bulk * 1000:9.1f} ms  ({t_naive / t_bulk:.1f}x)")
+    print(f"slots where the naive version missed a cross-midnight booking: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -91,3 +91,64 @@ def inactive_user(test_db):
         test_db.session.commit()
 
     return user
+
+
+# —— 充电相关测试共用 ——
+
+@pytest.fixture
+def charging_app(tmp_path, monkeypatch):
+    """文件 SQLite 上的应用：一个充电区、3 个桩（id 1~3）、2 个用户及其车辆（id 1~2）"""
+    from app.config import TestingConfig
+    from app.models.charging import ChargingPile
+    from app.models.location import CampusLocation
+    from app.models.vehicles import ElectricVehicle
+
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'charging.db'}")
+    app = create_app(config_name='testing')
+    with app.app_context():
+        db.create_all()
+        loc = CampusLocation(name='A', latitude=30.0, longitude=120.0,
+                             location_type='charging', path=[[120.0, 30.0]])
+        db.session.add(loc)
+        db.session.flush()
+        for i in range(3):
+            db.session.add(ChargingPile(location_id=loc.id, name=f'p{i + 1}', connector='GB',
+                                        power_kw=7.0, fee_rate=1.2))
+        for i in range(2):
+            user = User(school_id=f'2097{i:05d}', phone=f'1397000{i:04d}', role='student',
+                        password_hash='x', name=f'u{i}')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(ElectricVehicle(owner_id=user.id, brand='b', plate_number=f'C{i:05d}'))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def add_session(charging_app):
+    """直接写入一条充电会话：add_session(pile_id, start, end, status=..., created_at=..., **其他列)"""
+    from app.models.charging import ChargingSession, ChargingSessionStatus
+
+    def add(pile_id, start, end, status=ChargingSessionStatus.reserved, user_id=1, **extra):
+        with charging_app.app_context():
+            sess = ChargingSession(user_id=user_id, vehicle_id=user_id, pile_id=pile_id,
+                                   slot_time=start, reserved_date=start.date(),
+                                   reserved_start_time=start.time(), reserved_end_time=end.time(),
+                                   start_ts=start, end_ts=end, status=status, **extra)
+            db.session.add(sess)
+            db.session.commit()
+            return sess.id
+    return add
+
+
+@pytest.fixture
+def fake_redis(charging_app):
+    """用 fakeredis 替换 redis_client（未安装时跳过）"""
+    fakeredis = pytest.importorskip('fakeredis')
+    from app.extensions import redis_client
+    real = redis_client._redis_client
+    redis_client._redis_client = fakeredis.FakeRedis()
+    yield redis_client
+    redis_client._redis_client = real
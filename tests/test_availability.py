@@ -0,0 +1,113 @@
+# tests/test_availability.py
+"""
+时段可用性引擎：扫描线 / 二分查找 / 空闲区间与逐个格子的暴力检查一致
+"""
+import random
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+
+from app.utils.availability import SLOT_MINUTES, AvailabilityEngine, PileSchedule, session_interval
+
+DAY = date(2026, 3, 2)
+
+
+def _random_sessions(rng, n, pile_ids=(1, 2, 3)):
+    base = datetime.combine(DAY, time()) - timedelta(hours=6)
+    sessions = []
+    for i in range(n):
+        start = base + timedelta(minutes=10 * rng.randrange(0, 6 * 48))
+        end = start + timedelta(minutes=10 * rng.randrange(1, 18))
+        sessions.append(SimpleNamespace(id=i + 1, pile_id=rng.choice(pile_ids), user_id=rng.choice((1, 2)),
+                                        status=rng.choice(('reserved', 'ongoing')),
+                                        start_ts=start, end_ts=end))
+    return sessions
+
+
+def _covering(sessions, pile_id, t):
+    return [s for s in sessions if s.pile_id == pile_id and s.start_ts <= t < s.end_ts]
+
+
+def test_slot_grid_matches_brute_force():
+    rng = random.Random(7)
+    for _ in range(20):
+        sessions = _random_sessions(rng, 40)
+        engine = AvailabilityEngine(sessions)
+        by_id = {s.id: s for s in sessions}
+        grids = engine.grids([1, 2, 3], [DAY, DAY + timedelta(days=1)])
+        for pile_id in (1, 2, 3):
+            for day in (DAY, DAY + timedelta(days=1)):
+                rows = grids[pile_id][day.isoformat()]
+                day_start = datetime.combine(day, time())
+                assert len(rows) == 24 * 60 // SLOT_MINUTES
+                for k, row in enumerate(rows):
+                    t = day_start + timedelta(minutes=SLOT_MINUTES * k)
+                    covering = _covering(sessions, pile_id, t)
+                    if not covering:
+                        assert row['status'] == 'free'
+                        assert engine.schedule(pile_id).find(t) is None
+                    else:
+                        assert by_id[row['session_id']] in covering
+                        assert engine.schedule(pile_id).find(t) in covering
+
+
+def test_free_windows_match_brute_force():
+    rng = random.Random(11)
+    for _ in range(20):
+        sessions = _random_sessions(rng, 30, pile_ids=(1,))
+        schedule = AvailabilityEngine(sessions).schedule(1)
+        start = datetime.combine(DAY, time(6))
+        end = start + timedelta(hours=12)
+        windows = schedule.free_windows(start, end)
+        t = start
+        while t < end:
+            free = not _covering(sessions, 1, t)
+            assert free == any(s <= t < e for s, e in windows)
+            t += timedelta(minutes=10)
+        assert all(s < e for s, e in windows)
+
+
+class CountingList(list):
+    reads = 0
+
+    def __getitem__(self, i):
+        CountingList.reads += 1
+        return super().__getitem__(i)
+
+
+def _fully_booked(days):
+    """连续 days 天每个格子都被订满，另有一条覆盖全部天数的长会话（如检修占用）。"""
+    first = datetime.combine(DAY, time())
+    sessions = [SimpleNamespace(id=0, pile_id=1, user_id=1, status='ongoing',
+                                start_ts=first, end_ts=first + timedelta(days=days))]
+    step = timedelta(minutes=SLOT_MINUTES)
+    for k in range(days * 24 * 60 // SLOT_MINUTES):
+        sessions.append(SimpleNamespace(id=k + 1, pile_id=1, user_id=2, status='reserved',
+                                        start_ts=first + step * k, end_ts=first + step * (k + 1)))
+    return sessions
+
+
+def test_free_windows_on_fully_booked_days_do_not_rescan_history():
+    """订满的日子里查询只读取二分位置与窗口内的区间，不会因为一条长会话回退扫描全部历史"""
+    days = 30
+    schedule = AvailabilityEngine(_fully_booked(days)).schedule(1)
+    last_day = datetime.combine(DAY + timedelta(days=days - 1), time())
+    counted = PileSchedule([])
+    counted.starts, counted.ends, counted.max_end = (
+        CountingList(schedule.starts), CountingList(schedule.ends), CountingList(schedule.max_end))
+
+    CountingList.reads = 0
+    assert counted.free_windows(last_day + timedelta(hours=10), last_day + timedelta(hours=11)) == []
+    # 二分约 2 × log2(2161) 次读取，加上窗口内 3 个区间
+    assert CountingList.reads < 60
+
+    month_end = datetime.combine(DAY + timedelta(days=days), time())
+    assert schedule.free_windows(last_day + timedelta(hours=23), month_end + timedelta(hours=2)) == \
+        [(month_end, month_end + timedelta(hours=2))]
+    assert schedule.occupancy([last_day + timedelta(hours=10)])[0].id == 0
+
+
+def test_session_interval_wraps_past_midnight():
+    sess = SimpleNamespace(start_ts=None, reserved_date=DAY,
+                           reserved_start_time=time(23, 0), reserved_end_time=time(1, 0))
+    assert session_interval(sess) == (datetime.combine(DAY, time(23)),
+                                      datetime.combine(DAY + timedelta(days=1), time(1)))
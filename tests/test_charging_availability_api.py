@@ -0,0 +1,55 @@
+# tests/test_charging_availability_api.py
+"""
+全校充电可用性接口：空闲区间计算与按分钟的 Redis 缓存
+"""
+import time as clock
+from datetime import date, datetime, time, timedelta
+
+from app.models.charging import ChargingSessionStatus
+
+
+def _day():
+    return date.today() + timedelta(days=2)
+
+
+def _piles(body):
+    return {p['id']: p for area in body['areas'] for p in area['piles']}
+
+
+def test_availability_free_windows(charging_app, add_session):
+    day = _day()
+    at = lambda h: datetime.combine(day, time(h))
+    add_session(1, at(10), at(11))
+    add_session(1, at(20), at(22), status=ChargingSessionStatus.cancelled)
+    add_session(2, at(9), at(12), status=ChargingSessionStatus.ongoing)
+
+    resp = charging_app.test_client().get(f'/api/charging/availability?date={day}&from=08:00&to=21:00')
+    assert resp.status_code == 200
+    piles = _piles(resp.get_json())
+    assert [(w['start'], w['end']) for w in piles[1]['free_windows']] == [
+        (at(8).isoformat(), at(10).isoformat()), (at(11).isoformat(), at(21).isoformat())]
+    assert piles[1]['free_minutes'] == 12 * 60
+    assert piles[2]['free_minutes'] == 10 * 60
+    assert piles[3]['free_minutes'] == 13 * 60
+
+
+def test_availability_is_cached_within_the_minute(charging_app, add_session, fake_redis):
+    day = _day()
+    url = f'/api/charging/availability?date={day}'
+    client = charging_app.test_client()
+    # 缓存键带当前分钟，避免两次请求跨过分钟边界
+    if datetime.utcnow().second >= 55:
+        clock.sleep(60 - datetime.utcnow().second)
+    first = client.get(url).get_json()
+    assert fake_redis.keys('charging:availability:*')
+
+    add_session(3, datetime.combine(day, time(10)), datetime.combine(day, time(11)))
+    second = client.get(url).get_json()
+    assert second == first
+
+    fake_redis.flushall()
+    assert _piles(client.get(url).get_json())[3]['free_minutes'] == 23 * 60
+
+
+def test_availability_rejects_bad_window(charging_app):
+    assert charging_app.test_client().get('/api/charging/availability?date=2026-13-01').status_code == 400
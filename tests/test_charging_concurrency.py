@@ -0,0 +1,141 @@
+# tests/test_charging_concurrency.py
+"""
+充电桩状态转换并发压测：多线程同时预约同一个桩
+使用文件 SQLite（各线程独立连接）；SQLite 不支持 FOR UPDATE，这里验证的是版本号 CAS + 重试。
+"""
+import threading
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event, text
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models.charging import ChargingPile, ChargingSession, ChargingSessionStatus, ChargingPileStatus
+from app.models.location import CampusLocation
+from app.models.users import User
+from app.models.vehicles import ElectricVehicle
+
+THREADS = 16
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'charging.db'}")
+    app = create_app(config_name='testing')
+    with app.app_context():
+        db.create_all()
+        loc = CampusLocation(name='A', latitude=30.0, longitude=120.0,
+                             location_type='charging', path=[[120.0, 30.0]])
+        db.session.add(loc)
+        db.session.flush()
+        db.session.add(ChargingPile(location_id=loc.id, name='p1', connector='GB',
+                                    power_kw=7.0, fee_rate=1.2))
+        for i in range(THREADS):
+            user = User(school_id=f'2099{i:05d}', phone=f'1399000{i:04d}', role='student',
+                        password_hash='x', name=f'u{i}')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(ElectricVehicle(owner_id=user.id, brand='b', plate_number=f'T{i:05d}'))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def _hammer(app, bodies):
+    """每个线程用自己的客户端同时发出预约请求，返回状态码列表。"""
+    barrier = threading.Barrier(len(bodies))
+    codes = [None] * len(bodies)
+
+    def worker(i):
+        client = app.test_client()
+        barrier.wait()
+        codes[i] = client.post('/api/charging-sessions/reserve', json=bodies[i]).status_code
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(bodies))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return codes
+
+
+def _body(i, day, start, end):
+    return {'user_id': i + 1, 'vehicle_id': i + 1, 'pile_id': 1,
+            'date': day.isoformat(), 'start_time': start, 'end_time': end}
+
+
+def test_concurrent_bookings_of_same_slot_only_one_wins(app):
+    day = date.today() + timedelta(days=2)
+    codes = _hammer(app, [_body(i, day, '10:00', '11:00') for i in range(THREADS)])
+
+    assert codes.count(201) == 1
+    assert codes.count(400) == THREADS - 1
+    with app.app_context():
+        sessions = ChargingSession.query.filter_by(pile_id=1, status=ChargingSessionStatus.reserved).all()
+        assert len(sessions) == 1
+        assert db.session.get(ChargingPile, 1).status == ChargingPileStatus.reserved
+
+
+def test_concurrent_disjoint_bookings_all_win(app):
+    day = date.today() + timedelta(days=2)
+    bodies = [_body(i, day, f'{i:02d}:00', f'{i:02d}:30') for i in range(THREADS)]
+    codes = _hammer(app, bodies)
+
+    assert codes == [201] * THREADS
+    with app.app_context():
+        assert ChargingSession.query.filter_by(pile_id=1).count() == THREADS
+
+
+def test_cancel_keeps_pile_reserved_while_other_bookings_remain(app):
+    day = date.today() + timedelta(days=2)
+    client = app.test_client()
+    first  = client.post('/api/charging-sessions/reserve', json=_body(0, day, '08:00', '09:00')).get_json()
+    client.post('/api/charging-sessions/reserve', json=_body(1, day, '09:00', '10:00'))
+
+    assert client.post(f"/api/charging-sessions/{first['session_id']}/cancel").status_code == 200
+    assert client.post(f"/api/charging-sessions/{first['session_id']}/cancel").status_code == 400
+    with app.app_context():
+        assert db.session.get(ChargingPile, 1).status == ChargingPileStatus.reserved
+
+
+def _bump_version_before_flush(times):
+    """每次 flush 前（最多 times 次）用另一个连接把桩 1 的 version 加一，模拟并发的状态转换。"""
+    left = [times]
+
+    def bump(session, flush_context, instances):
+        if left[0]:
+            left[0] -= 1
+            with db.engine.begin() as conn:
+                conn.execute(text("UPDATE charging_piles SET version = version + 1 WHERE id = 1"))
+    return bump
+
+
+@pytest.mark.parametrize('times, code', [(1, 200), (100, 409)])
+def test_pile_edit_racing_a_transition(app, times, code):
+    """加载与提交之间 version 被改：冲突重试后成功，冲突一直持续则返回 409 而不是 500"""
+    with app.app_context():
+        bump = _bump_version_before_flush(times)
+        event.listen(db.session, 'before_flush', bump)
+        try:
+            resp = app.test_client().put('/api/charging-piles/1', json={'name': 'renamed', 'fee_rate': 1.5})
+        finally:
+            event.remove(db.session, 'before_flush', bump)
+        assert resp.status_code == code
+        db.session.expire_all()
+        pile = db.session.get(ChargingPile, 1)
+        assert (pile.name, pile.fee_rate) == (('renamed', 1.5) if code == 200 else ('p1', 1.2))
+
+
+def test_pile_delete_racing_a_transition(app):
+    with app.app_context():
+        bump = _bump_version_before_flush(1)
+        event.listen(db.session, 'before_flush', bump)
+        try:
+            resp = app.test_client().delete('/api/charging-piles/1')
+        finally:
+            event.remove(db.session, 'before_flush', bump)
+        assert resp.status_code == 200
+        assert db.session.get(ChargingPile, 1) is None
+    assert app.test_client().delete('/api/charging-piles/1').status_code == 404
@@ -0,0 +1,74 @@
+# tests/test_charging_logs.py
+"""
+充电记录：游标分页遍历不重不漏（翻页期间插入新记录也一样），导出 CSV / NDJSON 与筛选一致
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from app.models.charging import ChargingSessionStatus
+
+BASE = datetime(2026, 3, 1, 8, 0)
+
+
+def _seed(add_session, n=25):
+    ids = []
+    for i in range(n):
+        start = BASE + timedelta(hours=i)
+        ids.append(add_session(i % 3 + 1, start, start + timedelta(minutes=30),
+                               status=ChargingSessionStatus.completed, user_id=i % 2 + 1,
+                               start_time=start, end_time=start + timedelta(minutes=30),
+                               energy_kwh=3.5, fee_amount=4.2))
+    return ids
+
+
+def _walk(client, query, limit, between_pages=None):
+    seen, cursor = [], None
+    while True:
+        url = f'/api/charging-logs?limit={limit}{query}' + (f'&cursor={cursor}' if cursor else '')
+        resp = client.get(url)
+        assert resp.status_code == 200
+        page = resp.get_json()
+        assert len(page) <= limit
+        seen.extend(r['id'] for r in page)
+        cursor = resp.headers.get('X-Next-Cursor')
+        if not cursor:
+            return seen
+        if between_pages:
+            between_pages()
+
+
+def test_cursor_walk_has_no_gaps_or_duplicates(charging_app, add_session):
+    ids = _seed(add_session)
+    client = charging_app.test_client()
+    inserted = []
+
+    def insert_newer():
+        start = BASE + timedelta(days=10, hours=len(inserted))
+        inserted.append(add_session(1, start, start + timedelta(minutes=30)))
+
+    assert _walk(client, '', 7, insert_newer) == sorted(ids, reverse=True)
+    assert inserted
+    assert _walk(client, '&pile_id=2', 4) == sorted(ids[1::3], reverse=True)
+    assert _walk(client, f'&user_id=1&from={BASE + timedelta(hours=10)}', 3) == \
+        sorted(ids[10::2], reverse=True)
+
+
+def test_export_formats_match_filters(charging_app, add_session):
+    ids = _seed(add_session)
+    client = charging_app.test_client()
+
+    resp = client.get('/api/charging-logs/export?format=csv&pile_id=1')
+    assert resp.status_code == 200 and resp.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert [int(r['id']) for r in rows] == ids[0::3]
+    assert rows[0]['pile_name'] == 'p1' and rows[0]['status'] == 'completed'
+
+    resp = client.get('/api/charging-logs/export?format=ndjson')
+    assert resp.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [r['id'] for r in records] == ids
+    assert records[0]['energy_kwh'] == 3.5
+
+    assert client.get('/api/charging-logs/export?format=xml').status_code == 400
@@ -0,0 +1,56 @@
+# tests/test_charging_rollups.py
+"""
+充电用量汇总：增量 upsert 累加正确、与全量重建一致，重建可重复执行
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.dialects import mysql
+
+from app import db
+from app.models.charging import ChargingSession, ChargingSessionStatus, ChargingUsageDaily, ChargingUsageHourly
+from app.tasks.rollups import rebuild_usage, record_session_usage, upsert_add_stmt
+
+START = datetime(2026, 3, 1, 9, 30)
+
+
+def _snapshot():
+    hourly = {(r.pile_id, r.hour): (r.sessions, round(r.energy_kwh, 6), round(r.occupied_minutes, 6))
+              for r in ChargingUsageHourly.query}
+    daily = {(r.pile_id, r.day): (r.sessions, round(r.fee_amount, 6))
+             for r in ChargingUsageDaily.query}
+    return hourly, daily
+
+
+def _completed(add_session, pile_id, start, minutes):
+    end = start + timedelta(minutes=minutes)
+    kwh = minutes / 60 * 7.0
+    return add_session(pile_id, start, end, status=ChargingSessionStatus.completed,
+                       start_time=start, end_time=end, energy_kwh=kwh, fee_amount=kwh * 1.2)
+
+
+def test_incremental_upsert_matches_rebuild(charging_app, add_session):
+    ids = [_completed(add_session, 1, START, 90),                          # 09:30–11:00
+           _completed(add_session, 1, START + timedelta(minutes=40), 30),  # 10:10–10:40
+           _completed(add_session, 2, START + timedelta(hours=14), 120)]   # 23:30–01:30 跨天
+    with charging_app.app_context():
+        for sess in ChargingSession.query.filter(ChargingSession.id.in_(ids)):
+            record_session_usage(sess)
+        db.session.commit()
+        incremental = _snapshot()
+        hourly, daily = incremental
+        assert hourly[(1, datetime(2026, 3, 1, 10))] == (1, round(7.0 + 3.5, 6), 90.0)
+        assert hourly[(1, datetime(2026, 3, 1, 9))][0] == 1
+        assert daily[(2, date(2026, 3, 1))][0] == 1 and daily[(2, date(2026, 3, 2))][0] == 0
+
+        assert rebuild_usage(date(2026, 3, 1), date(2026, 3, 3)) == 3
+        assert _snapshot() == incremental
+        # 重复执行结果不变
+        assert rebuild_usage(date(2026, 3, 1), date(2026, 3, 3)) == 3
+        assert _snapshot() == incremental
+
+
+def test_mysql_upsert_adds_to_existing_row():
+    sql = str(upsert_add_stmt(ChargingUsageHourly, 'mysql').compile(dialect=mysql.dialect()))
+    assert 'ON DUPLICATE KEY UPDATE' in sql
+    for field in ('sessions', 'energy_kwh', 'fee_amount', 'occupied_minutes'):
+        assert f'{field} = (charging_usage_hourly.{field} + ' in sql
@@ -0,0 +1,31 @@
+# tests/test_detector/test_detector_service.py
+import os
+import subprocess
+import sys
+
+DETECTOR_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'detector')
+
+HEAVY = ('cv2', 'numpy', 'shapely', 'requests', 'pipeline')
+
+
+def _loaded_after(code):
+    """在子进程里执行 code，返回其中已导入的重量级模块"""
+    probe = f"import sys; {code}; print('LOADED:' + ','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, '-c', probe], cwd=DETECTOR_DIR,
+                         capture_output=True, text=True, check=True).stdout
+    line = [l for l in out.splitlines() if l.startswith('LOADED:')][-1]
+    return [m for m in line[len('LOADED:'):].split(',') if m]
+
+
+def test_import_and_check_config_do_not_load_pipeline():
+    assert _loaded_after("import detector_service") == []
+    assert _loaded_after("import detector_service; detector_service.main(['--check-config'])") == []
+
+
+def test_help_exits_without_loading_pipeline():
+    code = ("import detector_service\n"
+            "try:\n"
+            "    detector_service.main(['--help'])\n"
+            "except SystemExit:\n"
+            "    pass")
+    assert _loaded_after(f"exec({code!r})") == []
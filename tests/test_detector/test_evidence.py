@@ -0,0 +1,93 @@
+# tests/test_detector/test_evidence.py
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'detector'))
+
+from context import DetectorContext
+from evidence import EvidenceUploader, encode_evidence
+
+
+class FlakyBucket:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.objects  = {}
+
+    def object_exists(self, key):
+        return key in self.objects
+
+    def put_object(self, key, data):
+        if self.failures:
+            self.failures -= 1
+            raise IOError("connection reset")
+        self.objects[key] = data
+
+
+def test_submit_returns_url_before_upload_and_retries():
+    """submit 立即返回预生成的 URL，上传失败后重试成功"""
+    bucket = FlakyBucket(failures=1)
+    up = EvidenceUploader(bucket, 'https://b.example.com/', backoff=0.01)
+    frame = np.zeros((720, 1920, 3), dtype=np.uint8)
+    url = up.submit(frame, (100, 100, 200, 150))
+    up.close(wait=True)
+
+    key = url[len('https://b.example.com/'):]
+    assert key.startswith('captures/') and key in bucket.objects
+    assert bucket.objects[key][:2] == b'\xff\xd8'
+    assert up.stats()['uploaded'] == 1 and up.stats()['pending'] == 0
+
+
+def test_encode_downscales_without_touching_frame():
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    data = encode_evidence(frame, (10, 10, 50, 50), quality=70, max_width=640)
+    assert frame.max() == 0
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    assert img.shape[:2] == (360, 640)
+
+
+def test_failed_upload_is_resolved_once_as_failed():
+    """重试全部失败后 resolve 返回 failed（只返回一次），上传中为 pending"""
+    bucket = FlakyBucket(failures=10)
+    up = EvidenceUploader(bucket, 'https://b.example.com/', retries=1, backoff=0.05)
+    url = up.submit(np.zeros((10, 10, 3), dtype=np.uint8))
+    assert up.resolve(url) == 'pending'
+    up.close(wait=True)
+
+    assert up.resolve(url) == 'failed'
+    assert up.resolve(url) == 'unknown'
+    assert up.stats()['failed'] == 1 and up.stats()['pending'] == 0
+
+
+def test_finished_results_are_bounded():
+    """没人来取的上传结果按先进先出淘汰"""
+    # 单线程上传，完成顺序与提交顺序一致
+    up = EvidenceUploader(FlakyBucket(), 'https://b.example.com/', workers=1, history=2)
+    urls = [up.submit(np.zeros((10, 10, 3), dtype=np.uint8)) for _ in range(5)]
+    up.close(wait=True)
+
+    assert len(up._done) == 2
+    assert [up.resolve(u) for u in urls[-2:]] == ['uploaded', 'uploaded']
+    assert up.resolve(urls[0]) == 'unknown' and not up._done
+
+
+def test_prepare_checks_unknown_evidence_with_head():
+    """重启后发件箱里的上报：对象存在照常发送，不存在去掉 image_path，查询出错暂缓"""
+    bucket = FlakyBucket()
+    bucket.objects['captures/kept.jpg'] = b'jpg'
+    ctx = DetectorContext(env={})
+    ctx._resources['evidence'] = EvidenceUploader(bucket, 'https://b.example.com/')
+
+    kept = {'plate_number': 'A', 'image_path': 'https://b.example.com/captures/kept.jpg'}
+    lost = {'plate_number': 'B', 'image_path': 'https://b.example.com/captures/lost.jpg'}
+    assert ctx._prepare_report(kept) == kept
+    assert ctx._prepare_report(lost) == dict(lost, image_path=None)
+    assert ctx._prepare_report({'plate_number': 'C', 'image_path': None})['plate_number'] == 'C'
+
+    def unreachable(key):
+        raise IOError("timeout")
+    bucket.object_exists = unreachable
+    assert ctx._prepare_report(kept) is None
+    ctx.close()
@@ -0,0 +1,35 @@
+# tests/test_detector/test_frame_ring.py
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'detector'))
+
+from frame_ring import FrameRing
+
+
+def test_ring_round_trip_and_backpressure():
+    """帧经共享内存原样取回；槽位用完时写入失败，归还后可再写"""
+    ring = FrameRing(2, height=4, width=6, ctx=multiprocessing.get_context('spawn'))
+    try:
+        a = np.arange(4 * 6 * 3, dtype=np.uint8).reshape(4, 6, 3)
+        b = np.full((2, 3, 3), 7, dtype=np.uint8)
+        assert ring.write(a, (1, 0.5), block=True)
+        assert ring.write(b, (2, 0.6), block=True)
+        assert not ring.write(a, (1, 0.7))
+        assert not ring.fits(np.zeros((5, 6, 3), dtype=np.uint8))
+
+        slot, frame, camera_id, t_in = ring.get()
+        assert (camera_id, t_in) == (1, 0.5)
+        assert np.array_equal(frame, a)
+        del frame
+        ring.release(slot)
+        assert ring.write(a, (1, 0.8), block=True)
+
+        _, frame, camera_id, _ = ring.get()
+        assert camera_id == 2 and np.array_equal(frame, b)
+        del frame
+    finally:
+        ring.close()
@@ -0,0 +1,36 @@
+# tests/test_detector/test_geo.py
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'detector'))
+
+from geo import CameraCalibration, apply_homography, fit_homography
+from zones import CameraZones, ZoneIndex
+
+# 俯拍 1920×1080 画面到校园经纬度的透视变换
+H_TRUE = np.array([[2e-6, 1e-7, 120.1],
+                   [3e-8, -1.5e-6, 30.2],
+                   [1e-5, 4e-4, 1.0]])
+CORNERS = np.array([[0, 0], [1920, 0], [1920, 1080], [0, 1080], [960, 540]], dtype=float)
+
+
+def test_fit_homography_recovers_mapping():
+    """4 个以上参考点求出的矩阵在参考点及其他点上都与真实变换一致"""
+    calib = CameraCalibration(fit_homography(CORNERS, apply_homography(H_TRUE, CORNERS)))
+    probe = np.array([[100, 900], [1500, 200]], dtype=float)
+    assert np.allclose(calib.pixel_to_geo(probe), apply_homography(H_TRUE, probe), atol=1e-9)
+    assert np.allclose(calib.geo_to_pixel(calib.pixel_to_geo(probe)), probe, atol=1e-4)
+
+
+def test_camera_zones_match_geo_lookup():
+    """在预投影的像素空间判定，结果与逐点换算到经纬度后判定一致"""
+    calib = CameraCalibration(fit_homography(CORNERS, apply_homography(H_TRUE, CORNERS)))
+    zone_px = np.array([[400, 600], [1200, 600], [1200, 1000], [400, 1000]], dtype=float)
+    geo_index = ZoneIndex.from_zones([{'id': 7, 'path': calib.pixel_to_geo(zone_px).tolist()}])
+    points = np.array([[800, 800], [100, 100], [1300, 900], [500, 650]], dtype=float)
+
+    expected = geo_index.find_many(calib.pixel_to_geo(points))
+    assert expected == [7, None, None, 7]
+    assert CameraZones(calib).find_many(geo_index, points) == expected
@@ -0,0 +1,37 @@
+# tests/test_detector/test_metrics.py
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'detector'))
+
+from metrics import MetricsCollector
+from pipeline import StageTimer
+
+
+class FakeService:
+    def __init__(self):
+        self.timer = StageTimer(buckets=(0.01, 0.1))
+
+    def gate_stats(self):
+        return {3: {'decoded': 10, 'gated': 4, 'inferred': 6, 'motion': 0.02}}
+
+    def drop_counts(self):
+        return {(3, 'infer'): 2}
+
+    def queue_depths(self):
+        return {'infer': 1, 'report': 0}
+
+
+def test_prometheus_histogram_is_cumulative_per_camera():
+    svc = FakeService()
+    for secs in (0.005, 0.05, 0.5):
+        svc.timer.record('infer', secs, camera_id=3)
+    svc.timer.record('infer', 0.05)    # 不带摄像头的样本只进分位数统计
+
+    text = MetricsCollector(svc).prometheus()
+    assert 'detector_stage_latency_seconds_bucket{camera="3",stage="infer",le="0.01"} 1' in text
+    assert 'detector_stage_latency_seconds_bucket{camera="3",stage="infer",le="0.1"} 2' in text
+    assert 'detector_stage_latency_seconds_bucket{camera="3",stage="infer",le="+Inf"} 3' in text
+    assert 'detector_stage_latency_seconds_count{camera="3",stage="infer"} 3' in text
+    assert 'detector_frames_dropped_total{camera="3",stage="infer"} 2' in text
+    assert 'detector_queue_depth{queue="infer"} 1' in text
@@ -0,0 +1,79 @@
+# tests/test_detector/test_motion.py
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'detector'))
+
+from motion import MotionGate
+
+FPS = 25.0
+
+
+def _frame(patch=0):
+    """320x240 灰底；patch>0 时左上角画一个 patch 边长的白块。"""
+    frame = np.full((240, 320, 3), 80, dtype=np.uint8)
+    if patch:
+        frame[:patch, :patch] = 255
+    return frame
+
+
+def _run(gate, frames, start=0.0, active_tracks=False):
+    """按 FPS 依次送帧，返回送去推理的帧下标。"""
+    return [i for i, f in enumerate(frames)
+            if gate.should_infer(f, active_tracks=active_tracks, now=start + i / FPS)]
+
+
+def _gaps(indices):
+    return set(np.diff(indices).tolist())
+
+
+def _settled(**kw):
+    """首帧初始化背景会触发 hold，先用静止帧跑过 hold 期。"""
+    gate = MotionGate(active_step=5, idle_step=50, threshold=0.01, hold=2.0, **kw)
+    _run(gate, [_frame()] * 100)
+    return gate, 100 / FPS
+
+
+def test_static_scene_uses_idle_step():
+    gate, t = _settled()
+    inferred = _run(gate, [_frame()] * 200, start=t)
+    assert _gaps(inferred) == {50}
+    assert gate.last_score == 0.0
+
+
+def test_motion_below_threshold_stays_idle():
+    gate, t = _settled()
+    # 4x4 白块缩放后只影响极少像素，低于 1% 阈值
+    frames = [_frame(4 if i % 2 else 0) for i in range(200)]
+    inferred = _run(gate, frames, start=t)
+    assert _gaps(inferred) == {50}
+    assert gate.last_score < 0.01
+
+
+def test_motion_switches_to_active_step_for_hold_seconds():
+    gate, t = _settled()
+    frames = [_frame(120 if i % 2 else 0) for i in range(50)] + [_frame()] * 250
+    inferred = _run(gate, frames, start=t)
+
+    hot = [i for i in inferred if i < 50]
+    assert _gaps(hot) == {5}
+    # 运动在第 49 帧结束（白块不再出现，背景差仍会持续一小段），之后保持 hold 秒再回到 idle_step
+    last_active = max(i for i, j in zip(inferred, inferred[1:]) if j - i == 5)
+    assert 49 + gate.hold * FPS - 5 <= last_active < 300 - 50
+    tail = [i for i in inferred if i > last_active]
+    assert _gaps(tail) <= {50}
+
+
+def test_active_tracks_force_active_step():
+    gate, t = _settled()
+    inferred = _run(gate, [_frame()] * 100, start=t, active_tracks=True)
+    assert _gaps(inferred) == {5}
+
+
+def test_disabled_gate_uses_fixed_active_step():
+    gate = MotionGate(active_step=5, idle_step=50, enabled=False)
+    inferred = _run(gate, [_frame()] * 100, start=100.0)
+    assert inferred == list(range(4, 100, 5))
+    assert gate.stats() == {'decoded': 100, 'gated': 80, 'inferred': 20, 'motion': 0.0}
@@ -0,0 +1,60 @@
+# tests/test_detector/test_ocr_stage.py
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'detector'))
+
+from ocr_stage import OcrStage, crop_distance, normalize_plate
+
+
+class CountingReader:
+    """按图像内容返回预设文本，记录实际识别的张数"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = 0
+
+    def readtext_batched(self, images, **kwargs):
+        self.calls += len(images)
+        return [[self.answers.pop(0)] for _ in images]
+
+
+def plate(text, size=(40, 140)):
+    img = np.full(size + (3,), 255, dtype=np.uint8)
+    cv2.putText(img, text, (5, size[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+    return img
+
+
+def test_same_crop_hits_cache():
+    reader = CountingReader(['ABC123'])
+    ocr = OcrStage(reader)
+    assert ocr.read([plate('ABC123')]) == ['ABC123']
+    assert ocr.read([plate('ABC123')]) == ['ABC123']
+    assert reader.calls == 1
+
+
+def test_crop_distance_tolerates_jitter_but_not_a_different_character():
+    ref = normalize_plate(plate('ABC123'))
+    assert crop_distance(ref, normalize_plate(np.roll(plate('ABC123'), 1, axis=1))) <= 12
+    assert crop_distance(ref, normalize_plate(plate('ABD123'))) > 12
+
+
+def test_hash_collision_is_rejected_by_crop_check(monkeypatch):
+    """强制所有裁剪图哈希相同，仍按图像比对区分只差一个字符的车牌"""
+    monkeypatch.setattr(OcrStage, 'cache_key', staticmethod(lambda crop, img: 'same'))
+    reader = CountingReader(['ABC123', 'ABD123'])
+    ocr = OcrStage(reader)
+    assert ocr.read([plate('ABC123')]) == ['ABC123']
+    assert ocr.read([plate('ABD123')]) == ['ABD123']
+    assert reader.calls == 2
+
+
+def test_empty_result_is_not_cached():
+    reader = CountingReader(['', 'ABC123'])
+    ocr = OcrStage(reader)
+    assert ocr.read([plate('ABC123')]) == ['']
+    assert ocr.read([plate('ABC123')]) == ['ABC123']
+    assert reader.calls == 2
@@ -0,0 +1,201 @@
+# tests/test_detector/test_outbox.py
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'detector'))
+
+from outbox import Outbox, OutboxSender
+
+
+def test_outbox_survives_restart(tmp_path):
+    """写入后未确认的上报在重新打开发件箱后仍然存在"""
+    path = str(tmp_path / 'outbox.db')
+    box = Outbox(path)
+    event_id = box.put({'camera_id': 1, 'zone_id': 2, 'plate_number': 'ABC123'})
+    box.put({'camera_id': 1, 'zone_id': 3, 'plate_number': 'XYZ789'})
+    box.close()
+
+    box = Outbox(path)
+    assert box.backlog() == 2
+    rows = box.peek(10)
+    assert rows[0][1]['event_id'] == event_id
+    assert rows[1][1]['zone_id'] == 3
+
+    box.ack([rows[0][0]])
+    assert box.backlog() == 1
+    assert box.peek(10)[0][1]['plate_number'] == 'XYZ789'
+
+
+class RecordingSession:
+    def __init__(self):
+        self.posted = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posted.extend(json)
+        return Resp(200)
+
+
+def test_sender_holds_and_rewrites_prepared_reports(tmp_path):
+    """prepare 返回 None 的上报留在发件箱，改写过的上报先持久化再发送"""
+    box = Outbox(str(tmp_path / 'outbox.db'))
+    box.put({'plate_number': 'HELD', 'image_path': 'pending.jpg'})
+    box.put({'plate_number': 'LOST', 'image_path': 'failed.jpg'})
+    states = {'pending.jpg': None, 'failed.jpg': 'failed'}
+
+    def prepare(payload):
+        state = states[payload['image_path']]
+        if state is None:
+            return None
+        return dict(payload, image_path=None) if state == 'failed' else payload
+
+    sender = OutboxSender(box, 'http://x/batch', prepare=prepare)
+    sender.session = RecordingSession()
+    assert sender.flush_once() == 1
+    assert [(p['plate_number'], p['image_path']) for p in sender.session.posted] == [('LOST', None)]
+    assert box.backlog() == 1
+
+    states['pending.jpg'] = 'uploaded'
+    assert sender.flush_once() == 1
+    assert sender.session.posted[-1]['image_path'] == 'pending.jpg'
+    assert box.backlog() == 0
+
+
+
+def test_held_reports_do_not_stall_newer_ones(tmp_path):
+    """整批最旧的上报都在等证据图时，继续往后取已就绪的上报"""
+    box = Outbox(str(tmp_path / 'outbox.db'))
+    for i in range(5):
+        box.put({'plate_number': f'HELD{i}', 'image_path': 'pending.jpg'})
+    box.put({'plate_number': 'READY', 'image_path': 'done.jpg'})
+
+    sender = OutboxSender(box, 'http://x/batch', batch_size=2,
+                          prepare=lambda p: None if p['image_path'] == 'pending.jpg' else p)
+    sender.session = RecordingSession()
+    assert sender.flush_once() == 1
+    assert [p['plate_number'] for p in sender.session.posted] == ['READY']
+    assert box.backlog() == 5
+    assert sender.flush_once() == 0
+
+class Resp:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body        = body
+        self.text        = str(body)
+
+    def json(self):
+        if self.body is None:
+            raise ValueError('no body')
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+
+class ScriptedSession:
+    """按 URL 依次返回预设响应；响应为可调用对象时用请求体生成。"""
+
+    def __init__(self, **script):
+        self.script = {k: list(v) for k, v in script.items()}
+        self.calls  = []
+
+    def post(self, url, json=None, timeout=None):
+        name = url.rsplit('/', 1)[-1]
+        self.calls.append((name, json))
+        r = self.script[name].pop(0)
+        return r(json) if callable(r) else r
+
+
+def _box(tmp_path, n, **kw):
+    box = Outbox(str(tmp_path / 'outbox.db'), **kw)
+    for i in range(n):
+        box.put({'plate_number': f'P{i}'})
+    return box
+
+
+def _results(*statuses):
+    return Resp(200, {'results': [{'index': i, 'status': s, 'error': s == 'invalid' and 'bad' or None}
+                                  for i, s in enumerate(statuses)]})
+
+
+def test_only_accepted_rows_are_acked_and_invalid_rows_dead_lettered(tmp_path):
+    box = _box(tmp_path, 3)
+    sender = OutboxSender(box, 'http://x/batch')
+    sender.session = ScriptedSession(batch=[_results('created', 'invalid', 'duplicate')])
+
+    assert sender.flush_once() == 2
+    assert box.backlog() == 0 and box.dead_letters() == 1
+
+
+@pytest.mark.parametrize('status', [401, 403, 408, 429, 500, 503])
+def test_retryable_status_keeps_batch_and_counts_attempt(tmp_path, status):
+    box = _box(tmp_path, 2)
+    sender = OutboxSender(box, 'http://x/batch')
+    sender.session = ScriptedSession(batch=[Resp(status)])
+
+    with pytest.raises(requests.HTTPError):
+        sender.flush_once()
+    assert box.backlog() == 2 and box.dead_letters() == 0
+    assert {attempts for (attempts,) in box._conn.execute("SELECT attempts FROM outbox")} == {1}
+
+
+def test_rows_move_to_dead_letters_after_max_attempts(tmp_path):
+    box = _box(tmp_path, 1, max_attempts=2)
+    sender = OutboxSender(box, 'http://x/batch')
+    sender.session = ScriptedSession(batch=[Resp(500), Resp(500)])
+
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            sender.flush_once()
+    assert box.backlog() == 0 and box.dead_letters() == 1
+
+
+def test_connection_errors_do_not_count_attempts(tmp_path):
+    box = _box(tmp_path, 1, max_attempts=1)
+    sender = OutboxSender(box, 'http://x/batch')
+
+    def down(_):
+        raise requests.ConnectionError('refused')
+    sender.session = ScriptedSession(batch=[down])
+
+    with pytest.raises(requests.ConnectionError):
+        sender.flush_once()
+    assert box.backlog() == 1 and box.dead_letters() == 0
+
+
+def test_oversized_batch_is_split(tmp_path):
+    """413 时对半拆分，直到服务端接受或只剩单条（单条仍 413 则移入死信表）"""
+    box = _box(tmp_path, 4)
+    sender = OutboxSender(box, 'http://x/batch')
+    too_big = Resp(413)
+    sender.session = ScriptedSession(batch=[
+        too_big,
+        lambda rows: _results(*['created'] * len(rows)),
+        too_big,
+        too_big,
+        lambda rows: _results('created'),
+    ])
+
+    assert sender.flush_once() == 3
+    assert [len(rows) for _, rows in sender.session.calls] == [4, 2, 2, 1, 1]
+    assert box.backlog() == 0 and box.dead_letters() == 1
+
+
+def test_single_fallback_acks_each_delivered_row(tmp_path):
+    """批量接口 404 时逐条发送；中途失败，已送达的不再重发"""
+    box = _box(tmp_path, 3)
+    sender = OutboxSender(box, 'http://x/batch', single_url='http://x/violations')
+    sender.session = ScriptedSession(batch=[Resp(404), Resp(404)],
+                                     violations=[Resp(201), Resp(503), Resp(201), Resp(200)])
+
+    with pytest.raises(requests.HTTPError):
+        sender.flush_once()
+    assert [p['plate_number'] for _, p in box.peek(10)] == ['P1', 'P2']
+
+    assert sender.flush_once() == 2
+    assert [p['plate_number'] for name, p in sender.session.calls if name == 'violations'] == \
+        ['P0', 'P1', 'P1', 'P2']
+    assert box.backlog() == 0
@@ -0,0 +1,98 @@
+# tests/test_detector/test_pipeline.py
+import os
+import queue
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+from shapely.geometry import box as rect
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'detector'))
+
+from pipeline import StreamingService, collect_batch, put_latest
+from zones import ZoneIndex
+
+
+class FixedModel:
+    """每帧在画面下半部给出同一个车牌框"""
+
+    def __init__(self):
+        self.batches = []
+
+    def infer(self, frames, **kwargs):
+        self.batches.append(len(frames))
+        return [SimpleNamespace(predictions=[SimpleNamespace(
+                    x=160, y=180, width=60, height=20, class_name='license_plate', confidence=0.9)])
+                for _ in frames]
+
+
+class Backends:
+    def __init__(self):
+        self.model   = FixedModel()
+        self.ocr     = SimpleNamespace(read=lambda crops: ['ABC123'] * len(crops))
+        self.zones   = SimpleNamespace(index=ZoneIndex({7: rect(0, 0, 320, 240)}))
+        self.reports = []
+        self._lock   = threading.Lock()
+
+    def upload(self, frame, box=None):
+        return 'https://b.example.com/x.jpg'
+
+    def report(self, payload):
+        with self._lock:
+            self.reports.append(payload)
+
+
+def _cameras(tmp_path, n_cameras=2, n_frames=6):
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    path = str(tmp_path / 'frame.jpg')
+    cv2.imwrite(path, frame)
+    return [{'id': i + 1, 'rtsp_url': path, 'images': [path] * n_frames} for i in range(n_cameras)]
+
+
+def test_replay_runs_every_frame_and_reports_once_per_track(tmp_path):
+    """回放模式下每路摄像头的每一帧都走完推理，同一车牌在同一禁停区只上报一次"""
+    backends = Backends()
+    service = StreamingService(_cameras(tmp_path), backends, frame_step=1, motion_gate=False,
+                               replay=True, infer_workers=2, batch_size=4, max_wait_ms=5)
+    service.start()
+    service.wait_replay()
+    service.stop()
+
+    assert sum(backends.model.batches) == 12
+    assert service.frames_done == 12
+    assert sorted((r['camera_id'], r['zone_id'], r['plate_number']) for r in backends.reports) == \
+        [(1, 7, 'ABC123'), (2, 7, 'ABC123')]
+
+
+def test_put_latest_drops_oldest_when_full():
+    q = queue.Queue(maxsize=2)
+    assert put_latest(q, 1) is False
+    assert put_latest(q, 2) is False
+    assert put_latest(q, 3) is True
+    assert [q.get_nowait(), q.get_nowait()] == [2, 3]
+
+
+def test_collect_batch_stops_at_max_batch():
+    q = queue.Queue()
+    for i in range(10):
+        q.put(i)
+    assert collect_batch(q, max_batch=4, max_wait=1.0) == [0, 1, 2, 3]
+    assert q.qsize() == 6
+
+
+def test_collect_batch_returns_partial_batch_after_max_wait():
+    q = queue.Queue()
+    q.put('a')
+    threading.Timer(0.3, q.put, args=('late',)).start()
+    t0 = time.perf_counter()
+    assert collect_batch(q, max_batch=4, max_wait=0.05) == ['a']
+    assert time.perf_counter() - t0 < 0.25
+
+
+def test_collect_batch_empty_queue_times_out():
+    t0 = time.perf_counter()
+    assert collect_batch(queue.Queue(), max_batch=4, max_wait=0.05, timeout=0.05) == []
+    assert time.perf_counter() - t0 < 0.5
@@ -0,0 +1,60 @@
+# tests/test_detector/test_tracker.py
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'detector'))
+
+from tracker import PlateTracker, iou
+
+
+def test_iou():
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert iou((0, 0, 10, 10), (20, 20, 30, 30)) == 0.0
+    assert abs(iou((0, 0, 10, 10), (5, 0, 15, 10)) - 1 / 3) < 1e-9
+
+
+def test_parked_bike_keeps_track_id():
+    """静止目标在多帧间保持同一 track_id，新目标分配新 id"""
+    tracker = PlateTracker()
+    t1, = tracker.update([(100, 100, 160, 140)], now=0)
+    t2, = tracker.update([(102, 101, 161, 142)], now=1)
+    assert t1.id == t2.id
+
+    a, b = tracker.update([(103, 100, 162, 141), (500, 500, 560, 540)], now=2)
+    assert a.id == t1.id
+    assert b.id != t1.id
+
+
+def test_ocr_only_when_new_or_better():
+    tracker = PlateTracker()
+    t, = tracker.update([(0, 0, 50, 20)], now=0)
+    assert t.needs_ocr(0.6)
+    t.set_plate('ABC123', 0.6)
+    assert not t.needs_ocr(0.5)
+    assert t.needs_ocr(0.8)
+
+
+def test_report_once_per_dwell_window():
+    tracker = PlateTracker(dwell_window=60)
+    t, = tracker.update([(0, 0, 50, 20)], now=0)
+    assert tracker.should_report(t, 7, now=0)
+    tracker.mark_reported(t, 7, now=0)
+    assert not tracker.should_report(t, 7, now=30)
+    assert tracker.should_report(t, 8, now=30)
+    assert tracker.should_report(t, 7, now=61)
+
+
+def test_stale_tracks_expire():
+    tracker = PlateTracker(max_age=5)
+    t1, = tracker.update([(0, 0, 50, 20)], now=0)
+    t2, = tracker.update([(0, 0, 50, 20)], now=10)
+    assert t1.id != t2.id
+
+
+def test_new_track_marks_tracker_active():
+    tracker = PlateTracker()
+    assert not tracker.is_active(now=0)
+    tracker.update([(0, 0, 50, 20)], now=100)
+    assert tracker.is_active(now=101)
+    tracker.update([(0, 0, 50, 20)], now=110)
+    assert not tracker.is_active(now=110)
@@ -0,0 +1,105 @@
+# tests/test_detector/test_zones.py
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+import requests
+from shapely.geometry import Point, Polygon
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'detector'))
+
+from zones import ZoneIndex, ZoneRefresher
+
+
+def _random_zones(rng, n):
+    zones = []
+    for i in range(n):
+        cx, cy, r = rng.uniform(0, 1000), rng.uniform(0, 1000), rng.uniform(10, 120)
+        k = rng.randint(3, 7)
+        angles = sorted(rng.uniform(0, 6.283) for _ in range(k))
+        path = [[cx + r * np.cos(a), cy + r * np.sin(a)] for a in angles]
+        zones.append({'id': 100 + i, 'path': path})
+    return zones
+
+
+def test_zone_index_matches_brute_force():
+    """STR-tree 查询（单点 / 全部 / 批量 within）与逐个多边形判定一致，重叠时取最先加入的区"""
+    rng = random.Random(3)
+    zones = _random_zones(rng, 60)
+    index = ZoneIndex.from_zones(zones)
+    polygons = [(z['id'], Polygon(z['path'])) for z in zones]
+    points = [(rng.uniform(0, 1000), rng.uniform(0, 1000)) for _ in range(2000)]
+
+    expected_first = []
+    for x, y in points:
+        inside = [zid for zid, poly in polygons if poly.contains(Point(x, y))]
+        assert sorted(index.find_all(x, y)) == sorted(inside)
+        assert (index.find(x, y) in inside) if inside else index.find(x, y) is None
+        expected_first.append(inside[0] if inside else None)
+    assert index.find_many(points) == expected_first
+
+
+def test_find_many_handles_nan_and_empty_index():
+    index = ZoneIndex.from_zones([{'id': 1, 'path': [[0, 0], [10, 0], [10, 10], [0, 10]]},
+                                  {'id': 2, 'path': [[0, 0], [1, 1]]}])
+    assert len(index) == 1
+    assert index.find_many([[5, 5], [np.nan, np.nan], [20, 20]]) == [1, None, None]
+    assert ZoneIndex({}).find_many([[5, 5]]) == [None]
+
+
+class FakeResponse:
+    def __init__(self, status_code, zones=None, etag=None):
+        self.status_code = status_code
+        self._zones      = zones
+        self.headers     = {'ETag': etag} if etag else {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+    def json(self):
+        return self._zones
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.headers   = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.headers.append(headers)
+        r = self.responses.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+
+SQUARE = [{'id': 7, 'path': [[0, 0], [10, 0], [10, 10], [0, 10]]}]
+
+
+def test_refresher_replaces_on_200_and_keeps_index_on_304():
+    refresher = ZoneRefresher('http://backend/api/zones')
+    refresher._session = FakeSession(FakeResponse(200, SQUARE, etag='"v1"'), FakeResponse(304))
+
+    assert refresher.refresh() is True
+    index = refresher.index
+    assert index.find(5, 5) == 7 and refresher.etag == '"v1"'
+
+    assert refresher.refresh() is False
+    assert refresher.index is index
+    assert refresher._session.headers == [{}, {'If-None-Match': '"v1"'}]
+
+
+@pytest.mark.parametrize('failure', [FakeResponse(500), requests.ConnectionError('down')])
+def test_refresher_keeps_old_zones_on_error(failure):
+    refresher = ZoneRefresher('http://backend/api/zones')
+    refresher._session = FakeSession(FakeResponse(200, SQUARE, etag='"v1"'), failure)
+    refresher.refresh()
+    index = refresher.index
+
+    with pytest.raises(requests.RequestException):
+        refresher.refresh()
+    assert refresher.index is index and refresher.etag == '"v1"'
+    assert refresher.index.find(5, 5) == 7
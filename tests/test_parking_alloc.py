@@ -0,0 +1,109 @@
+# tests/test_parking_alloc.py
+"""
+停车位分配并发测试：多线程同时入场同一个停车场
+使用文件 SQLite（各线程独立连接）；测试环境没有 Redis 时走数据库回退路径，验证条件更新不会重复分配。
+"""
+import threading
+
+import pytest
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models.location import CampusLocation
+from app.models.parking import ParkingLot, ParkingSpace, ParkingRecord
+from app.models.users import User
+from app.models.vehicles import ElectricVehicle
+
+SPACES  = 4
+THREADS = 12
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'parking.db'}")
+    app = create_app(config_name='testing')
+    with app.app_context():
+        db.create_all()
+        loc = CampusLocation(name='P', latitude=30.0, longitude=120.0,
+                             location_type='parking', path=[[120.0, 30.0]])
+        db.session.add(loc)
+        db.session.flush()
+        lot = ParkingLot(location_id=loc.id, name='lot', capacity=SPACES)
+        db.session.add(lot)
+        db.session.flush()
+        db.session.add_all([ParkingSpace(parking_lot_id=lot.id) for _ in range(SPACES)])
+        for i in range(THREADS):
+            user = User(school_id=f'2098{i:05d}', phone=f'1398000{i:04d}', role='student',
+                        password_hash='x', name=f'u{i}')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(ElectricVehicle(owner_id=user.id, brand='b', plate_number=f'P{i:05d}'))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def free_sets(app):
+    """用 fakeredis 替换 redis_client（未安装时跳过）"""
+    fakeredis = pytest.importorskip('fakeredis')
+    from app.extensions import redis_client
+    real = redis_client._redis_client
+    redis_client._redis_client = fakeredis.FakeRedis()
+    yield redis_client
+    redis_client._redis_client = real
+
+
+def _park_in_all(app):
+    barrier = threading.Barrier(THREADS)
+    codes = [None] * THREADS
+
+    def worker(i):
+        client = app.test_client()
+        barrier.wait()
+        codes[i] = client.post('/api/parking/park_in',
+                               json={'lot_id': 1, 'vehicle_id': i + 1, 'user_id': i + 1}).status_code
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return codes
+
+
+def test_concurrent_park_in_never_shares_a_space(app):
+    codes = _park_in_all(app)
+
+    assert codes.count(200) == SPACES
+    assert codes.count(400) == THREADS - SPACES
+    with app.app_context():
+        space_ids = [r.parking_space_id for r in ParkingRecord.query.all()]
+        assert sorted(space_ids) == list(range(1, SPACES + 1))
+        assert ParkingSpace.query.filter_by(status='available').count() == 0
+        assert db.session.get(ParkingLot, 1).occupied == SPACES
+
+
+def test_park_out_frees_space_once(app):
+    client = app.test_client()
+    assert client.post('/api/parking/park_in', json={'lot_id': 1, 'vehicle_id': 1, 'user_id': 1}).status_code == 200
+
+    assert client.post('/api/parking/park_out/1').status_code == 200
+    assert client.post('/api/parking/park_out/1').status_code == 400
+    with app.app_context():
+        assert ParkingSpace.query.filter_by(status='available').count() == SPACES
+        assert db.session.get(ParkingLot, 1).occupied == 0
+
+
+def test_new_lot_spaces_enter_free_set_and_capacity_change_resets_it(app, free_sets):
+    client = app.test_client()
+    assert client.post('/api/parking/add_parking_lot',
+                       json={'location_id': 1, 'name': 'new', 'capacity': 3}).status_code == 201
+    assert sorted(int(i) for i in free_sets.smembers('parking:free:2')) == [SPACES + 1, SPACES + 2, SPACES + 3]
+    assert client.post('/api/parking/park_in', json={'lot_id': 2, 'vehicle_id': 1, 'user_id': 1}).status_code == 200
+
+    assert client.put('/api/parking/parking_lot/2', json={'name': 'renamed', 'capacity': 3}).status_code == 200
+    assert free_sets.exists('parking:free:2:loaded')
+    assert client.put('/api/parking/parking_lot/2', json={'capacity': 5}).status_code == 200
+    assert not free_sets.exists('parking:free:2', 'parking:free:2:loaded')
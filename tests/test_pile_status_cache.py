@@ -0,0 +1,65 @@
+# tests/test_pile_status_cache.py
+"""
+充电桩状态写穿缓存：列表接口读缓存并带版本号，写路径提交后覆盖缓存、递增版本、广播增量；
+同一个桩的旧版本记录晚到时不覆盖缓存
+"""
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app import db
+from app.extensions import socketio
+from app.models.charging import ChargingPile, ChargingPileStatus
+from app.utils.pile_status import pile_record, publish_piles
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    events = []
+    monkeypatch.setattr(socketio, 'emit', lambda event, data, **kw: events.append((event, data)))
+    return events
+
+
+def _list(client):
+    resp = client.get('/api/charging-piles?location_id=1')
+    assert resp.status_code == 200
+    return {p['id']: p for p in resp.get_json()}, int(resp.headers['X-Pile-Status-Version'])
+
+
+def test_reserve_writes_through_and_bumps_version(charging_app, fake_redis, emitted):
+    pytest.importorskip('lupa')
+    client = charging_app.test_client()
+    piles, version = _list(client)
+    assert version == 0 and piles[1]['status'] == 'available'
+
+    day = (date.today() + timedelta(days=2)).isoformat()
+    resp = client.post('/api/charging-sessions/reserve', json={
+        'user_id': 1, 'vehicle_id': 1, 'pile_id': 1,
+        'date': day, 'start_time': '10:00', 'end_time': '11:00'})
+    assert resp.status_code == 201
+
+    piles, version = _list(client)
+    assert version == 1
+    assert piles[1]['status'] == 'reserved' and piles[2]['status'] == 'available'
+    event, delta = emitted[-1]
+    assert event == 'pile:status' and delta['version'] == 1
+    assert [(p['id'], p['status']) for p in delta['piles']] == [(1, 'reserved')]
+
+
+def test_out_of_order_publish_does_not_roll_back(charging_app, fake_redis, emitted):
+    pytest.importorskip('lupa')
+    client = charging_app.test_client()
+    with charging_app.app_context():
+        pile = db.session.get(ChargingPile, 1)
+        older = SimpleNamespace(**dict(pile_record(pile), status=pile.status, updated_at=pile.updated_at))
+        pile.status = ChargingPileStatus.offline
+        db.session.commit()
+        publish_piles([pile])
+        # 先提交的转换晚于后提交的转换发布
+        publish_piles([older])
+
+    piles, version = _list(client)
+    assert piles[1]['status'] == 'offline'
+    assert version == 2
+    assert emitted[-1][1]['piles'] == []
@@ -0,0 +1,39 @@
+# tests/test_reservation_sweeper.py
+"""
+过期预约清理：只取消超过 RESERVATION_HOLD 仍未开始的预约，只释放不再有有效预约的桩
+"""
+from datetime import datetime, timedelta
+
+from app import db
+from app.models.charging import ChargingPile, ChargingPileStatus, ChargingSession, ChargingSessionStatus
+from app.tasks.reservations import expire_stale_reservations
+from app.utils.session_filters import RESERVATION_HOLD
+
+
+def test_sweeper_expires_only_stale_reservations(charging_app, add_session):
+    now = datetime.utcnow()
+    start = now + timedelta(days=1)
+    stale = now - RESERVATION_HOLD - timedelta(minutes=1)
+    fresh = now - timedelta(minutes=1)
+    # 桩 1：只有过期预约；桩 2：只有未过期预约；桩 3：过期 + 未过期
+    only_stale = add_session(1, start, start + timedelta(hours=1), created_at=stale)
+    only_fresh = add_session(2, start, start + timedelta(hours=1), created_at=fresh)
+    mixed_old  = add_session(3, start, start + timedelta(hours=1), created_at=stale)
+    mixed_new  = add_session(3, start + timedelta(hours=2), start + timedelta(hours=3), created_at=fresh)
+    ongoing    = add_session(2, now - timedelta(hours=1), now + timedelta(hours=1),
+                             status=ChargingSessionStatus.ongoing, created_at=stale)
+    with charging_app.app_context():
+        ChargingPile.query.update({ChargingPile.status: ChargingPileStatus.reserved})
+        db.session.commit()
+
+        assert expire_stale_reservations(now) == 2
+        status = {s.id: s.status for s in ChargingSession.query}
+        assert status[only_stale] == status[mixed_old] == ChargingSessionStatus.cancelled
+        assert status[only_fresh] == status[mixed_new] == ChargingSessionStatus.reserved
+        assert status[ongoing] == ChargingSessionStatus.ongoing
+        piles = {p.id: p.status for p in ChargingPile.query}
+        assert piles == {1: ChargingPileStatus.available,
+                         2: ChargingPileStatus.reserved,
+                         3: ChargingPileStatus.reserved}
+        # 重复执行不再改动
+        assert expire_stale_reservations(now) == 0
@@ -0,0 +1,116 @@
+# tests/test_violations.py
+"""
+违停上报接口：event_id 幂等
+使用文件 SQLite，在路由提交前用另一个连接写入同一 event_id，模拟重试与首次上报并发到达。
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models.camera import Camera, Violation
+from app.models.location import CampusLocation
+from app.routes.camera import insert_ignore_stmt
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'violation.db'}")
+    app = create_app(config_name='testing')
+    with app.app_context():
+        db.create_all()
+        loc = CampusLocation(name='C', latitude=30.0, longitude=120.0,
+                             location_type='no_parking', path=[[120.0, 30.0]])
+        db.session.add(loc)
+        db.session.flush()
+        db.session.add(Camera(location_id=loc.id, name='cam'))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def _report(event_id='evt-1', **extra):
+    return {'camera_id': 1, 'zone_id': 1, 'plate_number': 'ABC123',
+            'occurred_at': '2026-01-01T08:00:00', 'event_id': event_id, **extra}
+
+
+def test_concurrent_duplicate_is_reported_as_duplicate(app):
+    """预检查之后、提交之前另一条同 event_id 的上报已入库"""
+    inserted = []
+
+    def insert_twin(session, flush_context, instances):
+        if inserted:
+            return
+        inserted.append(True)
+        with db.engine.begin() as conn:
+            conn.execute(Violation.__table__.insert().values(
+                camera_id=1, zone_id=1, plate_number='ABC123',
+                occurred_at=datetime(2026, 1, 1, 8, 0), event_id='evt-1'))
+
+    with app.app_context():
+        event.listen(db.session, 'before_flush', insert_twin)
+        try:
+            resp = app.test_client().post('/api/violations', json=_report(image_path='a.jpg'))
+        finally:
+            event.remove(db.session, 'before_flush', insert_twin)
+        assert resp.status_code == 200
+        assert resp.get_json()['status'] == 'duplicate'
+        assert Violation.query.filter_by(event_id='evt-1').count() == 1
+
+
+def test_missing_image_path_is_accepted(app):
+    client = app.test_client()
+    assert client.post('/api/violations', json=_report()).status_code == 201
+    assert client.post('/api/violations', json=_report()).status_code == 200
+    with app.app_context():
+        assert Violation.query.one().image_path is None
+
+
+
+@pytest.mark.parametrize('returning', [True, False])
+def test_batch_race_reports_duplicate_per_row(app, monkeypatch, returning):
+    """
+    预查询之后另一副本抢先写入同一 event_id：INSERT 执行前用另一个连接插入「孪生」记录（最多两次，
+    即使再查一次再插也会再撞上）。冲突的行记为 duplicate，其余照常入库，整批不会失败。
+    不支持 RETURNING 时（MySQL 路径）整批插入不足，回滚到保存点后逐行插入。
+    """
+    emitted = []
+    monkeypatch.setattr('app.routes.camera.socketio.emit', lambda name, data: emitted.append(data))
+    # SQLite 是库级写锁：保存点之后本连接已持有写锁，另一个连接无法再插入，逐行阶段不再模拟并发
+    twins = ['evt-2', 'evt-3'] if returning else ['evt-2']
+    busy = []
+
+    def insert_twin(conn, cursor, statement, parameters, context, executemany):
+        if busy or not twins or not statement.startswith('INSERT INTO violation '):
+            return
+        busy.append(True)
+        with db.engine.begin() as other:
+            other.execute(Violation.__table__.insert().values(
+                camera_id=1, zone_id=1, plate_number='ABC123',
+                occurred_at=datetime(2026, 1, 1, 8, 0), event_id=twins.pop(0)))
+        busy.clear()
+
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, 'insert_executemany_returning', returning)
+        event.listen(db.engine, 'before_cursor_execute', insert_twin)
+        try:
+            resp = app.test_client().post('/api/violations/batch', json=[
+                _report('evt-1'), _report('evt-2'), _report('evt-3'), _report(None)])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', insert_twin)
+
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert [r['status'] for r in body['results']] == ['created', 'duplicate', 'created', 'created']
+        assert (body['created'], body['duplicate']) == (3, 1)
+        assert Violation.query.count() == 4
+        assert emitted[0]['count'] == 3
+
+
+def test_mysql_insert_ignores_duplicate_keys():
+    sql = str(insert_ignore_stmt(Violation, 'mysql').compile(dialect=mysql.dialect()))
+    assert sql.startswith('INSERT IGNORE INTO violation ')